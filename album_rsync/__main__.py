@@ -4,36 +4,52 @@ import logging
 from .config import Config
 from .sync import Sync
 from .resiliently import Resiliently
+from .concurrency import ConcurrencyController
 from .flickr_storage import FlickrStorage
 from .google_storage import GoogleStorage
 from .local_storage import LocalStorage
-from .fake_storage import FakeStorage
+from .fake_storage import FakeStorage, FakeSpec
 from .tree_walker import TreeWalker
 from .csv_walker import CsvWalker
+from .jsonl_walker import JsonlWalker
 from .google_api import GoogleApi
+from .http_transport import HttpTransport
+from .plan import Plan, PlanError
+from .stats import stats
+from .metrics import MetricsFile
+from .profiler import Profiler
 
 logger = logging.getLogger(__name__)
 
-def _get_storage(config, path, count):
+def _get_resiliently(config, provider, resilients):
+    controller = ConcurrencyController(config.jobs) if config.adaptive_concurrency else None
+    resiliently = Resiliently(config, controller, provider)
+    resilients.append(resiliently)
+    return resiliently
+
+def _get_storage(config, path, count, resilients):
     """Storage provider factory.
 
     Args:
         config: Current configuration.
         path: Storage provider path, e.g. `flickr`, `google` or a file path.
         count: Provider instance count (used for fake storage).
+        resilients: A list to add the Resiliently instance used by a remote provider to.
 
     Returns:
         A storage provider.
     """
     if path.lower() == Config.PATH_GOOGLE:
-        resiliently = Resiliently(config)
-        api = GoogleApi(config, resiliently)
+        resiliently = _get_resiliently(config, Config.PATH_GOOGLE, resilients)
+        # Allow a connection for each parallel transfer as well as the listing
+        transport = HttpTransport(pool_size=max(config.pool_size, config.jobs + 1), keep_alive=not config.no_keep_alive)
+        api = GoogleApi(config, resiliently, transport)
         return GoogleStorage(config, api)
     if path.lower() == Config.PATH_FLICKR:
-        resiliently = Resiliently(config)
+        resiliently = _get_resiliently(config, Config.PATH_FLICKR, resilients)
         return FlickrStorage(config, resiliently)
-    if path.lower() == Config.PATH_FAKE:
-        return FakeStorage(config, count)
+    if path.lower() == Config.PATH_FAKE or path.lower().startswith(Config.PATH_FAKE + ':'):
+        return FakeStorage(config, count, FakeSpec.parse(path))
     return LocalStorage(config, path)
 
 def _get_walker(config, storage, list_format):
@@ -47,29 +63,76 @@ def _get_walker(config, storage, list_format):
     Returns:
         A file walker.
     """
-    if list_format == Config.LIST_FORMAT_TREE:
-        return TreeWalker(config, storage)
-    if list_format == Config.LIST_FORMAT_CSV:
-        return CsvWalker(config, storage)
+    if config.walker_engine == Config.WALKER_ENGINE_RX:
+        try:
+            #pylint: disable=import-outside-toplevel
+            from .rx_tree_walker import RxTreeWalker
+            from .rx_csv_walker import RxCsvWalker
+        except ImportError:
+            raise NotImplementedError("the rx walker engine requires RxPY, install it with `pip install rx~=1.6`") from None
+        walkers = {Config.LIST_FORMAT_TREE: RxTreeWalker, Config.LIST_FORMAT_CSV: RxCsvWalker}
+    else:
+        walkers = {Config.LIST_FORMAT_TREE: TreeWalker, Config.LIST_FORMAT_CSV: CsvWalker}
+    # There's no Rx version of the jsonl walker
+    walkers[Config.LIST_FORMAT_JSONL] = JsonlWalker
+    if list_format in walkers:
+        return walkers[list_format](config, storage)
     raise ValueError(f"Unrecognised value for list-format: {list_format}")
 
+def _report_stats(config):
+    if config.stats:
+        stats.log_table()
+    if config.stats_json:
+        stats.save(config.stats_json)
+
+def _run(config, func, *args):
+    """Runs the list or sync, under the profiler if --profile is set."""
+    if not config.profile:
+        return func(*args)
+    with Profiler(config):
+        return func(*args)
+
 def main():
     try:
         config = Config()
         config.read()
 
-        src_storage = _get_storage(config, config.src, 0)
+        plan = Plan.load(config.apply_plan) if config.apply_plan else None
+        resilients = []
+        src_storage = _get_storage(config, plan.src if plan else config.src, 0, resilients)
         if config.logout:
             print("logging out...")
             src_storage.logout()
             exit()
+        elif config.prune_checksum_cache:
+            removed = LocalStorage(config, '').prune_checksum_cache()
+            print(f"removed {removed} stale checksum(s)")
+            exit()
         elif config.list_only or config.list_folders:
-            walker = _get_walker(config, src_storage, config.list_format)
-            walker.walk()
+            try:
+                walker = _get_walker(config, src_storage, config.list_format)
+                _run(config, walker.walk)
+            finally:
+                src_storage.close()
+                _report_stats(config)
         else:
-            dest_storage = _get_storage(config, config.dest, 1)
-            sync = Sync(config, src_storage, dest_storage)
-            sync.run()
+            dest_storage = _get_storage(config, plan.dest if plan else config.dest, 1, resilients)
+            metrics = None
+            is_complete = False
+            try:
+                sync = Sync(config, src_storage, dest_storage)
+                if config.metrics_file:
+                    metrics = MetricsFile(config, sync, *((plan.src, plan.dest) if plan else (config.src, config.dest)),
+                                          resilients)
+                    metrics.start()
+                _run(config, sync.run, plan)
+                is_complete = True
+            finally:
+                src_storage.close()
+                dest_storage.close()
+                if metrics:
+                    metrics.stop(is_complete)
+                _report_stats(config)
 
     except URLError as err:
         logger.error(f"error connecting to server: {err}")
@@ -77,6 +140,9 @@ def main():
     except NotImplementedError as err:
         logger.error(f"feature not supported: {err}")
         exit(1)
+    except PlanError as err:
+        logger.error(err)
+        exit(1)
     except KeyboardInterrupt:
         exit()
 
@@ -0,0 +1,129 @@
+import os
+import time
+import sqlite3
+import logging
+from threading import Lock
+
+DEFAULT_MAX_ENTRIES = 1000000
+# Writes are committed in batches, and the size bound is enforced when committing
+COMMIT_EVERY = 1000
+# A hit only updates the entry's last used time once it's this old, so an unchanged library
+# isn't rewritten on every run. Least recently used entries are only accurate to within a day.
+LAST_USED_RESOLUTION_SEC = 24 * 60 * 60
+logger = logging.getLogger(__name__)
+
+class ChecksumCache:
+    """A persistent cache of file checksums.
+
+    Entries are keyed by device and inode, and are only used while the file's size and
+    modification time are unchanged, so unchanged files don't need to be read again.
+
+    Args:
+        path: The file system path of the cache database.
+        max_entries: The maximum number of entries to keep, the least recently used entries are
+            removed first.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self._path = path
+        self._max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self._lock = Lock()
+        self._pending = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS checksums (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                md5 TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (dev, ino))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS checksums_last_used ON checksums (last_used)")
+
+    def get(self, stat):
+        """Looks up the checksum of a file.
+
+        Args:
+            stat: The os.stat_result of the file.
+
+        Returns:
+            The md5 checksum, or None if the file isn't cached or has changed.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5, last_used FROM checksums WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                (*_key(stat), stat.st_size, stat.st_mtime_ns)).fetchone()
+            if not row:
+                return None
+            checksum, last_used = row
+            now = time.time()
+            if now - last_used >= LAST_USED_RESOLUTION_SEC:
+                self._db.execute(
+                    "UPDATE checksums SET last_used = ? WHERE dev = ? AND ino = ?",
+                    (now, *_key(stat)))
+                self._wrote()
+            return checksum
+
+    def put(self, path, stat, checksum):
+        """Stores the checksum of a file, replacing any stale entry for the same file.
+
+        Args:
+            path: The file system path of the file.
+            stat: The os.stat_result of the file, taken before it was read.
+            checksum: The md5 checksum.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checksums (dev, ino, size, mtime_ns, path, md5, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*_key(stat), stat.st_size, stat.st_mtime_ns, path, checksum, time.time()))
+            self._wrote()
+
+    def prune(self):
+        """Removes entries for files that no longer exist or have changed.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT dev, ino, size, mtime_ns, path FROM checksums").fetchall()
+            stale = [(dev, ino) for dev, ino, size, mtime_ns, path in rows
+                     if not self._is_current(path, dev, ino, size, mtime_ns)]
+            self._db.executemany("DELETE FROM checksums WHERE dev = ? AND ino = ?", stale)
+            self._commit()
+            self._db.execute("VACUUM")
+            return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+    def _wrote(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._commit()
+
+    def _commit(self):
+        count = self._db.execute("SELECT COUNT(*) FROM checksums").fetchone()[0]
+        if count > self._max_entries:
+            logger.debug(f"checksum cache full, removing {count - self._max_entries} least recently used entries")
+            self._db.execute(
+                "DELETE FROM checksums WHERE rowid IN (SELECT rowid FROM checksums ORDER BY last_used LIMIT ?)",
+                (count - self._max_entries,))
+        self._db.commit()
+        self._pending = 0
+
+    @staticmethod
+    def _is_current(path, dev, ino, size, mtime_ns):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (*_key(stat), stat.st_size, stat.st_mtime_ns) == (dev, ino, size, mtime_ns)
+
+def _key(stat):
+    # Device and inode numbers are unsigned 64 bit but sqlite integers are signed
+    return tuple(x - 2 ** 64 if x >= 2 ** 63 else x for x in (stat.st_dev, stat.st_ino))
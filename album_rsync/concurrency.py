@@ -0,0 +1,126 @@
+import logging
+import threading
+from collections import deque
+
+# Outcomes of a call
+SUCCESS = 'success'
+CONGESTED = 'congested'
+FAILED = 'failed'
+
+# The number of latencies to calculate the p95 latency from
+WINDOW = 20
+# Cut the limit when the p95 latency is this many times the best seen
+LATENCY_TOLERANCE = 2.0
+DECREASE_FACTOR = 0.5
+# Transfer times depend mostly on file size, so only rate limits and timeouts signal that
+# transfers are congested
+TRANSFER = 'transfer'
+
+logger = logging.getLogger(__name__)
+
+class ConcurrencyController:
+    """Adapts the number of calls in flight to a provider using AIMD.
+
+    The limit grows by one each time a full limit's worth of calls succeed, and is cut in half
+    when the provider shows signs of overload: a rate limit response, a timeout or, for calls
+    other than transfers, the p95 latency rising well above the best seen. Calls beyond the limit wait for a slot, so with more
+    transfer workers than the limit allows the extra workers sit idle until it grows.
+
+    Slots are reentrant per thread, so a call made while already holding a slot, e.g. refreshing
+    an access token, doesn't wait on itself.
+
+    Args:
+        max_limit: The most calls to allow in flight.
+        min_limit: The fewest calls to allow in flight.
+        initial_limit: The number of calls to allow in flight to begin with.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial_limit=1):
+        self._max_limit = max(1, max_limit)
+        self._min_limit = max(1, min(min_limit, self._max_limit))
+        self._limit = max(self._min_limit, min(initial_limit, self._max_limit))
+        self._in_flight = 0
+        self._successes = 0
+        # Completions to ignore after a cut, they were already in flight at the old limit
+        self._cooldown = 0
+        self._latencies = {}
+        self._baselines = {}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def acquire(self):
+        """Waits for a slot to make a call in."""
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            with self._cond:
+                while self._in_flight >= self._limit:
+                    self._cond.wait()
+                self._in_flight += 1
+        self._local.depth = depth + 1
+
+    def release(self, kind, outcome, latency_sec=None):
+        """Frees the slot taken by acquire and records the outcome of the call.
+
+        Args:
+            kind: The kind of call, latencies are compared between calls of the same kind,
+                except for transfers.
+            outcome: SUCCESS, CONGESTED or FAILED.
+            latency_sec: How long a successful call took.
+        """
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        with self._cond:
+            self._in_flight -= 1
+            self._record(kind, outcome, latency_sec)
+            self._cond.notify_all()
+
+    def _record(self, kind, outcome, latency_sec):
+        if self._cooldown:
+            self._cooldown -= 1
+        if outcome == CONGESTED:
+            self._decrease(f"{kind} call was rate limited or timed out")
+        elif outcome == SUCCESS:
+            if kind == TRANSFER:
+                self._add_success()
+                return
+            latencies = self._latencies.setdefault(kind, deque(maxlen=WINDOW))
+            latencies.append(latency_sec)
+            if len(latencies) == WINDOW and self._is_latency_rising(kind, latencies):
+                return
+            self._add_success()
+
+    def _add_success(self):
+        self._successes += 1
+        if self._successes >= self._limit and self._limit < self._max_limit:
+            self._set_limit(self._limit + 1, "calls are healthy")
+
+    def _is_latency_rising(self, kind, latencies):
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        baseline = self._baselines.get(kind)
+        if baseline is None or p95 < baseline:
+            self._baselines[kind] = p95
+            return False
+        if p95 <= baseline * LATENCY_TOLERANCE or self._cooldown:
+            return False
+        latencies.clear()
+        # Only cut again if latency keeps rising beyond this level
+        self._baselines[kind] = p95 / LATENCY_TOLERANCE
+        self._decrease(f"{kind} p95 latency rose to {round(p95, 2)} sec from {round(baseline, 2)} sec")
+        return True
+
+    def _decrease(self, reason):
+        if self._cooldown:
+            return
+        self._set_limit(max(self._min_limit, int(self._limit * DECREASE_FACTOR)), reason)
+        self._cooldown = self._in_flight
+
+    def _set_limit(self, limit, reason):
+        self._successes = 0
+        if limit != self._limit:
+            logger.debug(f"concurrency limit {self._limit} -> {limit}, {reason}")
+            self._limit = limit
@@ -8,6 +8,7 @@ from ._version import __version__
 __packagename__ = 'album-rsync'
 CONFIG_FILENAME = __packagename__ + '.ini'
 TOKEN_FILENAME = __packagename__ + '.token'
+CHECKSUM_CACHE_FILENAME = __packagename__ + '.checksums'
 logger = logging.getLogger(__name__)
 
 FILES_SECTION = 'Files'
@@ -23,25 +24,50 @@ DEFAULTS = {
     'list_only': False,
     'list_format': 'tree',
     'list_sort': False,
+    'list_sort_buffer': 100000,
     'list_folders': False,
+    'walker_engine': 'generator',
+    'prefetch': 0,
     'delete': False,
     'checksum': False,
+    'checksum_cache': '',
+    'checksum_cache_size': 1000000,
+    'no_checksum_cache': False,
+    'checksum_workers': 0,
+    'prune_checksum_cache': False,
     'include': r'\.(jpg|jpeg|png|gif|tiff|tif|bmp|psd|svg|raw|wmv|avi|mov|mpg|mp4|3gp|ogg|ogv|m2ts)$',
     'include_dir': '',
     'exclude': r'^\.',
     'exclude_dir': '',
     'root_files': False,
     'dry_run': False,
+    'plan_out': '',
+    'apply_plan': '',
+    'journal': '',
     'throttling': 0.5,
+    'burst': 1,
+    'transfer_throttling': None,
     'retry': 5,
+    'jobs': 1,
+    'adaptive_concurrency': False,
+    'pool_size': 10,
+    'no_keep_alive': False,
     'flickr_api_key': '',
     'flickr_api_secret': '',
     'flickr_tags': __packagename__,
     'flickr_is_public': 0,
     'flickr_is_friend': 0,
     'flickr_is_family': 0,
+    'flickr_base_url': '',
     'google_api_key': '',
     'google_api_secret': '',
+    'google_base_url': '',
+    'stats': False,
+    'stats_json': '',
+    'metrics_file': '',
+    'metrics_interval': 60,
+    'profile': '',
+    'profile_mode': 'cprofile',
     'verbose': False
 }
 
@@ -49,9 +75,14 @@ class Config:
 
     LIST_FORMAT_TREE = 'tree'
     LIST_FORMAT_CSV = 'csv'
+    LIST_FORMAT_JSONL = 'jsonl'
+    WALKER_ENGINE_GENERATOR = 'generator'
+    WALKER_ENGINE_RX = 'rx'
     PATH_FLICKR = 'flickr'
     PATH_GOOGLE = 'google'
     PATH_FAKE = 'fake'
+    PROFILE_MODE_CPROFILE = 'cprofile'
+    PROFILE_MODE_SAMPLE = 'sample'
 
     def __init__(self):
         self._args = {}
@@ -67,16 +98,32 @@ class Config:
                             help='the destination directory to copy files to, or FLICKR to specify flickr')
         parser.add_argument('-l', '--list-only', action='store_true',
                             help='list the files in --src instead of copying them')
-        parser.add_argument('--list-format', choices=[self.LIST_FORMAT_TREE, self.LIST_FORMAT_CSV],
-                            help='output format for --list-only, TREE for a tree based output or CSV')
+        parser.add_argument('--list-format', choices=[self.LIST_FORMAT_TREE, self.LIST_FORMAT_CSV, self.LIST_FORMAT_JSONL],
+                            help='output format for --list-only, TREE for a tree based output, CSV or JSONL for a JSON record per file')
         parser.add_argument('--list-sort', action='store_true',
-                            help='sort alphabetically when --list-only, note that this forces buffering of remote sources so will be slower')
+                            help='sort alphabetically when --list-only, note that this buffers the files in each folder so will be slower')
+        parser.add_argument('--list-sort-buffer', type=int, metavar='NUM',
+                            help='the most files to sort in memory when --list-sort, larger folders are sorted through temporary files. 0 for no limit')
         parser.add_argument('--list-folders', action='store_true',
                             help='lists only folders (no files, implies --list-only)')
+        parser.add_argument('--prefetch', type=int, metavar='NUM',
+                            help='when listing, list the files in the next NUM folders in parallel')
+        parser.add_argument('--walker-engine', choices=[self.WALKER_ENGINE_GENERATOR, self.WALKER_ENGINE_RX],
+                            help='how to produce listings, GENERATOR or RX to use RxPY pipelines (requires the rx package)')
         parser.add_argument('--delete', action='store_true',
                             help='WARNING: permanently deletes additional files in destination')
         parser.add_argument('-c', '--checksum', action='store_true',
                             help='calculate md5 file checksums for local files. Print checksum when listing, add checksum tag to flickr')
+        parser.add_argument('--checksum-cache', type=str, metavar='FILE',
+                            help='the file to cache checksums of unchanged local files in. Defaults to ~/.' + CHECKSUM_CACHE_FILENAME)
+        parser.add_argument('--checksum-cache-size', type=int, metavar='NUM',
+                            help='the maximum number of checksums to cache, least recently used checksums are removed first')
+        parser.add_argument('--no-checksum-cache', action='store_true',
+                            help='always read files to calculate checksums, don\'t use the checksum cache')
+        parser.add_argument('--checksum-workers', type=int, metavar='NUM',
+                            help='the number of files to calculate checksums for in parallel. Defaults to the number of CPUs')
+        parser.add_argument('--prune-checksum-cache', action='store_true',
+                            help='remove cached checksums of files that no longer exist or have changed, then exit')
         parser.add_argument('--include', type=str, metavar='REGEX',
                             help='include only files matching REGEX. Defaults to media file extensions only')
         parser.add_argument('--include-dir', type=str, metavar='REGEX',
@@ -89,10 +136,30 @@ class Config:
                             help='includes roots files (not in a directory or a photoset) in the list or copy')
         parser.add_argument('-n', '--dry-run', action='store_true',
                             help='in sync mode, don\'t actually copy anything, just simulate the process and output')
+        parser.add_argument('--plan-out', type=str, metavar='FILE',
+                            help='in sync mode, don\'t copy anything, write the files to copy and delete to FILE')
+        parser.add_argument('--apply-plan', type=str, metavar='FILE',
+                            help='apply a plan written by --plan-out, without listing the source or destination files again')
+        parser.add_argument('--journal', type=str, metavar='FILE',
+                            help='record completed copies and deletes in FILE, so an interrupted sync can resume where it left off')
         parser.add_argument('--throttling', type=float, metavar='SEC',
                             help='the delay in seconds (may be decimal) before each network call')
+        parser.add_argument('--burst', type=int, metavar='NUM',
+                            help='the number of network calls allowed without a delay after a quiet period')
+        parser.add_argument('--transfer-throttling', type=float, metavar='SEC',
+                            help='the delay in seconds (may be decimal) before each upload or download, '
+                            'if set these are limited separately to other network calls')
         parser.add_argument('--retry', type=int, metavar='NUM',
                             help='the number of times to retry a network call (using exponential backoff) before failing')
+        parser.add_argument('-j', '--jobs', type=int, metavar='NUM',
+                            help='the number of files to transfer in parallel')
+        parser.add_argument('--adaptive-concurrency', action='store_true',
+                            help='adjust the number of network calls in flight to how the remote service is responding, '
+                            'up to JOBS')
+        parser.add_argument('--pool-size', type=int, metavar='NUM',
+                            help='the number of connections to keep open to Google, at least JOBS + 1')
+        parser.add_argument('--no-keep-alive', action='store_true',
+                            help='open a new connection for each network call to Google instead of reusing connections')
 
         parser.add_argument('--flickr-api-key', type=str,
                             help='flickr API key')
@@ -107,6 +174,19 @@ class Config:
         parser.add_argument('--logout', action='store_true',
                             help='logout of remote storage provider (determined by src)')
 
+        parser.add_argument('--stats', action='store_true',
+                            help='print the time spent listing, hashing, transferring and deleting, and the latency of each network call')
+        parser.add_argument('--stats-json', type=str, metavar='FILE',
+                            help='write the timings reported by --stats to FILE as JSON')
+        parser.add_argument('--metrics-file', type=str, metavar='FILE',
+                            help='in sync mode, write progress metrics to FILE for the Prometheus node_exporter textfile collector')
+        parser.add_argument('--metrics-interval', type=float, metavar='SEC',
+                            help='how often to rewrite --metrics-file during a sync, 0 to only write it at the end')
+        parser.add_argument('--profile', type=str, metavar='FILE',
+                            help='profile the list or sync, writing a pstats dump to FILE and the hot functions to FILE.txt')
+        parser.add_argument('--profile-mode', choices=[self.PROFILE_MODE_CPROFILE, self.PROFILE_MODE_SAMPLE],
+                            help='CPROFILE to trace every function call, or SAMPLE to sample every thread\'s stack '
+                            'with little overhead, e.g. for long runs')
         parser.add_argument('-v', '--verbose', action='store_true',
                             help='increase verbosity')
         parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
@@ -186,10 +266,19 @@ class Config:
             'list_only': bool,
             'list_format': lambda item: item.lower(),
             'list_sort': bool,
+            'list_sort_buffer': int,
             'list_folders': bool,
+            'walker_engine': lambda item: item.lower(),
+            'prefetch': int,
             'delete': bool,
             'checksum': bool,
+            'checksum_cache_size': int,
+            'no_checksum_cache': bool,
+            'checksum_workers': int,
             'dry_run': bool,
+            'stats': bool,
+            'metrics_interval': float,
+            'profile_mode': lambda item: item.lower(),
             'verbose': bool
         })
         options.update(items)
@@ -199,7 +288,13 @@ class Config:
             return
         items = self._read_section(config, NETWORK_SECTION, {
             'throttling': float,
-            'retry': int
+            'burst': int,
+            'transfer_throttling': float,
+            'retry': int,
+            'jobs': int,
+            'adaptive_concurrency': bool,
+            'pool_size': int,
+            'no_keep_alive': bool
         })
         options.update(items)
 
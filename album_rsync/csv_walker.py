@@ -2,14 +2,22 @@ import sys
 import time
 import logging
 import csv
-from rx import Observable
+from itertools import chain
 from .walker import Walker
 from .folder import RootFolder
-from .utils import unpack
+from .pipeline import prefetch
+from .sorting import sort_files
+from .stats import stats
 
 logger = logging.getLogger(__name__)
 
 class CsvWalker(Walker):
+    """Prints a CSV of folders and files.
+
+    When sorting, folders are sorted first and then the files in each folder, so only one
+    folder's files are buffered at a time, and folders larger than the sort buffer are sorted
+    through temporary files.
+    """
 
     def __init__(self, config, storage):
         self._config = config
@@ -19,28 +27,28 @@ class CsvWalker(Walker):
     def walk(self):
         start = time.time()
 
-        # Create source stream
-        folders = Observable.from_(self._storage.list_folders())
+        folders = stats.timed('list-folders', self._storage.list_folders)
         if self._config.root_files:
-            folders = folders.start_with(RootFolder())
+            folders = chain([RootFolder()], folders)
+        if self._config.list_sort:
+            folders = sorted(folders, key=lambda folder: folder.name)
         if self._config.list_folders:
             self._writer.writerow(["Folder"])
-            if self._config.list_sort:
-                folders = folders.to_sorted_list(key_selector=lambda folder: folder.name) \
-                    .flat_map(lambda x: x)
-            folders.subscribe(on_next=lambda folder: self._writer.writerow([folder.name if folder else '']),
-                              on_completed=lambda: self._print_summary(time.time() - start))
+            for folder in folders:
+                self._writer.writerow([folder.name if folder else ''])
         else:
             self._writer.writerow(["Folder", "Filename", "Checksum"])
-            # Expand folder stream into file stream
-            files = folders.concat_map(lambda folder: Observable.from_((file_, folder) for file_ in self._storage.list_files(folder)))
-            # Print each file
-            if self._config.list_sort:
-                files = files.to_sorted_list(key_selector=lambda x: "{} {}".format(x[1].name, x[0].name)) \
-                    .flat_map(lambda x: x)
-            files.subscribe(on_next=unpack(lambda file_, folder: self._print_file(folder, file_)),
-                            on_completed=lambda: self._print_summary(time.time() - start))
-
+            for folder, files in prefetch(self._list_files, folders, self._config.prefetch):
+                for file_ in files:
+                    self._print_file(folder, file_)
+        self._print_summary(time.time() - start)
+
+    def _list_files(self, folder):
+        files = stats.timed('list-files', self._storage.list_files, folder)
+        if self._config.list_sort:
+            return sort_files(files, self._config.list_sort_buffer)
+        # Prefetched files are listed on another thread, so must be listed before they're returned
+        return list(files) if self._config.prefetch else files
 
     def _print_file(self, folder, file_):
         self._writer.writerow([folder.name if folder else '', file_.name, file_.checksum])
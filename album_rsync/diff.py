@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+COPY = 'copy'
+SKIP = 'skip'
+DELETE = 'delete'
+
+Action = namedtuple('Action', ['kind', 'file'])
+
+def normalise_name(name):
+    """Builds the key used to match files between storage providers.
+
+    Names are matched case insensitively, and `.jpeg` is considered the same as `.jpg` because
+    Flickr converts `.jpeg` extensions to `.jpg`.
+
+    Args:
+        name: The file name.
+
+    Returns:
+        The normalised name.
+    """
+    key = name.casefold()
+    if key.endswith('.jpeg'):
+        key = key[:-5] + '.jpg'
+    return key
+
+def diff(src_files, dest_files, delete=False):
+    """Plans the actions required to make a destination folder match a source folder.
+
+    Both sides are indexed by normalised name once, so a diff runs in linear time.
+
+    Args:
+        src_files: A list of File objects in the source folder.
+        dest_files: A list of File objects in the destination folder.
+        delete: Whether to emit delete actions for extra files in the destination.
+
+    Returns:
+        A generator of Action objects, copies and skips in source order followed by deletes in
+        destination order.
+    """
+    dest_keys = {normalise_name(f.name) for f in dest_files}
+    src_keys = set()
+    for src_file in src_files:
+        key = normalise_name(src_file.name)
+        src_keys.add(key)
+        yield Action(SKIP if key in dest_keys else COPY, src_file)
+
+    if delete:
+        for dest_file in dest_files:
+            if normalise_name(dest_file.name) not in src_keys:
+                yield Action(DELETE, dest_file)
@@ -1,35 +1,162 @@
+import re
+import math
 import time
 import random
+import threading
+from urllib.error import URLError
 from .storage import Storage
 from .file import File
 from .folder import Folder, RootFolder
 
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+def _parse_size(value):
+    match = re.match(r'^(\d+(?:\.\d+)?)\s*([kmg]?)b?$', value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+class FakeSpec:
+    """The shape of a synthetic FakeStorage, parsed from a path like `fake:folders=100,files=1000`.
+
+    Options:
+        folders: The number of folders.
+        files: The number of files in each folder.
+        root: The number of files not in a folder.
+        present: The fraction (0 to 1) of files that exist, e.g. 0.5 for a destination holding
+            half of what the source has.
+        size: The mean file size in bytes, may have a K, M or G suffix.
+        size_spread: The spread of file sizes, 0 for all the same size, otherwise the sigma of
+            a log-normal distribution.
+        seed: Seeds every random choice, the same spec always produces the same files and delays.
+        list_ms, copy_ms, delete_ms: The mean latency in milliseconds of each operation.
+        jitter: The fraction (0 to 1) latencies vary either side of the mean.
+        bandwidth: Copies take an extra size / bandwidth (in MB/s) seconds, 0 for no limit.
+        errors: The fraction (0 to 1) of copies that fail.
+    """
+
+    OPTIONS = {
+        'folders': int,
+        'files': int,
+        'root': int,
+        'present': float,
+        'size': _parse_size,
+        'size_spread': float,
+        'seed': int,
+        'list_ms': float,
+        'copy_ms': float,
+        'delete_ms': float,
+        'jitter': float,
+        'bandwidth': float,
+        'errors': float
+    }
+
+    def __init__(self, folders=10, files=100, root=0, present=1.0, size=2 * 1024 ** 2, size_spread=0.5, seed=0,
+                 list_ms=0, copy_ms=0, delete_ms=0, jitter=0.5, bandwidth=0, errors=0):
+        self.folders = folders
+        self.files = files
+        self.root = root
+        self.present = present
+        self.size = size
+        self.size_spread = size_spread
+        self.seed = seed
+        self.list_ms = list_ms
+        self.copy_ms = copy_ms
+        self.delete_ms = delete_ms
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.errors = errors
+
+    @classmethod
+    def parse(cls, path):
+        """Parses a fake storage path.
+
+        Args:
+            path: The path, e.g. `fake:folders=100,files=1000,copy_ms=200`.
+
+        Returns:
+            A FakeSpec, or None if the path has no options (the original hard-coded data set).
+
+        Raises:
+            ValueError: If an option is unrecognised or its value is invalid.
+        """
+        _, _, options = path.partition(':')
+        if not options:
+            return None
+        kwargs = {}
+        for option in options.split(','):
+            key, _, value = option.partition('=')
+            key = key.strip().lower()
+            if key not in cls.OPTIONS:
+                raise ValueError(f"Unrecognised fake storage option: {key}")
+            try:
+                kwargs[key] = cls.OPTIONS[key](value.strip())
+            except ValueError:
+                raise ValueError(f"Invalid value for fake storage option {key}: {value}")
+        return cls(**kwargs)
+
 class FakeStorage(Storage):
-    def __init__(self, config, instance_count):
+    """A storage provider for testing and benchmarking, which holds no real files.
+
+    With no spec it holds a small hard-coded data set. With a FakeSpec it generates folders and
+    files as they're listed, so very large libraries can be simulated without holding them in
+    memory, and each operation sleeps for a latency drawn from a seeded distribution.
+    """
+
+    def __init__(self, config, instance_count, spec=None):
         self.path = ''
         self._config = config
         self._instance = instance_count
-        self._folders = self._fake_data()
+        self._spec = spec
+        self._folders = self._fake_data() if not spec else None
+        self._deleted_files = set()
+        self._deleted_folders = set()
+        self._lock = threading.Lock()
 
     def list_folders(self):
+        if self._spec:
+            self._simulate('list', 'folders', self._spec.list_ms)
+            return (Folder(id=i, name=_folder_name(i)) for i in range(self._spec.folders)
+                    if i not in self._deleted_folders)
         return (self._intense_calculation(f['folder']) for f in self._folders if not f['folder'].is_root)
 
     def list_files(self, folder):
+        if self._spec:
+            self._simulate('list', folder.id, self._spec.list_ms)
+            return self._generate_files(folder)
         files = next((f['files'] for f in self._folders \
             if f['folder'] == folder or (f['folder'].is_root and folder.is_root)), [])
         return (self._intense_calculation(f) for f in files)
 
     def copy_file(self, file_, folder_name, dest_storage):
-        self._intense_calculation(None)
+        if not self._spec:
+            self._intense_calculation(None)
+            return
+        bandwidth_sec = file_.size / (self._spec.bandwidth * 1024 ** 2) if self._spec.bandwidth else 0
+        self._simulate('copy', file_.id, self._spec.copy_ms, bandwidth_sec)
+        if self._spec.errors and self._random('error', file_.id).random() < self._spec.errors:
+            raise URLError(f"simulated error copying {file_.name}")
 
     def delete_file(self, file_, folder_name):
+        if self._spec:
+            self._simulate('delete', file_.id, self._spec.delete_ms)
+            with self._lock:
+                self._deleted_files.add(file_.id)
+            return
         folder = next((f for f in self._folders \
             if f['folder'].name == folder_name or (not folder_name and f['folder'].is_root)))
-        folder['files'].remove(file_)
+        folder['files'] = [f for f in folder['files'] if f.id != file_.id]
 
     def delete_folder(self, folder):
+        if self._spec:
+            self._simulate('delete', folder.id, self._spec.delete_ms)
+            if any(True for _ in self._generate_files(folder)):
+                return False
+            with self._lock:
+                self._deleted_folders.add(folder.id)
+            return True
         to_delete = next(f for f in self._folders \
-            if f['folder'] == folder or (f['folder'].is_root and folder.is_root))
+            if f['folder'].id == folder.id or (f['folder'].is_root and folder.is_root))
         if to_delete['files']:
             return False
         self._folders.remove(to_delete)
@@ -38,6 +165,39 @@ class FakeStorage(Storage):
     def logout(self):
         pass
 
+    def _generate_files(self, folder):
+        spec = self._spec
+        if folder.is_root:
+            count, first_id = spec.root, spec.folders * spec.files
+        else:
+            count, first_id = spec.files, folder.id * spec.files
+        for i in range(count):
+            id_ = first_id + i
+            if id_ in self._deleted_files:
+                continue
+            rand = self._random('file', id_)
+            if rand.random() >= spec.present:
+                continue
+            yield File(id=id_, name=f'IMG_{id_:07}.jpg', size=self._file_size(rand))
+
+    def _file_size(self, rand):
+        if not self._spec.size_spread:
+            return self._spec.size
+        # A log-normal distribution with the configured mean
+        sigma = self._spec.size_spread
+        return max(1, int(rand.lognormvariate(math.log(self._spec.size) - sigma ** 2 / 2, sigma)))
+
+    def _simulate(self, operation, key, mean_ms, extra_sec=0):
+        if not mean_ms and not extra_sec:
+            return
+        jitter = self._spec.jitter
+        latency_ms = mean_ms * self._random(operation, key).uniform(1 - jitter, 1 + jitter)
+        time.sleep(latency_ms / 1000 + extra_sec)
+
+    def _random(self, purpose, key):
+        # Seed each choice separately so results don't depend on the order of calls between threads
+        return random.Random(f'{self._spec.seed}:{purpose}:{key}')
+
     def _intense_calculation(self, value):
         # sleep for a random short duration between 0.5 to 2.0 seconds to simulate a long-running calculation
         time.sleep(random.randint(2, 6) * .1)
@@ -58,3 +218,6 @@ class FakeStorage(Storage):
             {'folder': Folder(id=4, name='C Folder'), 'files': [File(id=41, name='B File')]},
             {'folder': Folder(id=5, name='D Folder'), 'files': [File(id=50, name='A File')]},
         ]
+
+def _folder_name(index):
+    return f'Folder {index:05}'
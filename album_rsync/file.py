@@ -6,6 +6,17 @@ class File:
         self.full_path = kwargs.get('full_path')
         self.checksum = kwargs.get('checksum')
         self.url = kwargs.get('url')
+        self.size = kwargs.get('size')
+        # Seconds since the epoch the file was modified, or uploaded or created for remote providers
+        self.mtime = kwargs.get('mtime')
+        self.media_type = kwargs.get('media_type')
+
+    def to_dict(self):
+        return {k: v for k, v in vars(self).items() if v is not None}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
 
     def __repr__(self):
         return "File: {{id={}, name={}}}".format(self.id, self.name)
@@ -1,12 +1,18 @@
 import os
 import webbrowser
 import logging
+import importlib
+import urllib.request
+from threading import Lock
+from functools import partial
+from contextlib import contextmanager, ExitStack
 import flickr_api
 from .storage import RemoteStorage
 from .file import File
 from .folder import Folder
 from .config import __packagename__
-from .utils import choice
+from .utils import choice, guess_media_type
+from .stream import CHUNK_SIZE
 
 """
 About Tags
@@ -30,6 +36,15 @@ CHECKSUM_PREFIX = 'checksum:md5'
 EXTENSION_PREFIX = 'flickrrsync:extn'
 OAUTH_PERMISSIONS_WRITE = 'write'
 OAUTH_PERMISSIONS_DELETE = 'delete'
+DOWNLOAD_TIMEOUT_SEC = 60
+# The extra photo fields to list, the file name and checksum come from the format and tags
+LIST_EXTRAS = 'original_format,tags,date_upload'
+# The Flickr API error code for an unknown photoset
+PHOTOSET_NOT_FOUND = 1
+REST_PATH = '/services/rest/'
+UPLOAD_PATH = '/services/upload/'
+# flickr_api exports the upload function in place of the module
+_upload_module = importlib.import_module('flickr_api.upload')
 logger = logging.getLogger(__name__)
 
 class FlickrStorage(RemoteStorage):
@@ -41,6 +56,11 @@ class FlickrStorage(RemoteStorage):
         self._user = None
         self._photosets = {}
         self._photos = {}
+        self._has_listed_photosets = False
+        self._photosets_lock = Lock()
+        self._exit_stack = ExitStack()
+        if config.flickr_base_url:
+            self._exit_stack.enter_context(redirect_flickr_api(config.flickr_base_url))
 
     def list_folders(self):
         """
@@ -57,6 +77,7 @@ class FlickrStorage(RemoteStorage):
             folder = Folder(id=photoset.id, name=photoset.title)
             if self._should_include(folder.name, self._config.include_dir, self._config.exclude_dir):
                 yield folder
+        self._has_listed_photosets = True
 
     def list_files(self, folder):
         """
@@ -78,12 +99,12 @@ class FlickrStorage(RemoteStorage):
             walker = self._resiliently.call(
                 flickr_api.objects.Walker,
                 self._photosets[folder.id].getPhotos,
-                extras='original_format,tags')
+                extras=LIST_EXTRAS)
         else:
             walker = self._resiliently.call(
                 flickr_api.objects.Walker,
                 self._user.getNotInSetPhotos,     #pylint: disable=no-member
-                extras='original_format,tags')
+                extras=LIST_EXTRAS)
 
         for photo in walker:
             self._photos[photo.id] = photo
@@ -102,12 +123,29 @@ class FlickrStorage(RemoteStorage):
         Raises:
             KeyError: If the file_.id is unrecognised
         """
+        self._authenticate()
         self.mkdirp(dest)
-        photo = self._photos[file_.id]
-        is_video = photo.media == 'video'
-        size = 'Video Original' if is_video else 'Original'
+        photo = self._get_photo(file_)
         dest_without_extn = os.path.splitext(dest)[0]
-        self._resiliently.call(photo.save, dest_without_extn, size_label=size)
+        self._resiliently.transfer(photo.save, dest_without_extn, size_label=self._get_original_size_label(photo))
+
+    def download_stream(self, file_):
+        """
+        Opens a photo from Flickr for streaming
+
+        Only opening the download is retried, errors reading the body are raised
+
+        Args:
+            file_: The file info object (as returned by list_files) of the file to download
+
+        Returns:
+            A generator of the photo contents in chunks of bytes
+        """
+        self._authenticate()
+        photo = self._get_photo(file_)
+        url = self._resiliently.call(photo.getPhotoFile, self._get_original_size_label(photo))
+        resp = self._resiliently.transfer(urllib.request.urlopen, url, timeout=DOWNLOAD_TIMEOUT_SEC)
+        return self._read_chunks(resp)
 
     def upload(self, src, folder_name, file_name, checksum):
         """
@@ -121,13 +159,14 @@ class FlickrStorage(RemoteStorage):
         Raises:
             KeyError: If the file_.id is unrecognised
         """
+        self._authenticate()
         title, extension = os.path.splitext(file_name)
         tags = '{} "{}={}"'.format(self._config.flickr_tags, EXTENSION_PREFIX, extension[1:])
         if checksum:
             tags = '{} {}={}'.format(tags, CHECKSUM_PREFIX, checksum)
 
         # Have to pass arguments as a dict because `async` is a keyword
-        photo = self._resiliently.call(flickr_api.upload, **{
+        photo = self._resiliently.transfer(flickr_api.upload, **{
             'photo_file': src,
             'title': title,
             'tags': tags.strip(),
@@ -137,27 +176,61 @@ class FlickrStorage(RemoteStorage):
             'async': 0})
 
         if folder_name:
-            photoset = self._get_folder_by_name(folder_name)
-            if not photoset:
-                photoset = self._resiliently.call(flickr_api.Photoset.create, title=folder_name, primary_photo=photo)
-                self._photosets[photoset.id] = photoset
-            else:
-                self._resiliently.call(photoset.addPhoto, photo=photo)
+            # Parallel transfers may upload to the same new photoset, only create it once
+            with self._photosets_lock:
+                photoset = self._get_folder_by_name(folder_name)
+                if not photoset:
+                    photoset = self._resiliently.call(flickr_api.Photoset.create, title=folder_name, primary_photo=photo)
+                    self._photosets[photoset.id] = photoset
+                    return
+            self._resiliently.call(photoset.addPhoto, photo=photo)
 
     def delete_file(self, file_, folder_name):
-        photo = self._photos[file_.id]
+        self._authenticate()
+        photo = self._get_photo(file_)
         self._resiliently.call(photo.delete)
-        del self._photos[file_.id]
+        self._photos.pop(file_.id, None)
 
     def delete_folder(self, folder):
-        photoset = self._photosets[folder.id]
-        self._resiliently.call(photoset.delete)
-        del self._photosets[folder.id]
+        self._authenticate()
+        photoset = self._photosets.get(folder.id) or flickr_api.Photoset(id=folder.id)
+        try:
+            self._resiliently.call(photoset.delete)
+        except flickr_api.flickrerrors.FlickrAPIError as err:
+            # Flickr deletes a photoset itself once its last photo is deleted
+            if err.code != PHOTOSET_NOT_FOUND:
+                raise
+        self._photosets.pop(folder.id, None)
+        return True
 
     def logout(self):
         self._config.save_tokens(self._config.PATH_FLICKR, {})
 
+    def close(self):
+        self._exit_stack.close()
+
+    @staticmethod
+    def _read_chunks(resp):
+        with resp:
+            while True:
+                data = resp.read(CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+
+    @staticmethod
+    def _get_original_size_label(photo):
+        return 'Video Original' if photo.media == 'video' else 'Original'
+
+    def _get_photo(self, file_):
+        # Photos from an applied plan haven't been listed, load them lazily by id
+        return self._photos.get(file_.id) or flickr_api.Photo(id=file_.id)
+
     def _get_folder_by_name(self, name):
+        if not self._has_listed_photosets:
+            # Ensure existing photosets are known before uploading, e.g. when applying a plan
+            for _ in self.list_folders():
+                pass
         return next((x for x in self._photosets.values() if x.title.lower() == name.lower()), None)
 
     def _get_file(self, photo):
@@ -173,7 +246,10 @@ class FlickrStorage(RemoteStorage):
             extension = photo.originalformat
         if extension:
             name += "." + extension
-        return File(id=photo.id, name=name, checksum=checksum)
+        # get() reads the listed attributes, where reading a missing attribute loads the photo with another call
+        date_upload = photo.get('dateupload')
+        return File(id=photo.id, name=name, checksum=checksum, mtime=int(date_upload) if date_upload else None,
+                    media_type=guess_media_type(name))
 
     def _authenticate(self):
         if self._is_authenticated:
@@ -208,3 +284,23 @@ class FlickrStorage(RemoteStorage):
                 "Use -v / --verbose to list the ensure the correct settings are being used\n"
                 "Go to http://www.flickr.com/services/apps/create/apply to apply for a Flickr API key")
             exit(1)
+
+@contextmanager
+def redirect_flickr_api(base_url):
+    """Points flickr_api at another server, e.g. a local stand-in for Flickr, until the context exits.
+
+    flickr_api has no setting for its server, so this replaces its REST call and upload url for
+    the whole process. It's only used when flickr_base_url is set, and restores the values it
+    replaced, so redirects nest.
+
+    flickr_api binds the REST url as a default argument of call_api, so call_api is wrapped to pass it.
+    """
+    call_api, upload_url = flickr_api.method_call.call_api, _upload_module.UPLOAD_URL
+    base_url = base_url.rstrip('/')
+    flickr_api.method_call.call_api = partial(call_api, request_url=base_url + REST_PATH)
+    _upload_module.UPLOAD_URL = base_url + UPLOAD_PATH
+    try:
+        yield
+    finally:
+        flickr_api.method_call.call_api = call_api
+        _upload_module.UPLOAD_URL = upload_url
@@ -6,6 +6,15 @@ class Folder:
         self.full_path = kwargs.get('full_path')
         self.is_root = False
 
+    def to_dict(self):
+        return {k: v for k, v in vars(self).items() if v is not None}
+
+    @classmethod
+    def from_dict(cls, values):
+        if values.get('is_root'):
+            return RootFolder()
+        return cls(**values)
+
     def __repr__(self):
         return "Folder: {{id={}, name={}}}".format(self.id, self.name)
 
@@ -1,58 +1,176 @@
+import os
+import mimetypes
 import webbrowser
 import urllib.parse
 import uuid
 import logging
+from threading import Lock
+from concurrent.futures import Future
 from functools import partial
-import requests
+from requests.exceptions import HTTPError
+from .http_transport import HttpTransport
+from .stream import CHUNK_SIZE
 
 PAGE_SIZE = 100
+# The maximum number of media items mediaItems:batchCreate accepts in one request
+BATCH_SIZE = 50
+# Uploads are sent in chunks of about this size, rounded to the granularity required by the server
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 BASE_URL = 'https://photoslibrary.googleapis.com'
+TOKEN_URL = 'https://www.googleapis.com/oauth2/v4/token'
 logger = logging.getLogger(__name__)
 
+class MediaItemError(HTTPError):
+    """Raised when Google accepts an upload but fails to create its media item."""
+
 class GoogleApi:
 
-    def __init__(self, config, resiliently):
+    def __init__(self, config, resiliently, transport=None):
         self._config = config
         self._resiliently = resiliently
+        self._transport = transport or HttpTransport()
+        # A base url can be configured to point at a stand-in for the API, which also issues tokens
+        base_url = config.google_base_url.rstrip('/') if config.google_base_url else None
+        self._base_url = base_url or BASE_URL
+        self._token_url = f'{base_url}/oauth2/v4/token' if base_url else TOKEN_URL
         self._resilient_get = partial(self._resiliently.call, self._get)
         self._resilient_post = partial(self._resiliently.call, self._post)
-        self._resilient_download = partial(self._resiliently.call, self._download)
-        self._resilient_upload = partial(self._resiliently.call, self._upload)
+        self._resilient_download = partial(self._resiliently.transfer, self._download)
+        self._resilient_upload = partial(self._resiliently.transfer, self._upload)
+        self._resilient_open_download = partial(self._resiliently.transfer, self._open_download)
         self._access_token = None
         self._refresh_token = None
+        self._batches = {}
+        self._batches_lock = Lock()
 
     def list_albums(self):
-        return self._walk(self._resilient_get, f'{BASE_URL}/v1/albums', {}, 'albums')
+        return self._walk(self._resilient_get, f'{self._base_url}/v1/albums', {}, 'albums')
 
     def create_album(self, title):
         data = {'album': {'title': title}}
-        return self._resilient_post(f'{BASE_URL}/v1/albums', data=data)
+        return self._resilient_post(f'{self._base_url}/v1/albums', data=data)
 
     def get_media_in_folder(self, album_id):
         data = {
             'albumId': album_id,
             'pageSize': PAGE_SIZE
         }
-        return self._walk(self._resilient_post, f'{BASE_URL}/v1/mediaItems:search', data, 'mediaItems')
+        return self._walk(self._resilient_post, f'{self._base_url}/v1/mediaItems:search', data, 'mediaItems')
 
     def download(self, url, dest):
         self._resilient_download(url, dest)
 
+    def download_stream(self, url):
+        """Opens a download for streaming.
+
+        Only opening the download is retried, errors reading the body are raised.
+
+        Returns:
+            An iterator of the file contents in chunks of bytes.
+        """
+        resp = self._resilient_open_download(url)
+        return resp.iter_content(CHUNK_SIZE)
+
     def upload(self, src_path, file_name, folder_id):
-        upload_token = self._resilient_upload(f'{BASE_URL}/v1/uploads', src_path, file_name)
+        """Uploads a file.
+
+        The media item is created later, in a batch with other uploads to the same album.
+
+        Args:
+            src_path: The file system path to upload from.
+            file_name: The name of the file.
+            folder_id: The id of the album to add the file to.
+
+        Returns:
+            A Future which is resolved with the media item once it's created.
+        """
+        with open(src_path, 'rb') as f:
+            session = UploadSession(f, file_name, os.fstat(f.fileno()).st_size)
+            upload_token = self._resilient_upload(f'{self._base_url}/v1/uploads', session)
+        return self._add_media_item(upload_token, file_name, folder_id)
+
+    def upload_stream(self, stream, file_name, folder_id):
+        """Uploads from a stream.
+
+        A stream can't be rewound, so a retried upload can only resume from within the last
+        chunk sent.
+
+        Args:
+            stream: A file-like object to read the file contents from.
+            file_name: The name of the file.
+            folder_id: The id of the album to add the file to.
+
+        Returns:
+            A Future which is resolved with the media item once it's created.
+        """
+        session = UploadSession(stream, file_name)
+        upload_token = self._resilient_upload(f'{self._base_url}/v1/uploads', session)
+        return self._add_media_item(upload_token, file_name, folder_id)
+
+    def flush(self, folder_id):
+        """Creates the media items for any uploads buffered for an album.
+
+        Args:
+            folder_id: The id of the album, or None for uploads not added to an album.
+        """
+        with self._batches_lock:
+            batch = self._batches.pop(folder_id, None)
+        if batch:
+            self._create_media_items(batch, folder_id)
+
+    def flush_all(self):
+        """Creates the media items for all buffered uploads."""
+        with self._batches_lock:
+            batches, self._batches = self._batches, {}
+        for folder_id, batch in batches.items():
+            self._create_media_items(batch, folder_id)
+
+    def close(self):
+        """Closes any open connections."""
+        self._transport.close()
+
+    def _add_media_item(self, upload_token, file_name, folder_id):
+        future = Future()
+        with self._batches_lock:
+            batch = self._batches.setdefault(folder_id, [])
+            batch.append((upload_token, file_name, future))
+            if len(batch) < BATCH_SIZE:
+                return future
+            del self._batches[folder_id]
+        self._create_media_items(batch, folder_id)
+        return future
+
+    def _create_media_items(self, batch, folder_id):
+        """Creates a batch of media items, resolving each item's Future with its result."""
         data = {
             'newMediaItems': [
                 {
                     'description': '',
                     'simpleMediaItem': {
+                        'fileName': file_name,
                         'uploadToken': upload_token
                     }
                 }
+                for upload_token, file_name, _ in batch
             ]
         }
         if folder_id:
             data['albumId'] = folder_id
-        self._resilient_post(f'{BASE_URL}/v1/mediaItems:batchCreate', data=data)
+        try:
+            resp = self._resilient_post(f'{self._base_url}/v1/mediaItems:batchCreate', data=data)
+        except Exception as err:    #pylint: disable=broad-except
+            # Report the failure against each upload rather than whichever transfer flushed the batch
+            for _, _, future in batch:
+                future.set_exception(err)
+            return
+        results = {r.get('uploadToken'): r for r in resp.get('newMediaItemResults', [])}
+        for upload_token, file_name, future in batch:
+            result = results.get(upload_token)
+            status = result.get('status', {}) if result else {'message': 'no result returned'}
+            if result and not status.get('code'):
+                future.set_result(result.get('mediaItem'))
+            else:
+                future.set_exception(MediaItemError(f"unable to create media item for {file_name}: {status.get('message')}"))
 
     @staticmethod
     def _walk(func, url, data, prop):
@@ -69,33 +187,89 @@ class GoogleApi:
                 break
 
     def _get(self, url, params=None):
-        resp = self._authenticated_call(requests.get, url, params=params)
+        resp = self._authenticated_call(self._transport.get, url, params=params)
         resp.raise_for_status()
         return resp.json()
 
     def _post(self, url, data):
-        resp = self._authenticated_call(requests.post, url, json=data)
+        resp = self._authenticated_call(self._transport.post, url, json=data)
         resp.raise_for_status()
         return resp.json()
 
     def _download(self, url, dest):
-        resp = self._authenticated_call(requests.get, url, stream=True)
-        resp.raise_for_status()
+        resp = self._open_download(url)
         with open(dest, 'wb') as f:
-            for chunk in resp:
+            for chunk in resp.iter_content(CHUNK_SIZE):
                 f.write(chunk)
 
-    def _upload(self, url, src_path, file_name):
-        data = open(src_path, 'rb').read()
+    def _open_download(self, url):
+        resp = self._authenticated_call(self._transport.get, url, stream=True)
+        resp.raise_for_status()
+        return resp
+
+    def _upload(self, url, session):
+        """Uploads a file using the resumable upload protocol.
+
+        The session records the progress of the upload, so when this is retried it continues
+        from the last offset acknowledged by the server instead of starting again.
+
+        Args:
+            url: The uploads endpoint, used to start a new session.
+            session: The UploadSession to send.
+
+        Returns:
+            The upload token.
+        """
+        if not session.url:
+            self._start_upload(url, session)
+        elif session.is_interrupted:
+            self._resume_upload(url, session)
+
+        while True:
+            chunk, is_last = session.next_chunk()
+            headers = {
+                'X-Goog-Upload-Command': 'upload, finalize' if is_last else 'upload',
+                'X-Goog-Upload-Offset': str(session.offset)
+            }
+            session.is_interrupted = True
+            resp = self._authenticated_call(self._transport.post, session.url, data=chunk, headers=headers)
+            resp.raise_for_status()
+            session.is_interrupted = False
+            session.acknowledge(len(chunk))
+            if is_last:
+                return resp.text
+
+    def _start_upload(self, url, session):
         headers = {
-            'Content-Type': 'application/octet-stream',
-            'X-Goog-Upload-File-Name': file_name,
-            'X-Goog-Upload-Protocol': 'raw'
+            'Content-Length': '0',
+            'X-Goog-Upload-Command': 'start',
+            'X-Goog-Upload-Content-Type': mimetypes.guess_type(session.file_name)[0] or 'application/octet-stream',
+            'X-Goog-Upload-File-Name': session.file_name,
+            'X-Goog-Upload-Protocol': 'resumable'
         }
-        resp = self._authenticated_call(requests.post, url, data=data, headers=headers)
+        if session.size is not None:
+            headers['X-Goog-Upload-Raw-Size'] = str(session.size)
+        resp = self._authenticated_call(self._transport.post, url, headers=headers)
         resp.raise_for_status()
-        upload_token = resp.text
-        return upload_token
+        granularity = int(resp.headers.get('X-Goog-Upload-Chunk-Granularity') or UPLOAD_CHUNK_SIZE)
+        session.start(resp.headers['X-Goog-Upload-URL'], granularity)
+
+    def _resume_upload(self, url, session):
+        headers = {
+            'Content-Length': '0',
+            'X-Goog-Upload-Command': 'query'
+        }
+        resp = self._authenticated_call(self._transport.post, session.url, headers=headers)
+        if resp.status_code in (400, 404, 410) or resp.headers.get('X-Goog-Upload-Status') != 'active':
+            # The session has expired or was finalised without us receiving the token
+            logger.debug(f'unable to resume upload of {session.file_name}, restarting')
+            session.restart()
+            self._start_upload(url, session)
+            return
+        resp.raise_for_status()
+        received = int(resp.headers.get('X-Goog-Upload-Size-Received', 0))
+        logger.debug(f'resuming upload of {session.file_name} from byte {received}')
+        session.resume(received)
 
     def _authenticated_call(self, func, *args, **kwargs):
         self._authenticate()
@@ -118,7 +292,7 @@ class GoogleApi:
             'refresh_token': self._refresh_token,
             'grant_type': 'refresh_token'
         }
-        resp = self._resiliently.call(requests.post, 'https://www.googleapis.com/oauth2/v4/token', data=data)
+        resp = self._resiliently.call(self._transport.post, self._token_url, data=data)
         result = resp.json()
         self._access_token = result['access_token']
         self._config.save_tokens(self._config.PATH_GOOGLE, {
@@ -166,6 +340,84 @@ class GoogleApi:
             'grant_type': 'authorization_code',
             'code_verifier': challenge
         }
-        resp = self._resiliently.call(requests.post, 'https://www.googleapis.com/oauth2/v4/token', data=data)
+        resp = self._resiliently.call(self._transport.post, self._token_url, data=data)
         resp.raise_for_status()
         return resp.json()
+
+class UploadSession:
+    """The state of a resumable upload.
+
+    Reads the file in chunks, keeping the chunk currently being sent so it can be resent if
+    the upload is interrupted.
+
+    Args:
+        f: A file-like object to read the contents from, if it's not seekable the upload can
+            only resume from within the current chunk.
+        file_name: The name of the file.
+        size: The size of the file in bytes, if known.
+    """
+
+    def __init__(self, f, file_name, size=None):
+        self.file_name = file_name
+        self.size = size
+        self.url = None
+        self.offset = 0
+        self.is_interrupted = False
+        self._file = f
+        self._chunk_size = UPLOAD_CHUNK_SIZE
+        self._chunk = None
+        self._is_last_chunk = False
+
+    def start(self, url, granularity):
+        self.url = url
+        # Chunks must be a multiple of the granularity, except the last
+        self._chunk_size = max(granularity, UPLOAD_CHUNK_SIZE // granularity * granularity)
+
+    def next_chunk(self):
+        """Reads the next chunk to send, or returns the unacknowledged chunk if there is one.
+
+        Returns:
+            A tuple of the chunk bytes and whether it's the last chunk.
+        """
+        if self._chunk is None:
+            self._chunk = self._file.read(self._chunk_size)
+            # Remember a short read, the chunk may be trimmed if the upload is resumed
+            self._is_last_chunk = len(self._chunk) < self._chunk_size
+        if self.size is not None:
+            return self._chunk, self.offset + len(self._chunk) >= self.size
+        return self._chunk, self._is_last_chunk
+
+    def acknowledge(self, length):
+        self.offset += length
+        self._chunk = None
+        self.is_interrupted = False
+
+    def resume(self, received):
+        """Continues from the number of bytes the server has received.
+
+        Raises:
+            ValueError: If the file isn't seekable and the server is missing data from before
+                the current chunk.
+        """
+        if self._chunk is not None and self.offset <= received <= self.offset + len(self._chunk):
+            self._chunk = self._chunk[received - self.offset:]
+        elif self._is_seekable():
+            self._file.seek(received)
+            self._chunk = None
+        else:
+            raise ValueError(f"can't resume upload of {self.file_name} from byte {received}")
+        self.offset = received
+        self.is_interrupted = False
+
+    def restart(self):
+        if self.offset and not self._is_seekable():
+            raise ValueError(f"can't restart upload of {self.file_name}")
+        if self._is_seekable():
+            self._file.seek(0)
+        self.url = None
+        self.offset = 0
+        self._chunk = None
+        self.is_interrupted = False
+
+    def _is_seekable(self):
+        return hasattr(self._file, 'seekable') and self._file.seekable()
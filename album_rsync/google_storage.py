@@ -1,4 +1,6 @@
 from html import unescape
+from datetime import datetime, timezone
+from threading import Lock
 from .file import File
 from .folder import Folder, RootFolder
 from .storage import RemoteStorage
@@ -9,6 +11,7 @@ class GoogleStorage(RemoteStorage):
         self._config = config
         self._api = api
         self._folders = None
+        self._folders_lock = Lock()
 
     def list_folders(self):
         """Lists all albums in Google.
@@ -55,6 +58,17 @@ class GoogleStorage(RemoteStorage):
         self.mkdirp(dest)
         self._api.download(file_.url, dest)
 
+    def download_stream(self, file_):
+        """Opens a photo for streaming.
+
+        Args:
+            file_: The file info object (as returned by list_files) of the file to download.
+
+        Returns:
+            An iterable of the file contents in chunks of bytes.
+        """
+        return self._api.download_stream(file_.url)
+
     def upload(self, src, folder_name, file_name, checksum):
         """Uploads a photo from local file system.
 
@@ -63,17 +77,48 @@ class GoogleStorage(RemoteStorage):
             folder_name: The photset name to add the photo to.
             file_name: The name of the photo, any extension will be removed.
 
+        Returns:
+            A Future which is resolved once the photo is added to the album, see flush.
+
         Raises:
             KeyError: If the file_.id is unrecognised.
         """
 
+        folder = self._get_or_create_folder(folder_name)
+        return self._api.upload(src, file_name, folder and folder.id)
+
+    def upload_stream(self, stream, folder_name, file_name, checksum):
+        """Uploads a photo from a stream, without writing it to disk.
+
+        Args:
+            stream: A StreamBuffer of the photo contents.
+            folder_name: The album name to add the photo to.
+            file_name: The name of the photo.
+
+        Returns:
+            A Future which is resolved once the photo is added to the album, see flush.
+        """
+        folder = self._get_or_create_folder(folder_name)
+        return self._api.upload_stream(stream, file_name, folder and folder.id)
+
+    def flush(self, folder_name=None):
+        """Adds any uploaded photos waiting to be batched to their album.
+
+        Args:
+            folder_name: The album name to complete uploads for, or None for all albums.
+        """
+        if folder_name is None:
+            self._api.flush_all()
+            return
+        folder = None
         if folder_name:
-            folder = self._get_folder_by_name(folder_name)
-            if not folder:
-                album = self._api.create_album(folder_name)
-                folder = Folder(id=album['id'], name=unescape(album['title']))
-                self._folders.append(folder)
-        self._api.upload(src, file_name, folder.id)
+            with self._folders_lock:
+                folder = self._get_folder_by_name(folder_name)
+        self._api.flush(folder and folder.id)
+
+    def close(self):
+        self.flush()
+        self._api.close()
 
     def delete_file(self, file_, folder_name):
         raise NotImplementedError("Google Photos API does not support deleting photos")
@@ -84,13 +129,27 @@ class GoogleStorage(RemoteStorage):
     def logout(self):
         self._config.save_tokens(self._config.PATH_GOOGLE, {})
 
+    def _get_or_create_folder(self, folder_name):
+        if not folder_name:
+            return None
+        # Parallel transfers may upload to the same new album, only create it once
+        with self._folders_lock:
+            folder = self._get_folder_by_name(folder_name)
+            if not folder:
+                album = self._api.create_album(folder_name)
+                folder = Folder(id=album['id'], name=unescape(album['title']))
+                self._folders.append(folder)
+            return folder
+
     def _get_folder_by_name(self, name):
         folders = self._list_all_folders_with_cache()
         return next((x for x in folders if x.name.lower() == name.lower()), None)
 
     def _get_file(self, photo):
         name = photo['filename'] if photo['filename'] else photo['id']
-        return File(id=photo['id'], name=unescape(name), url=photo['baseUrl'] + '=d')
+        return File(id=photo['id'], name=unescape(name), url=photo['baseUrl'] + '=d',
+                    mtime=_parse_time(photo.get('mediaMetadata', {}).get('creationTime')),
+                    media_type=photo.get('mimeType'))
 
     def _list_all_folders_with_cache(self):
         """List all folders using a cache.
@@ -105,3 +164,10 @@ class GoogleStorage(RemoteStorage):
             albums = self._api.list_albums()
             self._folders = [Folder(id=album['id'], name=unescape(album['title'])) for album in albums]
         return self._folders
+
+def _parse_time(value):
+    """Parses an RFC 3339 UTC time, e.g. 2017-04-16T10:30:00.123Z, to seconds since the epoch."""
+    if not value:
+        return None
+    # Fractions of a second are dropped, they can have more digits than strptime accepts
+    return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
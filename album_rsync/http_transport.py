@@ -0,0 +1,61 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# The default number of connections to keep open to each host
+POOL_SIZE = 10
+
+class HttpTransport:
+    """A pooled HTTP transport shared by the API calls of a provider.
+
+    Connections are kept alive and reused between calls, so each call doesn't pay for a new TCP
+    and TLS handshake. The connection pool is thread-safe, each thread gets its own Session on
+    top of it so parallel transfers don't share any request state.
+
+    Args:
+        pool_size: The maximum number of connections to keep open to each host.
+        keep_alive: Whether to reuse connections, if False every request uses a new connection.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, keep_alive=True):
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._keep_alive = keep_alive
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request, see requests.Session.request for the arguments.
+
+        Returns:
+            A requests.Response.
+        """
+        if not self._keep_alive:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, Connection='close')
+        return self._get_session().request(method, url, **kwargs)
+
+    def close(self):
+        """Closes all pooled connections."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+        self._local = threading.local()
+
+    def _get_session(self):
+        session = getattr(self._local, 'session', None)
+        if not session:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import logging
+from threading import Lock
+from .diff import normalise_name
+
+COPY = 'copy'
+DELETE = 'delete'
+FOLDER = 'folder'
+START = 'start'
+# Records are flushed and fsync'd in batches, whichever of these limits is reached first
+SYNC_RECORDS = 100
+SYNC_INTERVAL_SEC = 5
+logger = logging.getLogger(__name__)
+
+class Journal:
+    """An append-only journal of completed sync actions, used to resume an interrupted sync.
+
+    Each line of the journal is a JSON record. The first record identifies the source and
+    destination, a journal for a different sync is discarded.
+
+    Args:
+        path: The file system path of the journal.
+        src: The source storage path.
+        dest: The destination storage path.
+    """
+
+    def __init__(self, path, src, dest):
+        self._path = path
+        self._header = {'op': START, 'src': src, 'dest': dest}
+        self._files = set()
+        self._folders = set()
+        self._file = None
+        self._lock = Lock()
+        self._unsynced = 0
+        self._last_sync = 0
+
+    def open(self):
+        """Loads any existing journal, compacts it and opens it for appending."""
+        self._load()
+        # Rewrite the journal without the file records of completed folders
+        temp_path = self._path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for record in self._compacted_records():
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._path)
+        self._file = open(self._path, 'a')
+        self._last_sync = time.time()
+        if self._folders or self._files:
+            logger.info(f"resuming from journal {self._path}, {len(self._folders)} folder(s) already complete")
+
+    def close(self, compact=False):
+        """Flushes and closes the journal.
+
+        Args:
+            compact: True if the sync completed successfully, in which case the journal is no
+                longer needed and is removed.
+        """
+        with self._lock:
+            if not self._file:
+                return
+            self._sync()
+            self._file.close()
+            self._file = None
+        if compact:
+            os.remove(self._path)
+
+    def is_folder_done(self, folder_name):
+        return self._folder_key(folder_name) in self._folders
+
+    def is_done(self, op, folder_name, file_):
+        return (op, self._folder_key(folder_name), normalise_name(file_.name)) in self._files
+
+    def record(self, op, folder_name, file_):
+        """Records a completed copy or delete.
+
+        Args:
+            op: The action, COPY or DELETE.
+            folder_name: The name of the folder the file belongs to.
+            file_: The File object.
+        """
+        self._write({'op': op, 'folder': self._folder_key(folder_name), 'file': normalise_name(file_.name)})
+
+    def record_folder(self, folder_name):
+        """Records that all actions for a folder are complete, it won't be listed again."""
+        self._write({'op': FOLDER, 'folder': self._folder_key(folder_name)})
+
+    def _write(self, record):
+        with self._lock:
+            if not self._file:
+                return
+            self._file.write(json.dumps(record) + '\n')
+            self._unsynced += 1
+            if self._unsynced >= SYNC_RECORDS or time.time() - self._last_sync >= SYNC_INTERVAL_SEC:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        with open(self._path) as f:
+            lines = iter(f)
+            if self._read_record(next(lines, '')) != self._header:
+                logger.warning(f"journal {self._path} is for a different sync, ignoring it")
+                return
+            for line in lines:
+                record = self._read_record(line)
+                if not record:
+                    # A partially written record from an interrupted run
+                    continue
+                if record['op'] == FOLDER:
+                    self._folders.add(record['folder'])
+                else:
+                    self._files.add((record['op'], record['folder'], record['file']))
+
+    def _compacted_records(self):
+        yield self._header
+        for folder in sorted(self._folders):
+            yield {'op': FOLDER, 'folder': folder}
+        for op, folder, file_key in sorted(self._files):
+            if folder not in self._folders:
+                yield {'op': op, 'folder': folder, 'file': file_key}
+
+    @staticmethod
+    def _read_record(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _folder_key(folder_name):
+        return (folder_name or '').casefold()
@@ -0,0 +1,67 @@
+import sys
+import json
+import time
+import logging
+from itertools import chain
+from .walker import Walker
+from .folder import RootFolder
+from .pipeline import prefetch
+from .sorting import sort_files
+from .stats import stats
+
+logger = logging.getLogger(__name__)
+
+class JsonlWalker(Walker):
+    """Prints a JSON record for each file as it's listed, one per line.
+
+    Each record has the folder and file ids and names, along with the size, mtime, checksum and
+    media type of the file where the provider supplies them, missing values are left out. Each
+    record is flushed as it's written, so it can be processed while the listing continues.
+    """
+
+    def __init__(self, config, storage):
+        self._config = config
+        self._storage = storage
+
+    def walk(self):
+        start = time.time()
+
+        folders = stats.timed('list-folders', self._storage.list_folders)
+        if self._config.root_files:
+            folders = chain([RootFolder()], folders)
+        if self._config.list_sort:
+            folders = sorted(folders, key=lambda folder: folder.name)
+        if self._config.list_folders:
+            for folder in folders:
+                self._print_record(self._folder_record(folder))
+        else:
+            for folder, files in prefetch(self._list_files, folders, self._config.prefetch):
+                folder_record = self._folder_record(folder)
+                for file_ in files:
+                    self._print_record({
+                        **folder_record,
+                        'id': file_.id,
+                        'name': file_.name,
+                        'size': file_.size,
+                        'mtime': file_.mtime,
+                        'checksum': file_.checksum,
+                        'media_type': file_.media_type
+                    })
+        self._print_summary(time.time() - start)
+
+    def _list_files(self, folder):
+        files = stats.timed('list-files', self._storage.list_files, folder)
+        if self._config.list_sort:
+            return sort_files(files, self._config.list_sort_buffer)
+        # Prefetched files are listed on another thread, so must be listed before they're returned
+        return list(files) if self._config.prefetch else files
+
+    def _folder_record(self, folder):
+        return {'folder_id': folder.id, 'folder': folder.name}
+
+    def _print_record(self, record):
+        sys.stdout.write(json.dumps({k: v for k, v in record.items() if v is not None}) + '\n')
+        sys.stdout.flush()
+
+    def _print_summary(self, elapsed):
+        logger.info(f"\ndone in {round(elapsed, 2)} sec")
@@ -2,10 +2,20 @@ import os
 import hashlib
 import shutil
 import logging
+from threading import Lock
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor
 from .storage import Storage, RemoteStorage
 from .file import File
 from .folder import Folder
+from .checksum_cache import ChecksumCache
+from .config import CHECKSUM_CACHE_FILENAME
+from .stats import stats
+from .utils import guess_media_type
 
+# Read files in large blocks, hashlib releases the GIL while hashing so blocks from different
+# files can be hashed in parallel on worker threads
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
 logger = logging.getLogger(__name__)
 
 class LocalStorage(Storage):
@@ -13,16 +23,31 @@ class LocalStorage(Storage):
     def __init__(self, config, path):
         self.path = path
         self._config = config
+        self._checksum_cache = None
+        self._lock = Lock()
+        self._checksum_executor = None
 
-    def md5_checksum(self, file_path):
-        with open(file_path, 'rb') as f:
-            checksum = hashlib.md5()
+    def md5_checksum(self, file_path, stat=None):
+        cache = self._get_checksum_cache()
+        if cache:
+            stat = stat or os.stat(file_path)
+            cached = cache.get(stat)
+            if cached:
+                return cached
+
+        checksum = hashlib.md5()
+        buffer = bytearray(CHECKSUM_BLOCK_SIZE)
+        view = memoryview(buffer)
+        with stats.phase('checksum'), open(file_path, 'rb', buffering=0) as f:
             while True:
-                data = f.read(8192)
-                if not data:
+                size = f.readinto(buffer)
+                if not size:
                     break
-                checksum.update(data)
-            return checksum.hexdigest()
+                checksum.update(view[:size])
+
+        if cache:
+            cache.put(file_path, stat, checksum.hexdigest())
+        return checksum.hexdigest()
 
     def list_folders(self):
         logger.debug(f"copying files from {self.path}")
@@ -34,14 +59,23 @@ class LocalStorage(Storage):
 
     def list_files(self, folder):
         folder_path = os.path.join(self.path, folder.name)
+        with os.scandir(folder_path) as entries:
+            files = [
+                (i, entry.name, entry.path, entry.stat())
+                for i, entry in enumerate(entries)
+                if self._should_include(entry.name, self._config.include, self._config.exclude) and entry.is_file()
+            ]
+        checksums = self._md5_checksums(files) if self._config.checksum else repeat(None)
         return [
             File(
                 id=i,
                 name=name,
                 full_path=path,
-                checksum=self.md5_checksum(path) if self._config.checksum else None)
-            for i, (name, path) in enumerate((x, os.path.join(folder_path, x)) for x in os.listdir(folder_path))
-            if self._should_include(name, self._config.include, self._config.exclude) and os.path.isfile(path)
+                size=stat.st_size,
+                mtime=stat.st_mtime,
+                media_type=guess_media_type(name),
+                checksum=checksum)
+            for (i, name, path, stat), checksum in zip(files, checksums)
         ]
 
     def delete_file(self, file_, folder_name):
@@ -58,12 +92,58 @@ class LocalStorage(Storage):
     def copy_file(self, file_, folder_name, dest_storage):
         src = file_.full_path
         if isinstance(dest_storage, RemoteStorage):
-            dest_storage.upload(src, folder_name, file_.name, file_.checksum)
-        else:
-            relative_path = os.path.join(folder_name, file_.name)
-            dest = os.path.join(dest_storage.path, relative_path)
-            self.mkdirp(dest)
-            shutil.copyfile(src, dest)
+            return dest_storage.upload(src, folder_name, file_.name, file_.checksum)
+        relative_path = os.path.join(folder_name, file_.name)
+        dest = os.path.join(dest_storage.path, relative_path)
+        self.mkdirp(dest)
+        shutil.copyfile(src, dest)
+        return None
 
     def logout(self):
         raise NotImplementedError("can't logout of the local file system")
+
+    def close(self):
+        if self._checksum_executor:
+            self._checksum_executor.shutdown()
+            self._checksum_executor = None
+        if self._checksum_cache:
+            self._checksum_cache.close()
+            self._checksum_cache = None
+
+    def prune_checksum_cache(self):
+        """Removes checksum cache entries for files that no longer exist or have changed.
+
+        Returns:
+            The number of entries removed.
+        """
+        cache = self._get_checksum_cache(force=True)
+        return cache.prune() if cache else 0
+
+    def _md5_checksums(self, files):
+        """Calculates checksums on a pool of worker threads.
+
+        Args:
+            files: A list of (id, name, path, stat) tuples.
+
+        Returns:
+            An iterator of checksums, in the same order as files.
+        """
+        paths = [path for _, _, path, _ in files]
+        stat_results = [stat for _, _, _, stat in files]
+        workers = self._config.checksum_workers or os.cpu_count() or 1
+        if workers == 1 or len(files) < 2:
+            return map(self.md5_checksum, paths, stat_results)
+        with self._lock:
+            if not self._checksum_executor:
+                self._checksum_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='checksum')
+        return self._checksum_executor.map(self.md5_checksum, paths, stat_results)
+
+    def _get_checksum_cache(self, force=False):
+        if not (self._config.checksum or force) or self._config.no_checksum_cache:
+            return None
+        with self._lock:
+            if not self._checksum_cache:
+                path = self._config.checksum_cache or self._config.default_datafile(CHECKSUM_CACHE_FILENAME)
+                logger.debug(f"using checksum cache {path}")
+                self._checksum_cache = ChecksumCache(path, self._config.checksum_cache_size)
+            return self._checksum_cache
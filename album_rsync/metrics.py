@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+from .stats import stats
+
+PREFIX = 'album_rsync'
+logger = logging.getLogger(__name__)
+
+class MetricsFile:
+    """Writes the progress of a sync to a metrics text file, for the node_exporter textfile collector.
+
+    The file is written every interval while the sync runs and once more when it finishes. Each
+    write replaces the file atomically so a scrape never sees a partly written file.
+
+    Args:
+        config: The current configuration.
+        sync: The Sync whose counters are reported.
+        src: The source being synced, which comes from the plan when one is applied.
+        dest: The destination being synced, which comes from the plan when one is applied.
+        resilients: The Resiliently instances making calls to each remote provider.
+    """
+
+    def __init__(self, config, sync, src, dest, resilients=()):
+        self._config = config
+        self._sync = sync
+        self._src = src
+        self._dest = dest
+        self._resilients = resilients
+        self._path = config.metrics_file
+        self._interval_sec = config.metrics_interval
+        self._start = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._start = time.time()
+        self.write()
+        if self._interval_sec and self._interval_sec > 0:
+            self._thread = threading.Thread(target=self._write_periodically, daemon=True)
+            self._thread.start()
+
+    def stop(self, is_complete=True):
+        """Stops the periodic writes and writes the final values.
+
+        Args:
+            is_complete: Whether the sync finished without being interrupted.
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        self.write(is_running=False, is_complete=is_complete)
+
+    def write(self, is_running=True, is_complete=False):
+        temp_path = self._path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(self.format(is_running, is_complete))
+            os.replace(temp_path, self._path)
+        except OSError as err:
+            logger.warning(f"failed to write metrics to {self._path}: {err}")
+
+    def format(self, is_running=True, is_complete=False):
+        """Formats the current values in the Prometheus text format read by the textfile collector."""
+        now = time.time()
+        counters = self._sync.counters
+        phases = stats.to_dict()['phases']
+        families = [
+            ('run_info', 'gauge', "The source and destination being synced.",
+             [({'src': self._src or '', 'dest': self._dest or ''}, 1)]),
+            ('run_start_timestamp_seconds', 'gauge', "When the sync started.", [({}, self._start or now)]),
+            ('run_duration_seconds', 'gauge', "How long the sync has been running.", [({}, now - (self._start or now))]),
+            ('run_in_progress', 'gauge', "Whether the sync is still running.", [({}, int(is_running))]),
+            ('run_complete', 'gauge', "Whether the sync finished without being interrupted.", [({}, int(is_complete))]),
+            ('files_total', 'counter', "Files copied successfully, skipped because they exist, deleted and failed "
+             "to copy.",
+             [({'action': action}, counters[action]) for action in ('copy', 'skip', 'delete', 'error')]),
+            ('bytes_total', 'counter', "Bytes copied successfully, skipped because they exist and deleted.",
+             [({'action': action}, counters[action + '_bytes']) for action in ('copy', 'skip', 'delete')]),
+            ('api_calls_total', 'counter', "Calls made to the remote provider, including retries.",
+             self._provider_samples('calls')),
+            ('api_errors_total', 'counter', "Calls to the remote provider which failed.", self._provider_samples('errors')),
+            ('api_retries_total', 'counter', "Calls to the remote provider which were retried.",
+             self._provider_samples('retries')),
+            ('throttle_seconds_total', 'counter', "Time spent waiting to call the remote provider, to respect rate "
+             "limits or back off after errors.", self._provider_samples('throttle_sec')),
+            ('phase_busy_seconds_total', 'counter', "Time spent in each phase, summed across parallel jobs.",
+             [({'phase': name}, phase['busy_sec']) for name, phase in phases.items()]),
+            ('phase_wall_seconds', 'gauge', "Time from when each phase first started until it last finished.",
+             [({'phase': name}, phase['wall_sec']) for name, phase in phases.items()])
+        ]
+        lines = []
+        for name, metric_type, description, samples in families:
+            name = f'{PREFIX}_{name}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _provider_samples(self, counter):
+        return [({'provider': r.provider}, r.counters[counter]) for r in self._resilients]
+
+    def _write_periodically(self):
+        while not self._stopped.wait(self._interval_sec):
+            self.write()
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
@@ -0,0 +1,116 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_DONE = object()
+
+class Stage:
+    """Runs an iterable on a background thread, handing its items over through a bounded queue.
+
+    Iterating the stage yields the items in their original order. Exceptions raised by the
+    iterable are re-raised to the consumer.
+
+    Args:
+        iterable: The iterable to consume in the background.
+        maxsize: The maximum number of items to read ahead of the consumer.
+        name: An optional name for the background thread.
+    """
+
+    def __init__(self, iterable, maxsize=1, name=None):
+        self._queue = queue.Queue(maxsize)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterable,), name=name, daemon=True)
+        self._thread.start()
+
+    def __iter__(self):
+        while True:
+            is_ok, item = self._queue.get()
+            if not is_ok:
+                raise item
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self):
+        """Stops the background thread once it next hands over an item."""
+        self._closed.set()
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((True, item)):
+                    return
+        except BaseException as err:    #pylint: disable=broad-except
+            self._put((False, err))
+            return
+        self._put((True, _DONE))
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+def background(func, *args, **kwargs):
+    """Runs a function on a background thread.
+
+    Args:
+        func: The function to run.
+        *args: Positional arguments for func.
+        **kwargs: Keyword arguments for func.
+
+    Returns:
+        A Future for the result of func.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as err:    #pylint: disable=broad-except
+            future.set_exception(err)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def prefetch(func, iterable, depth):
+    """Maps a function over an iterable, running it for the next items ahead of the consumer.
+
+    Results are yielded in the order of the items, each as soon as it and every result before
+    it are ready, so the consumer can start on the first item while later ones are fetched.
+
+    Args:
+        func: The function to call with each item.
+        iterable: The items.
+        depth: The number of items to run func for in parallel, 0 to run it for each item only
+            when the consumer asks for it.
+
+    Returns:
+        A generator of (item, result) tuples.
+    """
+    if depth < 1:
+        for item in iterable:
+            yield item, func(item)
+        return
+    executor = ThreadPoolExecutor(depth)
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append((item, executor.submit(func, item)))
+            # Keep every thread busy while the consumer waits on the first result
+            if len(pending) > depth:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
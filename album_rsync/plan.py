@@ -0,0 +1,119 @@
+import json
+from .file import File
+from .folder import Folder
+
+PLAN_VERSION = 1
+
+class PlanError(Exception):
+    pass
+
+class FolderPlan:
+    """The actions to perform on a single folder.
+
+    Args:
+        src_folder: The source Folder, or None if the folder only exists in the destination.
+        dest_folder: The destination Folder, or None if the folder doesn't exist in the destination yet.
+        copy: A list of source File objects to copy.
+        skip: A list of source File objects that already exist in the destination.
+        delete: A list of destination File objects to delete.
+        delete_folder: Whether to delete the destination folder once its files are deleted.
+    """
+
+    def __init__(self, src_folder, dest_folder, copy=None, skip=None, delete=None, delete_folder=False):
+        self.src_folder = src_folder
+        self.dest_folder = dest_folder
+        self.copy = copy or []
+        self.skip = skip or []
+        self.delete = delete or []
+        self.delete_folder = delete_folder
+
+    @property
+    def total_bytes(self):
+        return sum(f.size for f in self.copy if f.size)
+
+    def to_dict(self):
+        return {
+            'src_folder': self.src_folder and self.src_folder.to_dict(),
+            'dest_folder': self.dest_folder and self.dest_folder.to_dict(),
+            'copy': [f.to_dict() for f in self.copy],
+            'skip': [f.to_dict() for f in self.skip],
+            'delete': [f.to_dict() for f in self.delete],
+            'delete_folder': self.delete_folder
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(
+            src_folder=values['src_folder'] and Folder.from_dict(values['src_folder']),
+            dest_folder=values['dest_folder'] and Folder.from_dict(values['dest_folder']),
+            copy=[File.from_dict(f) for f in values['copy']],
+            skip=[File.from_dict(f) for f in values['skip']],
+            delete=[File.from_dict(f) for f in values['delete']],
+            delete_folder=values['delete_folder'])
+
+class Plan:
+    """A serializable sync plan, the full diff between a source and destination.
+
+    Args:
+        src: The source storage path.
+        dest: The destination storage path.
+        delete: Whether the plan was built with --delete.
+    """
+
+    def __init__(self, src, dest, delete=False):
+        self.src = src
+        self.dest = dest
+        self.delete = delete
+        self.folders = []
+
+    def add(self, folder_plan):
+        self.folders.append(folder_plan)
+
+    @property
+    def total_bytes(self):
+        """The estimated number of bytes to copy, only includes files with a known size."""
+        return sum(f.total_bytes for f in self.folders)
+
+    @property
+    def has_deletes(self):
+        return any(f.delete or f.delete_folder for f in self.folders)
+
+    def save(self, path):
+        data = {
+            'version': PLAN_VERSION,
+            'src': self.src,
+            'dest': self.dest,
+            'delete': self.delete,
+            'copy_count': sum(len(f.copy) for f in self.folders),
+            'skip_count': sum(len(f.skip) for f in self.folders),
+            'delete_count': sum(len(f.delete) for f in self.folders),
+            'total_bytes': self.total_bytes,
+            'folders': [f.to_dict() for f in self.folders]
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a plan written by save.
+
+        Args:
+            path: The file system path of the plan.
+
+        Returns:
+            A Plan object.
+
+        Raises:
+            PlanError: If the file isn't a valid plan.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') != PLAN_VERSION:
+                raise PlanError(f"unsupported plan version {data.get('version')} in {path}")
+            plan = cls(data['src'], data['dest'], data['delete'])
+            for folder in data['folders']:
+                plan.add(FolderPlan.from_dict(folder))
+            return plan
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            raise PlanError(f"unable to read plan {path}: {err!r}")
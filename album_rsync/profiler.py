@@ -0,0 +1,168 @@
+import io
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from .config import Config
+
+# The number of functions in each section of the report
+TOP_FUNCTIONS = 25
+# Sampling every 10ms costs well under 1% of a CPU, so it can be left on for long runs
+SAMPLE_INTERVAL_SEC = 0.01
+
+logger = logging.getLogger(__name__)
+
+class Profiler:
+    """Profiles a list or sync, writing a pstats dump and a report of the hot functions.
+
+    The dump can be loaded with pstats or visualised with tools such as snakeviz. The report,
+    written alongside it with a .txt extension, lists the functions with the most time spent
+    in the function itself and including the functions it calls.
+
+    There are two modes: cprofile traces every function call, which is accurate but slows the
+    run down, while sample periodically records the stack of every thread, which costs little
+    and measures wall clock time, including time waiting on the network.
+
+    Args:
+        config: The current configuration.
+    """
+
+    def __init__(self, config):
+        self._path = config.profile
+        if config.profile_mode == Config.PROFILE_MODE_SAMPLE:
+            self._profiler = _Sampler(SAMPLE_INTERVAL_SEC)
+        else:
+            self._profiler = _ThreadProfiler()
+
+    def __enter__(self):
+        self._profiler.start()
+        return self
+
+    def __exit__(self, *args):
+        self._profiler.stop()
+        self.save()
+
+    def save(self):
+        stats = pstats.Stats(self._profiler)
+        stats.dump_stats(self._path)
+        report_path = self._path + '.txt'
+        with open(report_path, 'w') as f:
+            f.write(format_report(stats))
+        logger.info(f"profile written to {self._path}, hot functions in {report_path}")
+
+def format_report(stats):
+    """Formats the top functions by their own time and by their cumulative time."""
+    stream = io.StringIO()
+    stats.stream = stream
+    for sort_key, title in (('tottime', 'own time'), ('cumulative', 'cumulative time')):
+        stream.write(f"Top {TOP_FUNCTIONS} functions by {title}\n")
+        stats.sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+    return stream.getvalue()
+
+class _ThreadProfiler:
+    """Profiles the calling thread, and threads it starts while profiling, with cProfile.
+
+    From Python 3.12 only one profiler can be active at a time, so only the calling thread is
+    profiled.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._profile_thread)
+        else:
+            logger.info("profiling the main thread only, use sample mode to include worker threads")
+        self._profile_thread()
+
+    def stop(self):
+        threading.setprofile(None)
+        self._profiles[0].disable()
+
+    def create_stats(self):
+        for profile in self._profiles:
+            profile.create_stats()
+        # pstats can't load a profile of a thread which didn't call anything
+        stats = pstats.Stats(*[profile for profile in self._profiles if profile.stats])
+        self.stats = stats.stats
+
+    def _profile_thread(self, *args):   #pylint: disable=unused-argument
+        # Called as the profile function of each new thread, which the profile replaces
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+class _Sampler:
+    """Samples the stack of every thread at an interval.
+
+    Each function's time is estimated from the number of samples it's on the stack, so that
+    the samples can be reported in the same format as a cProfile profile.
+    """
+
+    def __init__(self, interval_sec):
+        self._interval_sec = interval_sec
+        self._counts = {}
+        self._callers = {}
+        self._sample_count = 0
+        self._elapsed = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self.stats = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def create_stats(self):
+        # The time each sample represents, as sampling runs a little slower than the interval
+        sec_per_sample = self._elapsed / self._sample_count if self._sample_count else self._interval_sec
+        callers = {}
+        for (caller, callee), count in self._callers.items():
+            callers.setdefault(callee, {})[caller] = (count, count, 0, count * sec_per_sample)
+        self.stats = {
+            func: (total, total, own * sec_per_sample, total * sec_per_sample, callers.get(func, {}))
+            for func, (own, total) in self._counts.items()
+        }
+
+    def _run(self):
+        start = time.monotonic()
+        while not self._stopped.wait(self._interval_sec):
+            self._sample()
+            self._sample_count += 1
+        # So even the shortest run has a sample
+        self._sample()
+        self._sample_count += 1
+        self._elapsed = time.monotonic() - start
+
+    def _sample(self):
+        own_thread = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():  #pylint: disable=protected-access
+            if thread_id == own_thread:
+                continue
+            seen = set()
+            callee = None
+            while frame:
+                code = frame.f_code
+                func = (code.co_filename, code.co_firstlineno, code.co_name)
+                counts = self._counts.setdefault(func, [0, 0])
+                if callee is None:
+                    counts[0] += 1
+                # Count recursive functions once per sample
+                if func not in seen:
+                    seen.add(func)
+                    counts[1] += 1
+                    if callee is not None:
+                        edge = (func, callee)
+                        self._callers[edge] = self._callers.get(edge, 0) + 1
+                callee = func
+                frame = frame.f_back
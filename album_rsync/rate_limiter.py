@@ -0,0 +1,66 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """A thread-safe token bucket rate limiter.
+
+    Tokens are added to the bucket at a steady rate, up to burst tokens, and each call takes a
+    token, waiting until one is available. Callers reserve their token in the order they arrive,
+    so with several threads calls still run at the configured rate, one after another.
+
+    Args:
+        interval_sec: The number of seconds (may be decimal) between calls, 0 to not limit calls.
+        burst: The number of calls that may be made without waiting, after a quiet period.
+    """
+
+    def __init__(self, interval_sec=0, burst=1):
+        self._interval_sec = max(0, interval_sec or 0)
+        self._burst = max(1, burst or 1)
+        self._tokens = self._burst
+        self._updated = None
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    @property
+    def interval_sec(self):
+        return self._interval_sec
+
+    def acquire(self):
+        """Waits until a call is allowed.
+
+        Returns:
+            The number of seconds waited.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            logger.debug('throttling function call, sleeping for %s seconds', delay)
+            time.sleep(delay)
+            return delay
+        return 0
+
+    def pause(self, delay_sec):
+        """Holds back all calls for a while, e.g. when the server says we're sending too many.
+
+        Args:
+            delay_sec: The number of seconds (may be decimal) to wait before the next call.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay_sec)
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            pause = max(0, self._paused_until - now)
+            if not self._interval_sec:
+                return pause
+            if self._updated is not None:
+                elapsed = now - self._updated
+                self._tokens = min(self._burst, self._tokens + elapsed / self._interval_sec)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is owed by calls already waiting, this call waits behind them
+            wait = -self._tokens * self._interval_sec if self._tokens < 0 else 0
+            return max(wait, pause)
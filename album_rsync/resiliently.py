@@ -1,21 +1,220 @@
+import time
+import random
 import logging
-import backoff
-from .throttle import Throttle
+import socket
+import threading
+import http.client
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+from urllib.error import URLError, HTTPError as UrlHTTPError
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout, HTTPError, ChunkedEncodingError
+from .rate_limiter import RateLimiter
+from .concurrency import SUCCESS, CONGESTED, FAILED
+from .stats import stats
+from .stream import StreamError
+
+# Kinds of error
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate-limited'
+PERMANENT = 'permanent'
+
+# The first retry waits up to this long, doubling with each retry
+BACKOFF_BASE_SEC = 1
+BACKOFF_MAX_SEC = 60
+# Don't wait longer than this for a rate limit to reset, e.g. if a daily quota is used up
+MAX_RETRY_AFTER_SEC = 15 * 60
+# Flickr API error codes which are worth retrying, service unavailable and write failed
+FLICKR_TRANSIENT_CODES = (105, 106)
+
+logger = logging.getLogger(__name__)
 
 class Resiliently:
-    def __init__(self, config):
+    """Makes remote calls with rate limiting and retries.
+
+    Metadata calls (listing, creating albums etc.) and transfers (uploading and downloading files)
+    can be limited separately, as providers often allow different rates for each. Transfers share
+    the metadata limit unless transfer_throttling is configured.
+
+    Failed calls are retried according to the kind of error: transient errors, e.g. a dropped
+    connection, are retried with exponential backoff; rate limit responses wait as long as the
+    server asks and pause every call to the provider; permanent errors, e.g. 404 Not Found,
+    aren't retried.
+
+    Args:
+        config: The current configuration.
+        controller: An optional ConcurrencyController to limit the calls in flight, it's told
+            the outcome of each call so it can adapt the limit.
+        provider: The name of the provider the calls are made to, e.g. flickr, for reporting.
+    """
+
+    def __init__(self, config, controller=None, provider=None):
         self._config = config
-        self._throttler = Throttle()
-        if config.verbose:
-            logging.getLogger('backoff').addHandler(logging.StreamHandler())
+        self._controller = controller
+        self.provider = provider
+        self._counters = {'calls': 0, 'errors': 0, 'retries': 0, 'throttle_sec': 0}
+        self._counters_lock = threading.Lock()
+        self._limiter = RateLimiter(config.throttling, config.burst)
+        self._transfer_limiter = self._limiter if config.transfer_throttling is None \
+            else RateLimiter(config.transfer_throttling, config.burst)
+
+    @property
+    def counters(self):
+        """The number of calls attempted, failed and retried, and the seconds spent waiting to make them."""
+        with self._counters_lock:
+            return dict(self._counters)
 
     def call(self, func, *args, **kwargs):
-        return self._throttle(self._retry, func, *args, **kwargs)
+        return self._retry('call', self._limiter, func, *args, **kwargs)
+
+    def transfer(self, func, *args, **kwargs):
+        return self._retry('transfer', self._transfer_limiter, func, *args, **kwargs)
+
+    def _retry(self, call_kind, limiter, func, *args, **kwargs):
+        attempt = 0
+        name = _call_name(func, args if call_kind == 'call' else ())
+        while True:
+            try:
+                return self._attempt(call_kind, limiter, name, func, *args, **kwargs)
+            except Exception as err:    #pylint: disable=broad-except
+                kind, retry_after = classify_error(err)
+                if kind == PERMANENT or attempt >= self._config.retry:
+                    raise
+                if kind == RATE_LIMITED:
+                    if retry_after is not None and retry_after > MAX_RETRY_AFTER_SEC:
+                        logger.info(f"rate limited for {round(retry_after)} sec, giving up")
+                        raise
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                    logger.info(f"rate limited, pausing for {round(delay, 2)} sec")
+                    # Slow down every call to the provider, not just this one
+                    self._limiter.pause(delay)
+                    self._transfer_limiter.pause(delay)
+                else:
+                    delay = self._backoff(attempt)
+                    logger.debug(f"{_name(func)} failed with {err!r}, retrying in {round(delay, 2)} sec")
+                    self._count('throttle_sec', delay)
+                    time.sleep(delay)
+                attempt += 1
+                self._count('retries')
+
+    def _attempt(self, call_kind, limiter, name, func, *args, **kwargs):
+        if self._controller:
+            self._controller.acquire()
+        outcome, latency = FAILED, None
+        try:
+            self._count('throttle_sec', limiter.acquire())
+            self._count('calls')
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                stats.record_call(name, time.monotonic() - start, is_error=True)
+                self._count('errors')
+                raise
+            outcome, latency = SUCCESS, time.monotonic() - start
+            stats.record_call(name, latency)
+            return result
+        except Exception as err:
+            if classify_error(err)[0] == RATE_LIMITED or is_timeout(err):
+                outcome = CONGESTED
+            raise
+        finally:
+            if self._controller:
+                self._controller.release(call_kind, outcome, latency)
+
+    def _count(self, counter, value=1):
+        with self._counters_lock:
+            self._counters[counter] += value
+
+    @staticmethod
+    def _backoff(attempt):
+        # Full jitter, so parallel transfers that failed together don't retry together
+        return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+
+def classify_error(err):
+    """Works out whether a failed call is worth retrying.
+
+    Args:
+        err: The exception raised by the call.
+
+    Returns:
+        A tuple of the kind of error (TRANSIENT, RATE_LIMITED or PERMANENT) and the number of
+        seconds the server asked us to wait before retrying, or None.
+    """
+    status, headers = _get_response(err)
+    retry_after = _parse_retry_after(headers.get('Retry-After')) if headers else None
+    if retry_after is None:
+        retry_after = getattr(err, 'retry_after', None)
+
+    if isinstance(err, StreamError):
+        return PERMANENT, None
+    if status == 429 or type(err).__name__ == 'FlickrRateLimitError':
+        return RATE_LIMITED, retry_after
+    if status == 503 and retry_after is not None:
+        return RATE_LIMITED, retry_after
+    if status:
+        return (TRANSIENT if status == 408 or status >= 500 else PERMANENT), None
+    if isinstance(err, (HTTPError, FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+        # An HTTP error without a status didn't come from the server, e.g. a media item that
+        # failed to be created, so retrying the call won't change the outcome
+        return PERMANENT, None
+    if isinstance(err, (URLError, RequestsConnectionError, Timeout, ChunkedEncodingError, ConnectionError,
+                        TimeoutError, socket.timeout, socket.gaierror, http.client.HTTPException)):
+        return TRANSIENT, None
+    if isinstance(err, OSError):
+        return PERMANENT, None
+    code = getattr(err, 'code', None)
+    if isinstance(code, int):
+        # A Flickr API error
+        return (TRANSIENT if code in FLICKR_TRANSIENT_CODES else PERMANENT), None
+    if isinstance(err, (ValueError, TypeError, AttributeError, KeyError, NotImplementedError)):
+        return PERMANENT, None
+    return TRANSIENT, None
+
+def is_timeout(err):
+    return isinstance(err, (Timeout, TimeoutError, socket.timeout)) or \
+        (isinstance(err, URLError) and isinstance(err.reason, (TimeoutError, socket.timeout))) or \
+        type(err).__name__ == 'FlickrTimeoutError'
+
+def _get_response(err):
+    if isinstance(err, HTTPError) and err.response is not None:
+        return err.response.status_code, err.response.headers
+    if isinstance(err, UrlHTTPError):
+        return err.code, err.headers
+    return getattr(err, 'status_code', None), None
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0, (date - datetime.now(timezone.utc)).total_seconds())
+
+def _name(func):
+    return getattr(func, '__name__', None) or repr(func)
 
-    def _throttle(self, func, *args, **kwargs):
-        return self._throttler.throttle(delay_sec=self._config.throttling)(func)(*args, **kwargs)
+def _call_name(func, args):
+    """Names a call for the stats, e.g. flickr.photosets.getList or GoogleApi._get /v1/albums.
 
-    def _retry(self, func, *args, **kwargs):
-        # We +1 this because backoff retries UP to and not including max_retries
-        max_tries = self._config.retry + 1
-        return backoff.on_exception(backoff.expo, Exception, max_tries=max_tries)(func)(*args, **kwargs)
+    Flickr calls are named by their API method, calls taking a url by the function and url path,
+    without the query string or host which vary between calls to the same endpoint.
+    """
+    # A Walker is passed the method it pages through
+    for target in (func,) + tuple(args[:1]):
+        flickr_method = getattr(target, 'flickr_method', None)
+        if isinstance(flickr_method, str):
+            return flickr_method
+    name = getattr(func, '__qualname__', None)
+    if not isinstance(name, str):
+        name = _name(func)
+    if args and isinstance(args[0], str) and '://' in args[0]:
+        return f"{name} {urlsplit(args[0]).path}"
+    return name
@@ -0,0 +1,61 @@
+import json
+import heapq
+import logging
+import tempfile
+from itertools import islice
+from .file import File
+
+logger = logging.getLogger(__name__)
+
+def sort_files(files, buffer_size):
+    """Sorts files by name, through temporary files if there are more than fit in the buffer.
+
+    The files are read in runs of buffer_size, each run is sorted in memory and written to a
+    temporary file, then the runs are merged as the result is iterated. So at most buffer_size
+    files are held in memory, plus one from each run while merging.
+
+    Args:
+        files: An iterable of File.
+        buffer_size: The most files to sort in memory, 0 for no limit.
+
+    Returns:
+        An iterable of the sorted files. All the files have been read and the runs written
+        by the time this returns.
+    """
+    key = lambda x: x.name
+    if buffer_size < 1:
+        return sorted(files, key=key)
+    iterator = iter(files)
+    run = sorted(islice(iterator, buffer_size), key=key)
+    if len(run) < buffer_size:
+        return run
+    run_files = []
+    try:
+        while run:
+            run_files.append(_write_run(run))
+            run = sorted(islice(iterator, buffer_size), key=key)
+    except BaseException:
+        for f in run_files:
+            f.close()
+        raise
+    logger.debug(f"sorting files through {len(run_files)} temporary files")
+    return _merge(run_files, key)
+
+def _write_run(run):
+    f = tempfile.TemporaryFile('w+', encoding='utf-8')
+    for file_ in run:
+        f.write(json.dumps(file_.to_dict()) + '\n')
+    f.seek(0)
+    return f
+
+def _read_run(f):
+    for line in f:
+        yield File.from_dict(json.loads(line))
+
+def _merge(run_files, key):
+    try:
+        # Runs are merged in the order they were read, so files with the same name keep their order
+        yield from heapq.merge(*[_read_run(f) for f in run_files], key=key)
+    finally:
+        for f in run_files:
+            f.close()
@@ -0,0 +1,181 @@
+import json
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+# Upper bounds in seconds of the call latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+logger = logging.getLogger(__name__)
+
+class Stats:
+    """Records the time spent in each phase of a run and the latency of each remote call.
+
+    Phases overlap, e.g. the next folder is listed while files from the previous folder are
+    transferred, and nest, e.g. local files are hashed while they're listed. So each phase
+    records both the busy time, summed across threads, and the wall time from when it first
+    started until it last finished.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._phases = {}
+        self._calls = {}
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}
+            self._calls = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block as an occurrence of a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._record_phase(name, end - start, start, end)
+
+    def timed(self, name, func, *args):
+        """Lists items as an occurrence of a phase.
+
+        Only the time spent in func and getting each item counts towards the phase, not the
+        time the caller spends between items, so listings which fetch pages lazily are timed
+        accurately.
+
+        Args:
+            name: The phase name.
+            func: A function returning an iterable, e.g. storage.list_files.
+            args: The arguments to call func with.
+
+        Returns:
+            A generator of the items.
+        """
+        busy, first_start, last_end = 0, None, None
+        iterator = None
+        try:
+            while True:
+                start = time.perf_counter()
+                if first_start is None:
+                    first_start = start
+                try:
+                    if iterator is None:
+                        iterator = iter(func(*args))
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    last_end = time.perf_counter()
+                    busy += last_end - start
+                yield item
+        finally:
+            if first_start is not None:
+                self._record_phase(name, busy, first_start, last_end)
+
+    def record_call(self, name, latency, is_error=False):
+        """Records the latency in seconds of a remote call."""
+        with self._lock:
+            call = self._calls.get(name)
+            if not call:
+                call = self._calls[name] = _CallStats()
+            call.add(latency, is_error)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'phases': {name: phase.to_dict() for name, phase in self._phases.items()},
+                'calls': {name: call.to_dict() for name, call in sorted(self._calls.items())}
+            }
+
+    def format_table(self):
+        """Formats the phases and calls as a text table."""
+        data = self.to_dict()
+        lines = [f"\n{'phase':<36}{'count':>8}{'busy':>10}{'wall':>10}"]
+        for name, phase in data['phases'].items():
+            lines.append(f"{name:<36}{phase['count']:>8}{_sec(phase['busy_sec']):>10}{_sec(phase['wall_sec']):>10}")
+        if data['calls']:
+            lines.append(f"\n{'call':<36}{'count':>8}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+            for name, call in data['calls'].items():
+                lines.append(f"{name:<36}{call['count']:>8}{call['errors']:>8}{_sec(call['mean_sec']):>10}"
+                             f"{_sec(call['p50_sec']):>10}{_sec(call['p95_sec']):>10}{_sec(call['max_sec']):>10}")
+        return '\n'.join(lines)
+
+    def log_table(self):
+        logger.info(self.format_table())
+
+    def save(self, path):
+        """Writes the phases and calls to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logger.debug(f"stats written to {path}")
+
+    def _record_phase(self, name, busy, start, end):
+        with self._lock:
+            phase = self._phases.get(name)
+            if not phase:
+                phase = self._phases[name] = _PhaseStats()
+            phase.add(busy, start, end)
+
+class _PhaseStats:
+
+    def __init__(self):
+        self.count = 0
+        self.busy = 0
+        self.start = None
+        self.end = None
+
+    def add(self, busy, start, end):
+        self.count += 1
+        self.busy += busy
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+
+    def to_dict(self):
+        return {'count': self.count, 'busy_sec': self.busy, 'wall_sec': self.end - self.start}
+
+class _CallStats:
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, latency, is_error):
+        self.count += 1
+        self.errors += int(is_error)
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def percentile(self, fraction):
+        """Estimates a percentile as the upper bound of the bucket it falls in."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_sec': self.total,
+            'mean_sec': self.total / self.count,
+            'p50_sec': self.percentile(0.5),
+            'p95_sec': self.percentile(0.95),
+            'max_sec': self.max,
+            'buckets': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], self.buckets))
+        }
+
+def _sec(value):
+    return f"{value:.3f}s"
+
+# Shared by every component, so a run is reported as a whole
+stats = Stats()
@@ -2,6 +2,7 @@ import os
 import re
 from tempfile import NamedTemporaryFile
 from abc import abstractmethod
+from .stream import StreamBuffer
 
 class Storage:
 
@@ -38,6 +39,9 @@ class Storage:
             file_: The File object to copy.
             folder_name: The name of the destination folder to copy to.
             dest_storage: The destination storage provider to copy to.
+
+        Returns:
+            A Future if the destination completes the upload later (see flush), otherwise None.
         """
 
     @abstractmethod
@@ -52,6 +56,16 @@ class Storage:
     def logout(self):
         pass
 
+    def flush(self, folder_name=None):
+        """Completes any uploads the provider has buffered.
+
+        Args:
+            folder_name: The name of the folder to complete uploads for, or None for all folders.
+        """
+
+    def close(self):
+        """Releases any resources held by the provider, called once when the program finishes."""
+
     def mkdirp(self, path):
         """Creates all missing folders in the path.
 
@@ -75,12 +89,46 @@ class RemoteStorage(Storage):
     def upload(self, src, folder_name, file_name, checksum):
         pass
 
+    def download_stream(self, file_):
+        """Opens a file for streaming from this provider.
+
+        Args:
+            file_: The File object to download.
+
+        Returns:
+            An iterable of the file contents in chunks of bytes, or None if the provider can
+            only download to a file.
+        """
+        return None
+
+    def upload_stream(self, stream, folder_name, file_name, checksum):
+        """Uploads a file from a stream.
+
+        By default the stream is written to a temporary file which is then uploaded, providers
+        that accept a stream should override this.
+
+        Args:
+            stream: A StreamBuffer of the file contents.
+            folder_name: The name of the folder to upload to.
+            file_name: The name of the file.
+            checksum: The file checksum, if known.
+        """
+        with NamedTemporaryFile() as temp_file:
+            for data in stream:
+                temp_file.write(data)
+            temp_file.flush()
+            return self.upload(temp_file.name, folder_name, file_name, checksum)
+
     def copy_file(self, file_, folder_name, dest_storage):
         if isinstance(dest_storage, RemoteStorage):
-            temp_file = NamedTemporaryFile()
-            self.download(file_, temp_file.name)
-            dest_storage.upload(temp_file.name, folder_name, file_.name, file_.checksum)
-            temp_file.close()
-        else:
-            dest = os.path.join(dest_storage.path, folder_name, file_.name)
-            self.download(file_, dest)
+            chunks = self.download_stream(file_)
+            if chunks is not None:
+                # Stream the download straight into the upload through a bounded buffer
+                with StreamBuffer(chunks) as stream:
+                    return dest_storage.upload_stream(stream, folder_name, file_.name, file_.checksum)
+            with NamedTemporaryFile() as temp_file:
+                self.download(file_, temp_file.name)
+                return dest_storage.upload(temp_file.name, folder_name, file_.name, file_.checksum)
+        dest = os.path.join(dest_storage.path, folder_name, file_.name)
+        self.download(file_, dest)
+        return None
@@ -0,0 +1,76 @@
+from .pipeline import Stage
+
+# Transfers are streamed in chunks of this size, with at most BUFFER_CHUNKS chunks held in memory
+CHUNK_SIZE = 1024 * 1024
+BUFFER_CHUNKS = 8
+
+class StreamError(Exception):
+    """Reading the source of a stream failed.
+
+    A stream can't be rewound, so once its source has failed every later read raises this too,
+    and a call reading from it isn't worth retrying.
+    """
+
+class StreamBuffer:
+    """A bounded buffer between a download and an upload.
+
+    A background stage reads chunks of the download into a bounded queue, pausing whenever the
+    queue is full. The upload reads them back out either by iterating the buffer or with the
+    file-like read method. Errors reading the download are raised as a StreamError, on the read
+    that hits the error and every read after it.
+
+    Args:
+        chunks: An iterable of bytes, e.g. the body of a download.
+        max_chunks: The maximum number of chunks to buffer.
+    """
+
+    def __init__(self, chunks, max_chunks=BUFFER_CHUNKS):
+        self._stage = Stage((data for data in chunks if data), max_chunks, name='stream')
+        self._chunks = self._read_source()
+        self._remainder = b''
+        self._error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        self._raise_error()
+        if self._remainder:
+            data, self._remainder = self._remainder, b''
+            yield data
+        yield from self._chunks
+
+    def read(self, size=-1):
+        """Reads up to size bytes, or to the end of the stream if size is negative."""
+        self._raise_error()
+        parts = [self._remainder]
+        length = len(self._remainder)
+        for data in self._chunks:
+            parts.append(data)
+            length += len(data)
+            if 0 <= size <= length:
+                break
+        data = b''.join(parts)
+        if size < 0:
+            self._remainder = b''
+            return data
+        data, self._remainder = data[:size], data[size:]
+        return data
+
+    def close(self):
+        """Stops reading the download, e.g. if the upload fails."""
+        self._stage.close()
+
+    def _read_source(self):
+        try:
+            yield from self._stage
+        except Exception as err:
+            self._error = err
+            raise StreamError(f"reading the source failed: {err!r}") from err
+
+    def _raise_error(self):
+        if self._error:
+            raise StreamError(f"reading the source failed: {self._error!r}") from self._error
@@ -1,12 +1,24 @@
 import os
 import time
 import logging
-from itertools import tee
+from itertools import chain
+from concurrent.futures import Future
+from threading import Lock
 from urllib.error import URLError
 from requests.exceptions import HTTPError
 from .folder import RootFolder
+from .diff import diff, COPY, SKIP, DELETE
+from .plan import Plan, FolderPlan
+from .pipeline import Stage, background
+from .journal import Journal, COPY as JOURNAL_COPY, DELETE as JOURNAL_DELETE
+from .transfer_pool import TransferPool
+from .stats import stats
+from .stream import StreamError
 from .utils import choice
 
+# The number of folders to list ahead of the folder currently being transferred
+LISTING_DEPTH = 2
+TRANSFER_ERRORS = (URLError, FileNotFoundError, HTTPError, StreamError)
 logger = logging.getLogger(__name__)
 
 class Sync:
@@ -15,87 +27,207 @@ class Sync:
         self._config = config
         self._src = src
         self._dest = dest
+        # Copies started, for the summary, copied counts only those which finished successfully
         self._copy_count = 0
+        self._copied_count = 0
         self._skip_count = 0
         self._delete_count = 0
+        self._error_count = 0
+        self._copied_bytes = 0
+        self._skip_bytes = 0
+        self._delete_bytes = 0
+        self._counters_lock = Lock()
+        self._pool = TransferPool(config.jobs)
+        self._journal = None
 
-    def run(self):
-        if self._config.dry_run:
+    @property
+    def counters(self):
+        """The number and total size of files copied, skipped and deleted so far, and the number of failed copies.
+
+        Copies are counted once they've finished, not while they're queued or in flight.
+        """
+        with self._counters_lock:
+            copied_count, copied_bytes, error_count = self._copied_count, self._copied_bytes, self._error_count
+        return {
+            'copy': copied_count,
+            'skip': self._skip_count,
+            'delete': self._delete_count,
+            'error': error_count,
+            'copy_bytes': copied_bytes,
+            'skip_bytes': self._skip_bytes,
+            'delete_bytes': self._delete_bytes
+        }
+
+    def run(self, plan=None):
+        """Synchronises the destination with the source.
+
+        Args:
+            plan: A previously saved Plan to apply, instead of listing the source and destination.
+        """
+        has_deletes = plan.has_deletes if plan else self._config.delete
+        if self._config.plan_out:
+            logger.info("planning only, no files will be copied")
+        elif self._config.dry_run:
             logger.info("dry run enabled, no files will be copied")
-        elif self._config.delete:
+        elif has_deletes:
             if not choice("really delete any additional files?", "no"):
                 exit()
-        logger.info("building folder list...")
         start = time.time()
 
-        src_folders, src_folders_memo = tee(self._src.list_folders(), 2)
-        dest_folders = {f.name.lower(): f for f in self._dest.list_folders()}
-        for src_folder in src_folders:
-            dest_folder = dest_folders.get(src_folder.name.lower())
-            print(src_folder.name + os.sep)
-            if dest_folder:
-                self._merge_folders(src_folder, dest_folder)
-            else:
-                self._copy_folder(src_folder)
+        if plan:
+            logger.info("applying plan...")
+            folder_plans = plan.folders
+        else:
+            logger.info("building folder list...")
+            folder_plans = self._plan_folders()
+
+        if self._config.journal and not self._is_dry_run():
+            self._journal = Journal(self._config.journal, *((plan.src, plan.dest) if plan else (self._config.src, self._config.dest)))
+            self._journal.open()
+
+        plan_out = Plan(self._config.src, self._config.dest, self._config.delete) if self._config.plan_out else None
+        is_complete = False
+        try:
+            for folder_plan in folder_plans:
+                if plan_out:
+                    plan_out.add(folder_plan)
+                self._apply_folder(folder_plan)
+            self._pool.join()
+            is_complete = True
+        finally:
+            # Let in flight transfers finish and complete any buffered uploads so they're
+            # recorded before the journal is closed
+            self._pool.shutdown()
+            if not self._is_dry_run():
+                self._dest.flush()
+            if self._journal:
+                # Keep the journal after failed copies, so a rerun only retries what failed
+                with self._counters_lock:
+                    is_successful = is_complete and self._error_count == 0
+                self._journal.close(compact=is_successful)
+
+        if plan_out:
+            plan_out.save(self._config.plan_out)
+            logger.info(f"plan written to {self._config.plan_out}, {plan_out.total_bytes} bytes to copy")
+        self._print_summary(time.time() - start, self._copy_count, self._skip_count, self._delete_count)
+
+    def _is_dry_run(self):
+        return self._config.dry_run or self._config.plan_out
+
+    def _plan_folders(self):
+        """Lists and compares the source and destination folders.
+
+        The listing runs as a pipeline of stages joined by bounded queues: source folders are
+        enumerated and each folder's files are listed and compared ahead of the transfers for
+        previous folders.
+
+        Returns:
+            A generator of FolderPlan objects.
+        """
+        src_folders = stats.timed('list-folders', self._src.list_folders)
+        # Read the first folder up front so any interactive login happens before the stages start
+        first_folder = next(src_folders, None)
+        dest_folders = background(self._list_dest_folders)
+        if first_folder:
+            src_folders = chain([first_folder], src_folders)
+        if self._config.root_files:
+            src_folders = chain(src_folders, [RootFolder()])
+        src_folders = Stage(src_folders, LISTING_DEPTH, name='list-folders')
+        folder_plans = Stage((self._plan_folder(f, dest_folders) for f in src_folders), LISTING_DEPTH, name='list-files')
+
+        src_folder_names = set()
+        root_plan = None
+        try:
+            for src_folder, folder_plan in folder_plans:
+                # Root files are merged last, after removing extra folders
+                if src_folder.is_root:
+                    root_plan = folder_plan
+                    continue
+                src_folder_names.add(src_folder.name.lower())
+                if folder_plan:
+                    yield folder_plan
+        finally:
+            src_folders.close()
+            folder_plans.close()
 
         # Remove extra folders
         if self._config.delete:
-            src_folder_names = [f.name.lower() for f in src_folders_memo]
-            extra_folders = (folder for name_lower, folder in dest_folders.items() \
-                if name_lower not in src_folder_names)
-            for folder in extra_folders:
-                if not folder.is_root:
-                    self._delete_folder_and_contents(folder)
+            for name_lower, folder in dest_folders.result().items():
+                if name_lower not in src_folder_names and not folder.is_root and not self._is_folder_done(folder):
+                    delete = list(stats.timed('list-files', self._dest.list_files, folder))
+                    yield FolderPlan(None, folder, delete=delete, delete_folder=True)
 
         # Merge root files if requested
-        if self._config.root_files:
-            self._merge_folders(RootFolder(), RootFolder())
+        if root_plan:
+            yield root_plan
 
-        self._print_summary(time.time() - start, self._copy_count, self._skip_count, self._delete_count)
+    def _list_dest_folders(self):
+        return {f.name.lower(): f for f in stats.timed('list-folders', self._dest.list_folders)}
 
-    def _copy_folder(self, folder):
-        src_files = self._src.list_files(folder)
-        for src_file in src_files:
-            path = os.path.join(folder.name, src_file.name)
-            self._copy_count += 1
-            self._copy_file(folder, src_file, path)
-
-    def _merge_folders(self, src_folder, dest_folder):
-        src_files, src_files_memo = tee(self._src.list_files(src_folder), 2)
-        dest_files = list(self._dest.list_files(dest_folder))
-        dest_filenames = [f.name.lower() for f in dest_files]
-
-        # Copy new files
-        for src_file in src_files:
-            lower_filename = src_file.name.lower()
-            file_exists = lower_filename in dest_filenames
-            # Fix for flickr converting .jpeg to .jpg.
-            if lower_filename.endswith(".jpeg"):
-                file_exists = file_exists or "{}.jpg".format(lower_filename[:-5]) in dest_filenames
-            path = os.path.join(src_folder.name, src_file.name)
-            if not file_exists:
-                self._copy_count += 1
-                self._copy_file(src_folder, src_file, path)
-            else:
+    def _plan_folder(self, src_folder, dest_folders):
+        if self._is_folder_done(src_folder):
+            logger.debug(f"{src_folder.name + os.sep}...skipped, completed by a previous run")
+            return src_folder, None
+        if src_folder.is_root:
+            dest_folder = RootFolder()
+        else:
+            dest_folder = dest_folders.result().get(src_folder.name.lower())
+        src_files = list(stats.timed('list-files', self._src.list_files, src_folder))
+        dest_files = list(stats.timed('list-files', self._dest.list_files, dest_folder)) if dest_folder else []
+
+        folder_plan = FolderPlan(src_folder, dest_folder)
+        actions = {COPY: folder_plan.copy, SKIP: folder_plan.skip, DELETE: folder_plan.delete}
+        for action in diff(src_files, dest_files, self._config.delete):
+            actions[action.kind].append(action.file)
+        return src_folder, folder_plan
+
+    def _apply_folder(self, folder_plan):
+        src_folder = folder_plan.src_folder
+        if self._is_folder_done(src_folder or folder_plan.dest_folder):
+            return
+        if src_folder and not src_folder.is_root:
+            print(src_folder.name + os.sep)
+        progress = _FolderProgress(folder_plan, self._flush_folder, self._complete_folder)
+        for file_ in folder_plan.copy:
+            path = os.path.join(src_folder.name, file_.name)
+            if self._journal and self._journal.is_done(JOURNAL_COPY, src_folder.name, file_):
                 self._skip_count += 1
-                logger.debug("{}...skipped, file exists".format(path))
+                self._skip_bytes += file_.size or 0
+                logger.debug(f"{path}...skipped, copied by a previous run")
+                continue
+            self._copy_count += 1
+            progress.add()
+            self._copy_file(src_folder, file_, path, progress)
+        for file_ in folder_plan.skip:
+            self._skip_count += 1
+            self._skip_bytes += file_.size or 0
+            logger.debug("{}...skipped, file exists".format(os.path.join(src_folder.name, file_.name)))
+        for file_ in folder_plan.delete:
+            if not (self._journal and self._journal.is_done(JOURNAL_DELETE, folder_plan.dest_folder.name, file_)):
+                self._delete_file(file_, folder_plan.dest_folder)
+        if folder_plan.delete_folder:
+            self._delete_folder(folder_plan.dest_folder)
+        progress.transferred()
+        progress.done()
 
-        # Remove extra files
-        if self._config.delete:
-            src_filenames = [f.name.lower() for f in src_files_memo]
-            extra_files = (f for f in dest_files if f.name.lower() not in src_filenames)
+    def _flush_folder(self, folder_plan):
+        # Every upload for the folder has been sent, so don't wait for a full batch
+        if folder_plan.copy and not self._is_dry_run():
+            self._dest.flush(folder_plan.src_folder.name)
 
-            for f in extra_files:
-                self._delete_file(f, dest_folder)
+    def _complete_folder(self, folder_plan, is_successful):
+        if self._journal and is_successful:
+            self._journal.record_folder((folder_plan.src_folder or folder_plan.dest_folder).name)
 
-    def _delete_folder_and_contents(self, folder):
-        for f in self._dest.list_files(folder):
-            self._delete_file(f, folder)
+    def _is_folder_done(self, folder):
+        return self._journal and self._journal.is_folder_done(folder.name)
 
+    def _delete_folder(self, folder):
         path = folder.name + os.sep
         print(f"deleting {path}")
-        if not self._config.dry_run:
-            was_empty = self._dest.delete_folder(folder)
+        if not self._is_dry_run():
+            with stats.phase('delete'):
+                was_empty = self._dest.delete_folder(folder)
         else:
             was_empty = True
         if was_empty:
@@ -106,22 +238,105 @@ class Sync:
     def _delete_file(self, file_, folder):
         path = os.path.join(folder.name, file_.name)
         print(f"deleting {path}")
-        if not self._config.dry_run:
-            self._dest.delete_file(file_, folder.name)
+        if not self._is_dry_run():
+            with stats.phase('delete'):
+                self._dest.delete_file(file_, folder.name)
+            if self._journal:
+                self._journal.record(JOURNAL_DELETE, folder.name, file_)
         self._delete_count += 1
+        self._delete_bytes += file_.size or 0
         logger.debug(f"{path}...deleted")
 
-    def _copy_file(self, folder, file_, path):
+    def _copy_file(self, folder, file_, path, progress):
         print(path)
-        if not self._config.dry_run:
-            try:
-                self._src.copy_file(file_, folder and folder.name, self._dest)
-            except (URLError, FileNotFoundError, HTTPError) as err:
-                logger.error("Error connecting to server, skipping. {!r}".format(err))
+        if not self._is_dry_run():
+            self._pool.submit(self._transfer_file, folder, file_, path, progress)
+        else:
+            logger.debug("{}...copied".format(path))
+            progress.transferred()
+            progress.done()
+
+    def _transfer_file(self, folder, file_, path, progress):
+        try:
+            with stats.phase('transfer'):
+                result = self._src.copy_file(file_, folder and folder.name, self._dest)
+        except TRANSFER_ERRORS as err:
+            logger.error("{}...error connecting to server, skipping. {!r}".format(path, err))
+            self._count_error()
+            progress.transferred()
+            progress.done(is_successful=False)
+            return
+        progress.transferred()
+        if isinstance(result, Future):
+            # The destination completes the upload later, e.g. in a batch with other files
+            result.add_done_callback(lambda f: self._complete_file(folder, file_, path, progress, f.exception()))
+        else:
+            self._complete_file(folder, file_, path, progress)
 
+    def _complete_file(self, folder, file_, path, progress, err=None):
+        if err:
+            if isinstance(err, TRANSFER_ERRORS):
+                logger.error("{}...error connecting to server, skipping. {!r}".format(path, err))
+            else:
+                logger.error("{}...error copying, skipping. {!r}".format(path, err))
+            self._count_error()
+            progress.done(is_successful=False)
+            return
+        if self._journal:
+            self._journal.record(JOURNAL_COPY, folder.name, file_)
+        self._count_copied(file_)
         logger.debug("{}...copied".format(path))
+        progress.done()
+
+    def _count_copied(self, file_):
+        # Transfers complete on the pool's threads
+        with self._counters_lock:
+            self._copied_count += 1
+            self._copied_bytes += file_.size or 0
+
+    def _count_error(self):
+        with self._counters_lock:
+            self._error_count += 1
 
     def _print_summary(self, elapsed, files_copied, files_skipped, files_deleted):
         skipped_msg = f", skipped {files_skipped} files(s) that already exist" if files_skipped > 0 else ""
         deleted_msg = f", deleted {files_deleted} additional files(s)" if files_deleted > 0 else ""
         logger.info(f"\ntransferred {files_copied} file(s){skipped_msg}{deleted_msg} in {round(elapsed, 2)} sec")
+
+class _FolderProgress:
+    """Tracks the outstanding transfers for a folder.
+
+    A transfer is first transferred, once the file has been sent, and then done, once the
+    destination has completed it. Calls on_transferred once every transfer added has been sent
+    and on_complete once they've all finished, after transferred and done have been called for
+    the folder itself.
+    """
+
+    def __init__(self, folder_plan, on_transferred, on_complete):
+        self._folder_plan = folder_plan
+        self._on_transferred = on_transferred
+        self._on_complete = on_complete
+        self._sending = 1
+        self._pending = 1
+        self._is_successful = True
+        self._lock = Lock()
+
+    def add(self):
+        with self._lock:
+            self._sending += 1
+            self._pending += 1
+
+    def transferred(self):
+        with self._lock:
+            self._sending -= 1
+            is_sent = self._sending == 0
+        if is_sent:
+            self._on_transferred(self._folder_plan)
+
+    def done(self, is_successful=True):
+        with self._lock:
+            self._pending -= 1
+            self._is_successful = self._is_successful and is_successful
+            is_complete = self._pending == 0
+        if is_complete:
+            self._on_complete(self._folder_plan, self._is_successful)
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class TransferPool:
+    """Runs file transfers on a bounded pool of worker threads.
+
+    With a single job, transfers run inline on the calling thread, preserving the original
+    sequential behaviour.
+    """
+
+    def __init__(self, jobs):
+        self._jobs = max(1, jobs or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self._jobs, thread_name_prefix='transfer') \
+            if self._jobs > 1 else None
+        # Bound the number of queued transfers so we don't buffer an entire listing in memory
+        self._slots = threading.BoundedSemaphore(self._jobs * 2)
+        self._error = None
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    def submit(self, func, *args, **kwargs):
+        """Schedules a transfer, blocking while the pool is full.
+
+        Args:
+            func: The function to run.
+            *args: Positional arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Raises:
+            Exception: Any unhandled exception raised by a previously submitted transfer.
+        """
+        self._raise_error()
+        if not self._executor:
+            func(*args, **kwargs)
+            return
+        self._slots.acquire()
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+
+    def join(self):
+        """Waits for all scheduled transfers to complete.
+
+        Raises:
+            Exception: Any unhandled exception raised by a transfer.
+        """
+        self.shutdown()
+        self._raise_error()
+
+    def shutdown(self):
+        """Waits for all scheduled transfers to complete, ignoring any errors."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _on_done(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() and not self._error:
+            self._error = future.exception()
+
+    def _raise_error(self):
+        if self._error:
+            error, self._error = self._error, None
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            raise error
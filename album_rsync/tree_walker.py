@@ -1,10 +1,12 @@
 import time
 import logging
-from rx import Observable, AnonymousObservable
-from rx.internal import extensionmethod
+from itertools import chain
 from .walker import Walker
 from .folder import RootFolder
-from .utils import unpack
+from .pipeline import prefetch
+from .sorting import sort_files
+from .stats import stats
+from .utils import mark_last
 
 UNICODE_LEAF = "├─── "
 UNICODE_LAST_LEAF = "└─── "
@@ -12,27 +14,13 @@ UNICODE_BRANCH = "│   "
 UNICODE_LAST_BRANCH = "    "
 logger = logging.getLogger(__name__)
 
-@extensionmethod(Observable)
-def is_last(source):
-    def subscribe(observer):
-        value = [None]
-        seen_value = [False]
-
-        def on_next(x):
-            if seen_value[0]:
-                observer.on_next((value[0], False))
-            value[0] = x
-            seen_value[0] = True
-
-        def on_completed():
-            if seen_value[0]:
-                observer.on_next((value[0], True))
-            observer.on_completed()
-
-        return source.subscribe(on_next, observer.on_error, on_completed)
-    return AnonymousObservable(subscribe)
-
 class TreeWalker(Walker):
+    """Prints a tree of folders and files.
+
+    Folders without any files aren't shown, unless only listing folders. With prefetch set,
+    the files in the next folders are listed in parallel while the current folder is printed.
+    When sorting, folders larger than the sort buffer are sorted through temporary files.
+    """
 
     def __init__(self, config, storage):
         self._config = config
@@ -41,61 +29,50 @@ class TreeWalker(Walker):
     def walk(self):
         start = time.time()
 
-        # Create source stream with folder message items
-        folderlist = self._storage.list_folders()
+        folders = stats.timed('list-folders', self._storage.list_folders)
         if self._config.list_sort:
-            folderlist = sorted(folderlist, key=lambda x: x.name)
-        folders = Observable.from_(folderlist) \
-            .map(lambda f: {'folder': f})
+            folders = sorted(folders, key=lambda x: x.name)
         if self._config.root_files:
-            folders = folders.start_with({'folder': RootFolder()})
-
-        # Expand folder messages into file messages
-        folders = folders.publish().auto_connect(2)
-        files = folders.is_last() \
-            .map(unpack(lambda x, is_last: dict(x, is_last_folder=is_last)))
-        if not self._config.list_folders:
-            files = files.concat_map(self._walk_folder)
-        # Group by folder but still provide a file stream within each group
-        groups = files.group_by(lambda x: x['folder'])
-        groups.subscribe(self._walk_group)
-
-        # Gather counts and print summary
-        all_folder_count = folders.count(self._not_root)
-        shown_folder_count = groups \
-            .flat_map(lambda g: g.first()) \
-            .count(self._not_root)
-        files.count() \
-            .zip(shown_folder_count, all_folder_count, lambda n_files, n_shown, n_all: (n_files, n_shown, n_all - n_shown)) \
-            .subscribe(unpack(lambda n_files, n_shown, n_hidden: self._print_summary(time.time() - start, n_files, n_shown, n_hidden)))
-
-    def _not_root(self, x):
-        return not x['folder'].is_root
-
-    def _walk_group(self, source):
-        seen_value = [False]
-
-        def on_next(x):
-            if not seen_value[0] and self._not_root(x):
-                self._print_folder(**x)
-            if 'file' in x:
-                self._print_file(**dict(x, is_root_folder=x['folder'].is_root))
-            seen_value[0] = True
-
-        source.subscribe(on_next)
-
-    def _walk_folder(self, msg):
-        file_list = self._storage.list_files(msg['folder'])
+            folders = chain([RootFolder()], folders)
+
+        file_count = 0
+        shown_folder_count = 0
+        all_folder_count = 0
+        if self._config.list_folders:
+            folders = ((x, None) for x in mark_last(folders))
+        else:
+            folders = prefetch(lambda x: self._list_files(x[0]), mark_last(folders), self._config.prefetch)
+        for (folder, is_last_folder), files in folders:
+            if not folder.is_root:
+                all_folder_count += 1
+            if self._config.list_folders:
+                if not folder.is_root:
+                    self._print_folder(folder, is_last_folder)
+                    shown_folder_count += 1
+                continue
+            is_shown = False
+            for file_, is_last_file in mark_last(files):
+                # Print the folder with its first file, so empty folders aren't shown
+                if not is_shown and not folder.is_root:
+                    self._print_folder(folder, is_last_folder)
+                    shown_folder_count += 1
+                is_shown = True
+                self._print_file(file_, is_last_file, is_last_folder, folder.is_root)
+                file_count += 1
+
+        self._print_summary(time.time() - start, file_count, shown_folder_count, all_folder_count - shown_folder_count)
+
+    def _list_files(self, folder):
+        files = stats.timed('list-files', self._storage.list_files, folder)
         if self._config.list_sort:
-            file_list = sorted(file_list, key=lambda x: x.name)
-
-        return Observable.from_(file_list).is_last() \
-            .map(unpack(lambda f, is_last: dict(msg, file=f, is_last_file=is_last)))
+            return sort_files(files, self._config.list_sort_buffer)
+        # Prefetched files are listed on another thread, so must be listed before they're returned
+        return list(files) if self._config.prefetch else files
 
-    def _print_folder(self, folder, is_last_folder, **kwargs):  #pylint: disable=unused-argument
+    def _print_folder(self, folder, is_last_folder):
         print("{}{}".format(UNICODE_LAST_LEAF if is_last_folder else UNICODE_LEAF, folder.name))
 
-    def _print_file(self, file, is_last_file, is_last_folder, is_root_folder, **kwargs):  #pylint: disable=unused-argument
+    def _print_file(self, file, is_last_file, is_last_folder, is_root_folder):    #pylint: disable=redefined-builtin
         folder_prefix = ''
         if not is_root_folder:
             if is_last_folder:
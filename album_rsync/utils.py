@@ -1,4 +1,5 @@
 import functools
+import mimetypes
 
 def unpack(func):
     @functools.wraps(func)
@@ -25,3 +26,23 @@ def choice(question, default="yes"):
         if value in valid:
             return valid[value]
         print("Please respond with 'yes' or 'no' (or 'y' or 'n').\n")
+
+def guess_media_type(name):
+    """Guesses the MIME type of a file from its extension, or None if it's unrecognised."""
+    return mimetypes.guess_type(name, strict=False)[0]
+
+def mark_last(iterable):
+    """Pairs each item with whether it's the last item.
+
+    Returns:
+        A generator of (item, is_last) tuples.
+    """
+    iterator = iter(iterable)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
@@ -0,0 +1,87 @@
+"""
+Runs the benchmark suite and writes the results to JSON, so they can be compared between commits.
+
+Usage:
+$ python -m benchmarks [--quick] [--output FILE] [NAME ...]
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from benchmarks import bench_diff, bench_listing, bench_sync, bench_checksum, bench_http, bench_walker
+
+# The arguments to run each benchmark with, in full and with --quick
+SUITE = {
+    'diff': (bench_diff.run, {}, {'sizes': [100, 1000]}),
+    'listing': (bench_listing.run, {}, {'local_scales': [(10, 100)], 'fake_scales': [(10, 100)]}),
+    'sync': (bench_sync.run, {}, {'fake_scales': [(10, 100)], 'local_scales': [(10, 100)]}),
+    'checksum': (bench_checksum.run, {'files': 100, 'size_kb': 1024}, {'files': 20, 'size_kb': 256}),
+    'http': (bench_http.run, {'calls': 1000}, {'calls': 100}),
+    'walker': (bench_walker.run, {}, {'scales': [(10, 100)], 'prefetch_spec': 'fake:folders=10,files=10,list_ms=20',
+                                 'sort_spec': 'fake:folders=1,files=2000', 'sort_buffers': [0, 500]})
+}
+
+def run(names=None, quick=False):
+    """Runs the benchmarks.
+
+    Args:
+        names: The names of the benchmarks to run, or None for all.
+        quick: Whether to run at small scales, e.g. to check the benchmarks still work.
+
+    Returns:
+        A dict of the environment and each benchmark's results.
+    """
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'quick': quick,
+        'benchmarks': {}
+    }
+    for name in names or SUITE:
+        func, kwargs, quick_kwargs = SUITE[name]
+        print(f"running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        results = func(**(quick_kwargs if quick else kwargs))
+        report['benchmarks'][name] = {'sec': time.perf_counter() - start, 'results': results}
+    return report
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Runs the album-rsync benchmark suite.')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help=f"the benchmarks to run, any of {', '.join(SUITE)}. Defaults to all")
+    parser.add_argument('--quick', action='store_true',
+                        help='run at small scales, to check the benchmarks work rather than to measure')
+    parser.add_argument('-o', '--output', type=str, metavar='FILE',
+                        help='write the results to FILE as JSON, defaults to stdout')
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    report = run(args.names, args.quick)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark comparing serial and parallel checksum calculation when listing a local tree.
+
+Generates a temporary tree of random files, then lists it with --checksum using the original
+serial 8 KB read path and LocalStorage with a range of worker counts. The checksum cache is
+disabled so every file is read. Note the files will be in the OS page cache, so this measures
+hashing throughput rather than disk throughput.
+
+Usage:
+$ python -m benchmarks.bench_checksum [FILES] [SIZE_KB]
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import hashlib
+import tempfile
+from unittest.mock import MagicMock
+from album_rsync.local_storage import LocalStorage
+from album_rsync.folder import Folder
+from benchmarks.common import measure, generate_tree
+
+DEFAULT_FILES = 200
+DEFAULT_SIZE_KB = 2048
+FOLDERS = 4
+
+def serial_checksums(path):
+    """The original serial 8 KB read path, for comparison."""
+    checksums = []
+    for folder in sorted(os.listdir(path)):
+        folder_path = os.path.join(path, folder)
+        for name in os.listdir(folder_path):
+            checksum = hashlib.md5()
+            with open(os.path.join(folder_path, name), 'rb') as f:
+                while True:
+                    data = f.read(8192)
+                    if not data:
+                        break
+                    checksum.update(data)
+            checksums.append(checksum.hexdigest())
+    return checksums
+
+def storage_checksums(path, workers):
+    config = MagicMock()
+    config.checksum = True
+    config.no_checksum_cache = True
+    config.checksum_workers = workers
+    config.include = ''
+    config.exclude = ''
+    storage = LocalStorage(config, path)
+    checksums = [f.checksum
+                 for folder in sorted(os.listdir(path))
+                 for f in storage.list_files(Folder(name=folder))]
+    storage.close()
+    return checksums
+
+def run(files=DEFAULT_FILES, size_kb=DEFAULT_SIZE_KB, worker_counts=None):
+    """Runs the benchmark.
+
+    Args:
+        files: The number of files to generate, rounded down to a multiple of the number of folders.
+        size_kb: The size of each file in KB.
+        worker_counts: The worker counts to measure.
+
+    Returns:
+        A list of result dicts with the mode, worker count, seconds taken and MB per second.
+    """
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory() as path:
+        files = generate_tree(path, FOLDERS, max(files // FOLDERS, 1), size_kb * 1024)
+        total_mb = files * size_kb / 1024
+        # Warm the page cache
+        serial_checksums(path)
+        results = [('serial 8 KB', 1, measure(serial_checksums, path))]
+        results.extend(('parallel', workers, measure(storage_checksums, path, workers)) for workers in worker_counts)
+    return [{'mode': mode, 'workers': workers, 'sec': sec, 'mb_per_sec': total_mb / sec} for mode, workers, sec in results]
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILES
+    size_kb = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SIZE_KB
+    print(f"{files} files of {size_kb} KB")
+    print(f"{'mode':<12} {'workers':>7} {'time':>9} {'MB/s':>9}")
+    for result in run(files, size_kb):
+        print("{mode:<12} {workers:>7} {sec:>8.3f}s {mb_per_sec:>9.1f}".format(**result))
+
+if __name__ == '__main__':
+    main()
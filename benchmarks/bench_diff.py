@@ -0,0 +1,67 @@
+"""
+Micro-benchmark comparing the hash indexed diff planner with the list scan it replaced.
+
+Usage:
+$ python -m benchmarks.bench_diff
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import timeit
+from album_rsync.diff import diff
+from album_rsync.file import File
+
+SIZES = [100, 1000, 5000, 10000]
+
+def make_files(count, prefix='IMG_', offset=0):
+    return [File(id=i, name=f'{prefix}{i + offset:06}.jpg') for i in range(count)]
+
+def list_scan_diff(src_files, dest_files):
+    """The original list based diff from Sync._merge_folders, for comparison."""
+    dest_filenames = [f.name.lower() for f in dest_files]
+    actions = []
+    for src_file in src_files:
+        lower_filename = src_file.name.lower()
+        file_exists = lower_filename in dest_filenames
+        if lower_filename.endswith(".jpeg"):
+            file_exists = file_exists or "{}.jpg".format(lower_filename[:-5]) in dest_filenames
+        actions.append(file_exists)
+    src_filenames = [f.name.lower() for f in src_files]
+    actions.extend(f for f in dest_files if f.name.lower() not in src_filenames)
+    return actions
+
+def hash_index_diff(src_files, dest_files):
+    return list(diff(src_files, dest_files, delete=True))
+
+def measure(func, size, repeat=3):
+    # Half the destination overlaps the source, half are extra files to delete
+    src_files = make_files(size)
+    dest_files = make_files(size, offset=size // 2)
+    return min(timeit.repeat(lambda: func(src_files, dest_files), number=1, repeat=repeat))
+
+def run(sizes=None):
+    """Runs the benchmark.
+
+    Args:
+        sizes: The album sizes to measure.
+
+    Returns:
+        A list of result dicts with the album size and seconds taken by each implementation.
+    """
+    results = []
+    for size in sizes or SIZES:
+        results.append({
+            'size': size,
+            'list_scan_sec': measure(list_scan_diff, size, repeat=1 if size > 5000 else 3),
+            'hash_index_sec': measure(hash_index_diff, size)
+        })
+    return results
+
+def main():
+    print(f"{'files':>8} {'list scan':>12} {'hash index':>12} {'speedup':>8}")
+    for result in run():
+        print("{size:>8} {list_scan_sec:>11.4f}s {hash_index_sec:>11.4f}s {speedup:>7.1f}x".format(
+            speedup=result['list_scan_sec'] / result['hash_index_sec'], **result))
+
+if __name__ == '__main__':
+    main()
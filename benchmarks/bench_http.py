@@ -0,0 +1,86 @@
+"""
+Benchmark comparing a new connection per API call with the pooled HttpTransport.
+
+Starts the local Google Photos stand-in, then lists albums through GoogleApi using the module
+level requests functions it originally called and the pooled transport. The stand-in counts the
+connections it accepts. It serves plain HTTP over loopback, where a handshake costs almost
+nothing, so pass HANDSHAKE_MS to delay each new connection by the time the TCP and TLS
+handshakes take against the real service (several round trips).
+
+Usage:
+$ python -m benchmarks.bench_http [CALLS] [HANDSHAKE_MS]
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import time
+from unittest.mock import MagicMock
+import requests
+from album_rsync.google_api import GoogleApi
+from album_rsync.http_transport import HttpTransport
+from album_rsync.resiliently import Resiliently
+from tests.standins.google_photos import GooglePhotosStandin
+
+DEFAULT_CALLS = 2000
+DEFAULT_HANDSHAKE_MS = 0
+ALBUMS = 20
+
+class LegacyTransport:
+    """The module level requests functions GoogleApi originally called, for comparison."""
+
+    get = staticmethod(requests.get)
+    post = staticmethod(requests.post)
+
+    def close(self):
+        pass
+
+def make_api(transport, standin):
+    config = MagicMock()
+    config.google_base_url = standin.url
+    config.verbose = False
+    config.throttling = 0
+    config.burst = 1
+    config.transfer_throttling = None
+    config.retry = 0
+    config.load_tokens.return_value = standin.tokens()
+    return GoogleApi(config, Resiliently(config), transport)
+
+def measure(transport, standin, calls):
+    api = make_api(transport, standin)
+    standin.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        list(api.list_albums())
+    elapsed = time.perf_counter() - start
+    api.close()
+    return elapsed, standin.connections
+
+def run(calls=DEFAULT_CALLS, handshake_ms=DEFAULT_HANDSHAKE_MS):
+    """Runs the benchmark.
+
+    Args:
+        calls: The number of listing calls to make with each transport.
+        handshake_ms: The simulated time to establish each new connection.
+
+    Returns:
+        A list of result dicts with the transport name, seconds taken and connections opened.
+    """
+    results = []
+    with GooglePhotosStandin(handshake_ms=handshake_ms) as standin:
+        for i in range(ALBUMS):
+            standin.add_album(f'Album {i}')
+        for name, transport in [('new connection', LegacyTransport()), ('pooled', HttpTransport())]:
+            elapsed, connections = measure(transport, standin, calls)
+            results.append({'transport': name, 'calls': calls, 'sec': elapsed, 'connections': connections})
+    return results
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CALLS
+    handshake_ms = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_HANDSHAKE_MS
+    print(f"{'transport':>16} {'calls':>8} {'connections':>12} {'time':>10} {'per call':>10}")
+    for result in run(calls, handshake_ms):
+        print("{transport:>16} {calls:>8} {connections:>12} {sec:>9.2f}s {per_call:>8.2f}ms".format(
+            per_call=result['sec'] / result['calls'] * 1000, **result))
+
+if __name__ == '__main__':
+    main()
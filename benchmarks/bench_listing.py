@@ -0,0 +1,82 @@
+"""
+Benchmark for listing local files and rendering listings.
+
+Measures LocalStorage.list_files over a generated tree without checksums, with checksums and
+with a warm checksum cache, then renders listings of a synthetic fake library with the tree and
+csv walkers.
+
+Usage:
+$ python -m benchmarks.bench_listing
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import tempfile
+from unittest.mock import MagicMock
+from album_rsync.local_storage import LocalStorage
+from benchmarks.common import measure, generate_tree, run_cli
+
+# (folders, files per folder)
+LOCAL_SCALES = [(10, 100), (50, 200)]
+FAKE_SCALES = [(10, 100), (100, 100), (100, 1000)]
+FILE_SIZE = 16 * 1024
+
+def list_local(path, checksum=False, cache_path=None):
+    config = MagicMock()
+    config.checksum = checksum
+    config.no_checksum_cache = not cache_path
+    config.checksum_cache = cache_path
+    config.checksum_cache_size = 1000000
+    config.checksum_workers = 0
+    config.include = ''
+    config.exclude = ''
+    config.include_dir = ''
+    config.exclude_dir = ''
+    storage = LocalStorage(config, path)
+    try:
+        return sum(1 for folder in storage.list_folders() for _ in storage.list_files(folder))
+    finally:
+        storage.close()
+
+def run(local_scales=None, fake_scales=None):
+    """Runs the benchmark.
+
+    Args:
+        local_scales: A list of (folders, files per folder) trees to list from the local file system.
+        fake_scales: A list of (folders, files per folder) fake libraries to render.
+
+    Returns:
+        A list of result dicts with the case, number of files, seconds taken and files per second.
+    """
+    results = []
+    for folders, files in local_scales or LOCAL_SCALES:
+        with tempfile.TemporaryDirectory() as path:
+            count = generate_tree(os.path.join(path, 'tree'), folders, files, FILE_SIZE)
+            tree = os.path.join(path, 'tree')
+            cache_path = os.path.join(path, 'checksums')
+            # Warm the page cache and the checksum cache
+            list_local(tree, checksum=True, cache_path=cache_path)
+            cases = [
+                ('local', lambda: list_local(tree)),
+                ('local checksum', lambda: list_local(tree, checksum=True)),
+                ('local checksum cached', lambda: list_local(tree, checksum=True, cache_path=cache_path))
+            ]
+            for case, func in cases:
+                results.append(_result(case, count, measure(func)))
+    for folders, files in fake_scales or FAKE_SCALES:
+        spec = f'fake:folders={folders},files={files}'
+        for list_format in ['tree', 'csv']:
+            sec = run_cli(spec, '--list-only', f'--list-format={list_format}')
+            results.append(_result(f'{list_format} walker', folders * files, sec))
+    return results
+
+def _result(case, files, sec):
+    return {'case': case, 'files': files, 'sec': sec, 'files_per_sec': files / sec}
+
+def main():
+    print(f"{'case':<22} {'files':>8} {'time':>9} {'files/s':>10}")
+    for result in run():
+        print("{case:<22} {files:>8} {sec:>8.3f}s {files_per_sec:>10.0f}".format(**result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for end to end sync throughput.
+
+Syncs a synthetic fake library to a fake destination holding half the files, which measures
+the engine without any I/O, and a generated local tree to an empty local folder.
+
+Usage:
+$ python -m benchmarks.bench_sync
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import tempfile
+from benchmarks.common import generate_tree, run_cli
+
+# (folders, files per folder)
+FAKE_SCALES = [(10, 100), (100, 100), (100, 1000)]
+LOCAL_SCALES = [(10, 100), (50, 100)]
+FILE_SIZE = 64 * 1024
+
+def run(fake_scales=None, local_scales=None):
+    """Runs the benchmark.
+
+    Args:
+        fake_scales: A list of (folders, files per folder) fake libraries to sync.
+        local_scales: A list of (folders, files per folder) local trees to sync.
+
+    Returns:
+        A list of result dicts with the case, number of source files, seconds taken and files
+        per second.
+    """
+    results = []
+    for folders, files in fake_scales or FAKE_SCALES:
+        sec = run_cli(f'fake:folders={folders},files={files}',
+                      f'fake:folders={folders},files={files},present=0.5')
+        results.append(_result('fake to fake', folders * files, sec))
+    for folders, files in local_scales or LOCAL_SCALES:
+        with tempfile.TemporaryDirectory() as path:
+            src = os.path.join(path, 'src')
+            dest = os.path.join(path, 'dest')
+            count = generate_tree(src, folders, files, FILE_SIZE)
+            os.makedirs(dest)
+            sec = run_cli(src, dest)
+            results.append(_result('local to local', count, sec))
+    return results
+
+def _result(case, files, sec):
+    return {'case': case, 'files': files, 'sec': sec, 'files_per_sec': files / sec}
+
+def main():
+    print(f"{'case':<16} {'files':>8} {'time':>9} {'files/s':>10}")
+    for result in run():
+        print("{case:<16} {files:>8} {sec:>8.3f}s {files_per_sec:>10.0f}".format(**result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark comparing the generator walkers with the RxPY walkers they replaced.
+
+Renders tree and csv listings of a synthetic fake library with each walker engine, alongside
+the time to only list the library, and measures how long importing rx adds to startup. Then
+renders a library where each folder takes a while to list, prefetching the next folders, and
+sorts a large folder in memory and through temporary files, measuring the peak memory used.
+
+Usage:
+$ python -m benchmarks.bench_walker
+"""
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import subprocess
+import tracemalloc
+from unittest.mock import MagicMock, patch
+from album_rsync.fake_storage import FakeStorage, FakeSpec
+from album_rsync.tree_walker import TreeWalker
+from album_rsync.csv_walker import CsvWalker
+from benchmarks.common import measure
+
+# (folders, files per folder)
+SCALES = [(100, 100), (1000, 1000)]
+PREFETCH_SPEC = 'fake:folders=100,files=100,list_ms=20'
+PREFETCH_DEPTHS = [0, 4, 16]
+SORT_SPEC = 'fake:folders=1,files=200000'
+SORT_BUFFERS = [0, 10000]
+
+def make_config(prefetch=0, sort_buffer=None):
+    config = MagicMock()
+    config.root_files = False
+    config.list_folders = False
+    config.list_sort = sort_buffer is not None
+    config.list_sort_buffer = sort_buffer or 0
+    config.prefetch = prefetch
+    return config
+
+def list_only(storage):
+    for folder in storage.list_folders():
+        for _ in storage.list_files(folder):
+            pass
+
+def walk(walker_class, storage, prefetch=0, sort_buffer=None):
+    config = make_config(prefetch, sort_buffer)
+    with open(os.devnull, 'w') as devnull, patch('sys.stdout', devnull), \
+            patch('album_rsync.tree_walker.logger'), patch('album_rsync.csv_walker.logger'):
+        walker_class(config, storage).walk()
+
+def import_sec(module):
+    """Returns the seconds a fresh interpreter takes to import module, less its own startup."""
+    def run(code):
+        return measure(subprocess.run, [sys.executable, '-c', code], check=True)
+    baseline = min(run('pass') for _ in range(3))
+    return max(0, min(run(f'import {module}') for _ in range(3)) - baseline)
+
+def peak_mb(func, *args, **kwargs):
+    """Returns the seconds taken to call func and the peak memory it allocated in MB."""
+    tracemalloc.start()
+    try:
+        sec = measure(func, *args, **kwargs)
+        return sec, tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+def run(scales=None, prefetch_spec=PREFETCH_SPEC, sort_spec=SORT_SPEC, sort_buffers=None):
+    """Runs the benchmark.
+
+    Args:
+        scales: A list of (folders, files per folder) fake libraries to render.
+        prefetch_spec: The fake library to render with each prefetch depth.
+        sort_spec: The fake library to render sorted with each sort buffer size.
+        sort_buffers: A list of sort buffer sizes, 0 to sort in memory.
+
+    Returns:
+        A list of result dicts with the case, number of files, seconds taken, files per second
+        and, for the sorted cases, the peak memory allocated in MB.
+    """
+    walkers = [('generator', 'tree', TreeWalker), ('generator', 'csv', CsvWalker)]
+    try:
+        from album_rsync.rx_tree_walker import RxTreeWalker  #pylint: disable=import-outside-toplevel
+        from album_rsync.rx_csv_walker import RxCsvWalker    #pylint: disable=import-outside-toplevel
+        walkers += [('rx', 'tree', RxTreeWalker), ('rx', 'csv', RxCsvWalker)]
+    except ImportError:
+        print("rx isn't installed, skipping the rx walkers", file=sys.stderr)
+
+    results = []
+    for folders, files in scales or SCALES:
+        spec = FakeSpec.parse(f'fake:folders={folders},files={files}')
+        count = folders * files
+        results.append(_result('list only', count, measure(list_only, FakeStorage(make_config(), 0, spec))))
+        for engine, list_format, walker_class in walkers:
+            sec = measure(walk, walker_class, FakeStorage(make_config(), 0, spec))
+            results.append(_result(f'{engine} {list_format}', count, sec))
+    if len(walkers) > 2:
+        results.append(_result('import rx', 0, import_sec('rx')))
+
+    spec = FakeSpec.parse(prefetch_spec)
+    for depth in PREFETCH_DEPTHS:
+        sec = measure(walk, TreeWalker, FakeStorage(make_config(), 0, spec), prefetch=depth)
+        results.append(_result(f'prefetch {depth}', spec.folders * spec.files, sec))
+
+    spec = FakeSpec.parse(sort_spec)
+    for buffer_size in sort_buffers or SORT_BUFFERS:
+        sec, peak = peak_mb(walk, CsvWalker, FakeStorage(make_config(), 0, spec), sort_buffer=buffer_size)
+        results.append(_result(f'sort buffer {buffer_size}', spec.folders * spec.files, sec, peak))
+    return results
+
+def _result(case, files, sec, peak=0):
+    return {'case': case, 'files': files, 'sec': sec, 'files_per_sec': files / sec if files and sec else 0,
+            'peak_mb': peak}
+
+def main():
+    print(f"{'case':<18} {'files':>8} {'time':>9} {'files/s':>10} {'peak':>9}")
+    for result in run():
+        print("{case:<18} {files:>8} {sec:>8.3f}s {files_per_sec:>10.0f} {peak_mb:>7.1f}MB".format(**result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmarks."""
+import os
+import sys
+import time
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+def measure(func, *args, **kwargs):
+    """Returns the seconds taken to call func."""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def generate_tree(path, folders, files_per_folder, size_bytes):
+    """Writes a tree of files with random contents.
+
+    Returns:
+        The total number of files written.
+    """
+    block = os.urandom(size_bytes)
+    for i in range(folders):
+        folder = os.path.join(path, f'folder {i:04}')
+        os.makedirs(folder, exist_ok=True)
+        for j in range(files_per_folder):
+            with open(os.path.join(folder, f'IMG_{j:06}.jpg'), 'wb') as f:
+                f.write(block)
+    return folders * files_per_folder
+
+def run_cli(*args):
+    """Runs album-rsync with the given arguments, discarding its output.
+
+    Returns:
+        The seconds taken.
+    """
+    from album_rsync.__main__ import main     #pylint: disable=import-outside-toplevel
+    package_logger = logging.getLogger('album_rsync')
+    handlers = list(package_logger.handlers)
+    try:
+        with patch.object(sys, 'argv', ['album-rsync', *args]), \
+                patch('sys.stdout', new_callable=StringIO), \
+                patch('sys.stderr', new_callable=StringIO):
+            return measure(main)
+    finally:
+        # Each run configures logging again, don't let the handlers pile up
+        package_logger.handlers = handlers
@@ -39,10 +39,11 @@ setup(
     license='MIT',
     keywords=['flickr', 'sync', 'rsync', 'photo', 'media', 'google', 'photos'],
     install_requires=[
-        'flickr_api',
-        'rx~=1.6',
-        'backoff'
+        'flickr_api'
     ],
+    extras_require={
+        'rx': ['rx~=1.6']
+    },
     dependency_links=[
         'git+git://github.com/alexis-mignon/python-flickr-api@65effbe#egg=flickr_api'
     ],
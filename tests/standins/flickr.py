@@ -0,0 +1,456 @@
+"""
+A local stand-in for Flickr, for testing and benchmarking FlickrStorage offline.
+
+Implements the REST methods FlickrStorage calls through flickr_api (logging in, listing
+photosets and photos, creating photosets, adding and deleting photos), the upload endpoint and
+original size downloads, with Flickr's paging and JSON responses. Point FlickrStorage at it with
+the `flickr_base_url` config. API keys and OAuth signatures aren't checked, only that a key and
+the stand-in's access token are sent.
+
+Run it as a module to serve it for album-rsync itself, with BASE_URL in the [Flickr] section of
+the config file set to the url it prints:
+$ python -m tests.standins.flickr --port 8081 --latency-ms 100
+
+Example:
+    with FlickrStandin(page_size=100, rate_limit=10) as standin:
+        photo_id = standin.add_photo('IMG_0001', b'...', tags='checksum:md5=abc')
+        standin.add_photoset('Holiday', [photo_id])
+        config.flickr_base_url = standin.url
+        config.load_tokens.return_value = standin.tokens()
+"""
+import re
+import json
+import math
+import time
+import shlex
+import argparse
+import urllib.parse
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from .server import Standin
+
+VIDEO_FORMATS = ('mov', 'mp4', 'avi', 'mpg', 'wmv', '3gp', 'm2ts', 'ogv')
+# The most items Flickr returns in a page
+MAX_PAGE_SIZE = 500
+
+class FlickrError(Exception):
+    """A Flickr API error, returned to the client as a failed response."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class FlickrStandin(Standin):
+    """Flickr's REST and upload endpoints served over HTTP on localhost.
+
+    Args:
+        latency_ms: The delay in milliseconds before responding to each request.
+        handshake_ms: The delay in milliseconds before serving each new connection, to simulate
+            the TCP and TLS handshakes with the real service.
+        page_size: The most photosets or photos returned in each page, whatever the client asks for.
+        quota_every: Respond to every Nth API call with 429 Too Many Requests, 0 for never.
+        retry_after: The Retry-After seconds sent with quota_every errors, None to leave it out.
+        rate_limit: The number of API calls allowed in each rate_window_sec, further calls get
+            429 Too Many Requests until the window ends, 0 for no limit.
+        rate_window_sec: The length of each rate limit window.
+    """
+
+    def __init__(self, latency_ms=0, handshake_ms=0, page_size=MAX_PAGE_SIZE, quota_every=0, retry_after=None,
+                 rate_limit=0, rate_window_sec=1.0):
+        super().__init__(latency_ms, handshake_ms)
+        self.page_size = page_size
+        self.quota_every = quota_every
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.rate_window_sec = rate_window_sec
+        self.user_id = '12345678@N00'
+        self.username = 'standin'
+        self.access_token_key = 'standin-token'
+        self.access_token_secret = 'standin-secret'
+        self.photosets = []
+        self.photos = {}
+        self.methods = Counter()
+        self._api_calls = 0
+        self._window_start = time.monotonic()
+        self._window_calls = 0
+        self._next_id = 1000
+
+    def tokens(self):
+        """Returns the tokens a client starts with, in the format Config.load_tokens returns."""
+        return {'access_token_key': self.access_token_key, 'access_token_secret': self.access_token_secret}
+
+    def add_photo(self, title, content=b'', tags='', originalformat='jpg', photoset_id=None):
+        """Adds a photo, or a video given a video originalformat, returning its id.
+
+        Args:
+            title: The photo title.
+            content: The bytes of the original.
+            tags: Space separated tags, as uploaded.
+            originalformat: The original file extension.
+            photoset_id: The id of a photoset to add the photo to.
+        """
+        with self._lock:
+            photo = self._add_photo(title, content, tags, originalformat)
+            if photoset_id:
+                self._photoset(photoset_id)['photos'].append(photo['id'])
+            return photo['id']
+
+    def add_photoset(self, title, photo_ids):
+        """Adds a photoset, returning its id. Like Flickr, a photoset must have a photo."""
+        with self._lock:
+            return self._add_photoset(title, photo_ids)['id']
+
+    def photoset_titles(self):
+        with self._lock:
+            return [s['title'] for s in self.photosets]
+
+    def handle(self, method, path, query, headers, body):
+        if path == '/services/rest/':
+            return self._handle_rest(headers, {**query, **_parse_form(headers, body)})
+        if method == 'POST' and path == '/services/upload/':
+            return self._handle_upload(headers, body)
+        download = re.match(r'^/static/(\d+)_(\w+)_o\.\w+$', path)
+        if method == 'GET' and download:
+            return self._download(download.group(1), download.group(2))
+        return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+
+    def _handle_rest(self, headers, args):
+        name = args.get('method', '')
+        with self._lock:
+            self.methods[name] += 1
+        limited = self._limit()
+        if limited:
+            return limited
+        methods = {
+            'flickr.test.login': self._test_login,
+            'flickr.photosets.getList': self._photosets_get_list,
+            'flickr.photosets.getInfo': self._photosets_get_info,
+            'flickr.photosets.getPhotos': self._photosets_get_photos,
+            'flickr.photosets.create': self._photosets_create,
+            'flickr.photosets.addPhoto': self._photosets_add_photo,
+            'flickr.photosets.delete': self._photosets_delete,
+            'flickr.photos.getNotInSet': self._photos_get_not_in_set,
+            'flickr.photos.getInfo': self._photos_get_info,
+            'flickr.photos.getSizes': self._photos_get_sizes,
+            'flickr.photos.delete': self._photos_delete
+        }
+        try:
+            self._authorize(headers, args)
+            if name not in methods:
+                raise FlickrError(112, f'Method "{name}" not found')
+            with self._lock:
+                result = methods[name](args)
+        except FlickrError as err:
+            return _json_response({'stat': 'fail', 'code': err.code, 'message': err.message})
+        return _json_response({**result, 'stat': 'ok'})
+
+    def _handle_upload(self, headers, body):
+        limited = self._limit()
+        if limited:
+            return limited
+        fields, files = _parse_multipart(headers, body)
+        try:
+            self._authorize(headers, fields)
+            if 'photo' not in files:
+                raise FlickrError(2, 'No photo specified')
+            file_name, content = files['photo']
+            base_name, extension = file_name.rsplit('.', 1) if '.' in file_name else (file_name, 'jpg')
+            with self._lock:
+                photo = self._add_photo(fields.get('title') or base_name, content, fields.get('tags', ''),
+                                        extension.lower())
+                for visibility in ['is_public', 'is_friend', 'is_family']:
+                    photo[visibility.replace('_', '')] = int(fields.get(visibility) or 0)
+        except FlickrError as err:
+            return _xml_response(f'<err code="{err.code}" msg="{err.message}" />', 'fail')
+        return _xml_response(f'<photoid>{photo["id"]}</photoid>')
+
+    def _download(self, photo_id, secret):
+        with self._lock:
+            photo = self.photos.get(photo_id)
+        if not photo or photo['originalsecret'] != secret:
+            return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+        content_type = 'video/mp4' if photo['media'] == 'video' else 'image/jpeg'
+        return 200, {'Content-Type': content_type}, photo['content']
+
+    def _limit(self):
+        """Returns a 429 response if the call is over the quota or rate limit, otherwise None."""
+        retry_after = None
+        with self._lock:
+            self._api_calls += 1
+            if self.quota_every and self._api_calls % self.quota_every == 0:
+                retry_after = self.retry_after if self.retry_after is not None else ''
+            elif self.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= self.rate_window_sec:
+                    self._window_start = now
+                    self._window_calls = 0
+                self._window_calls += 1
+                if self._window_calls > self.rate_limit:
+                    retry_after = math.ceil(self._window_start + self.rate_window_sec - now)
+        if retry_after is None:
+            return None
+        headers = {'Content-Type': 'text/plain'}
+        if retry_after != '':
+            headers['Retry-After'] = str(retry_after)
+        return 429, headers, b'Too Many Requests'
+
+    def _authorize(self, headers, args):
+        if not (args.get('api_key') or args.get('oauth_consumer_key')
+                or 'oauth_consumer_key' in (headers.get('Authorization') or '')):
+            raise FlickrError(100, 'Invalid API Key (Key not found)')
+        token = args.get('oauth_token')
+        if not token:
+            match = re.search(r'oauth_token="([^"]+)"', headers.get('Authorization') or '')
+            token = urllib.parse.unquote(match.group(1)) if match else None
+        if token != self.access_token_key:
+            raise FlickrError(98, 'Invalid auth token')
+
+    # REST methods, each returns the response data
+
+    def _test_login(self, _):
+        return {'user': {'id': self.user_id, 'username': {'_content': self.username}}}
+
+    def _photosets_get_list(self, args):
+        photosets, info = self._page(self.photosets, args)
+        return {'photosets': {**info, 'photoset': [self._photoset_summary(s) for s in photosets]}}
+
+    def _photosets_get_info(self, args):
+        photoset = self._photoset(args.get('photoset_id'))
+        return {'photoset': {**self._photoset_summary(photoset), 'owner': self.user_id, 'username': self.username}}
+
+    def _photosets_get_photos(self, args):
+        photoset = self._photoset(args.get('photoset_id'))
+        photos, info = self._page([self.photos[i] for i in photoset['photos']], args)
+        extras = _extras(args)
+        return {'photoset': {
+            'id': photoset['id'],
+            'primary': photoset['primary'],
+            'owner': self.user_id,
+            'ownername': self.username,
+            'title': photoset['title'],
+            'photo': [self._photo_summary(p, extras, isprimary=p['id'] == photoset['primary']) for p in photos],
+            **info,
+            'per_page': info['perpage']
+        }}
+
+    def _photosets_create(self, args):
+        if not args.get('title'):
+            raise FlickrError(1, 'No title specified')
+        photoset = self._add_photoset(args['title'], [args.get('primary_photo_id')])
+        return {'photoset': {'id': photoset['id'], 'url': f'{self.url}/photos/{self.user_id}/sets/{photoset["id"]}/'}}
+
+    def _photosets_add_photo(self, args):
+        photoset = self._photoset(args.get('photoset_id'))
+        photo_id = self._photo(args.get('photo_id'), code=2)['id']
+        if photo_id in photoset['photos']:
+            raise FlickrError(3, 'Photo already in set')
+        photoset['photos'].append(photo_id)
+        return {}
+
+    def _photosets_delete(self, args):
+        self.photosets.remove(self._photoset(args.get('photoset_id')))
+        return {}
+
+    def _photos_get_not_in_set(self, args):
+        in_set = {i for s in self.photosets for i in s['photos']}
+        page_size = int(args.get('per_page') or 100)
+        photos, info = self._page([p for p in self.photos.values() if p['id'] not in in_set],
+                                  {**args, 'per_page': page_size})
+        extras = _extras(args)
+        return {'photos': {**info, 'photo': [self._photo_summary(p, extras, owner=True) for p in photos]}}
+
+    def _photos_get_info(self, args):
+        photo = self._photo(args.get('photo_id'))
+        return {'photo': {
+            'id': photo['id'],
+            'secret': photo['secret'],
+            'server': '65535',
+            'farm': 66,
+            'originalsecret': photo['originalsecret'],
+            'originalformat': photo['originalformat'],
+            'media': photo['media'],
+            'owner': {'nsid': self.user_id, 'username': self.username},
+            'title': {'_content': photo['title']},
+            'description': {'_content': ''},
+            'visibility': {'ispublic': photo['ispublic'], 'isfriend': photo['isfriend'], 'isfamily': photo['isfamily']},
+            'dates': {'posted': str(photo['posted']), 'taken': '', 'lastupdate': str(photo['posted'])},
+            'usage': {'candownload': 1, 'canblog': 0, 'canprint': 0, 'canshare': 1},
+            'publiceditability': {'cancomment': 1, 'canaddmeta': 0},
+            'notes': {'note': []},
+            'tags': {'tag': [
+                {'id': f'{photo["id"]}-{i}', 'author': self.user_id, 'raw': raw, '_content': tag}
+                for i, (raw, tag) in enumerate(zip(photo['raw_tags'], photo['tags']))
+            ]}
+        }}
+
+    def _photos_get_sizes(self, args):
+        photo = self._photo(args.get('photo_id'))
+        source = f'{self.url}/static/{photo["id"]}_{photo["originalsecret"]}_o.{photo["originalformat"]}'
+        page = f'{self.url}/photos/{self.user_id}/{photo["id"]}/sizes/o/'
+        sizes = [{'label': 'Original', 'width': 4000, 'height': 3000, 'source': source, 'url': page, 'media': 'photo'}]
+        if photo['media'] == 'video':
+            sizes.append({'label': 'Video Original', 'width': 1920, 'height': 1080, 'source': source, 'url': page,
+                          'media': 'video'})
+        return {'sizes': {'canblog': 0, 'canprint': 0, 'candownload': 1, 'size': sizes}}
+
+    def _photos_delete(self, args):
+        photo = self._photo(args.get('photo_id'))
+        del self.photos[photo['id']]
+        for photoset in list(self.photosets):
+            if photo['id'] in photoset['photos']:
+                photoset['photos'].remove(photo['id'])
+                # Flickr deletes a photoset once its last photo is removed
+                if not photoset['photos']:
+                    self.photosets.remove(photoset)
+                elif photoset['primary'] == photo['id']:
+                    photoset['primary'] = photoset['photos'][0]
+        return {}
+
+    def _add_photo(self, title, content, tags, originalformat):
+        photo_id = self._new_id()
+        raw_tags = shlex.split(tags) if tags else []
+        photo = {
+            'id': photo_id,
+            'title': title,
+            'content': content,
+            'raw_tags': raw_tags,
+            'tags': [_normalise_tag(t) for t in raw_tags],
+            'originalformat': originalformat,
+            'media': 'video' if originalformat in VIDEO_FORMATS else 'photo',
+            'secret': f'{int(photo_id) * 7919 % 0xffffffffff:010x}',
+            'originalsecret': f'{int(photo_id) * 104729 % 0xffffffffff:010x}',
+            'ispublic': 0,
+            'isfriend': 0,
+            'isfamily': 0,
+            'posted': int(time.time())
+        }
+        self.photos[photo_id] = photo
+        return photo
+
+    def _add_photoset(self, title, photo_ids):
+        if not photo_ids or any(i not in self.photos for i in photo_ids):
+            raise FlickrError(2, 'Invalid primary photo id')
+        photoset = {'id': f'7215{self._new_id()}', 'title': title, 'primary': photo_ids[0], 'photos': list(photo_ids)}
+        self.photosets.append(photoset)
+        return photoset
+
+    def _photoset(self, photoset_id):
+        photoset = next((s for s in self.photosets if s['id'] == photoset_id), None)
+        if not photoset:
+            raise FlickrError(1, f'Photoset "{photoset_id}" not found')
+        return photoset
+
+    def _photo(self, photo_id, code=1):
+        if photo_id not in self.photos:
+            raise FlickrError(code, 'Photo not found')
+        return self.photos[photo_id]
+
+    def _photoset_summary(self, photoset):
+        primary = self.photos.get(photoset['primary'], {})
+        photos = [self.photos[i] for i in photoset['photos']]
+        return {
+            'id': photoset['id'],
+            'primary': photoset['primary'],
+            'secret': primary.get('secret'),
+            'server': '65535',
+            'farm': 66,
+            'photos': sum(1 for p in photos if p['media'] == 'photo'),
+            'videos': sum(1 for p in photos if p['media'] == 'video'),
+            'title': {'_content': photoset['title']},
+            'description': {'_content': ''}
+        }
+
+    def _photo_summary(self, photo, extras, owner=False, isprimary=None):
+        summary = {
+            'id': photo['id'],
+            'secret': photo['secret'],
+            'server': '65535',
+            'farm': 66,
+            'title': photo['title'],
+            'ispublic': photo['ispublic'],
+            'isfriend': photo['isfriend'],
+            'isfamily': photo['isfamily']
+        }
+        if owner:
+            summary['owner'] = self.user_id
+        if isprimary is not None:
+            summary['isprimary'] = '1' if isprimary else '0'
+        if 'original_format' in extras:
+            summary['originalsecret'] = photo['originalsecret']
+            summary['originalformat'] = photo['originalformat']
+        if 'tags' in extras:
+            summary['tags'] = ' '.join(photo['tags'])
+        if 'date_upload' in extras:
+            summary['dateupload'] = str(photo['posted'])
+        if 'media' in extras:
+            summary['media'] = photo['media']
+            summary['media_status'] = 'ready'
+        return summary
+
+    def _page(self, items, args):
+        per_page = min(int(args.get('per_page') or MAX_PAGE_SIZE), MAX_PAGE_SIZE, self.page_size)
+        page = max(1, int(args.get('page') or 1))
+        pages = max(1, math.ceil(len(items) / per_page))
+        start = (page - 1) * per_page
+        return items[start:start + per_page], {'page': page, 'pages': pages, 'perpage': per_page, 'total': len(items)}
+
+    def _new_id(self):
+        self._next_id += 1
+        return str(self._next_id)
+
+def _normalise_tag(raw):
+    """Returns the tag Flickr lists for a raw tag.
+
+    Machine tags (namespace:predicate=value) are kept but lower cased, other tags are lower cased
+    and stripped of anything but letters and numbers.
+    """
+    if re.match(r'^[a-zA-Z_]\w*:[a-zA-Z_]\w*=', raw):
+        return raw.lower()
+    return re.sub(r'[^a-z0-9]', '', raw.lower())
+
+def _extras(args):
+    return {e.strip() for e in (args.get('extras') or '').split(',')}
+
+def _parse_form(headers, body):
+    if not body or 'application/x-www-form-urlencoded' not in (headers.get('Content-Type') or ''):
+        return {}
+    return {k: v[-1] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+
+def _parse_multipart(headers, body):
+    """Returns a dict of the form fields and a dict of file field names to (file name, content)."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + (headers.get('Content-Type') or '').encode() + b'\r\n\r\n' + body)
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if part.get_filename() is not None:
+            files[name] = (part.get_filename(), part.get_payload(decode=True))
+        else:
+            fields[name] = part.get_payload(decode=True).decode()
+    return fields, files
+
+def _json_response(data):
+    # Flickr reports errors in the body of a 200 response
+    return 200, {'Content-Type': 'application/json'}, json.dumps(data).encode()
+
+def _xml_response(content, stat='ok'):
+    body = f'<?xml version="1.0" encoding="utf-8" ?>\n<rsp stat="{stat}">\n{content}\n</rsp>\n'
+    return 200, {'Content-Type': 'text/xml'}, body.encode()
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m tests.standins.flickr', description='Serves a stand-in for Flickr.')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--handshake-ms', type=float, default=0)
+    parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    parser.add_argument('--rate-window-sec', type=float, default=1.0)
+    args = parser.parse_args()
+    standin = FlickrStandin(args.latency_ms, args.handshake_ms, args.page_size, rate_limit=args.rate_limit,
+                            rate_window_sec=args.rate_window_sec)
+    standin.serve_forever(args.port, 'Flickr')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+A local stand-in for the Google Photos Library API, for testing and benchmarking GoogleApi offline.
+
+Implements the endpoints GoogleApi calls: listing and creating albums, searching media items,
+resumable uploads, batch creating media items, downloading media (`baseUrl=d`) and refreshing
+OAuth tokens. Point GoogleApi at it with the `google_base_url` config.
+
+Run it as a module to serve it for album-rsync itself, with BASE_URL in the [Google] section of
+the config file set to the url it prints:
+$ python -m tests.standins.google_photos --port 8080 --latency-ms 50
+
+Example:
+    with GooglePhotosStandin(page_size=10, token_uses=100) as standin:
+        album_id = standin.add_album('Holiday')
+        standin.add_media_item(album_id, 'IMG_0001.jpg', b'...')
+        config.google_base_url = standin.url
+        config.load_tokens.return_value = standin.tokens()
+"""
+import re
+import json
+import time
+import argparse
+import uuid
+import urllib.parse
+from .server import Standin
+
+MAX_BATCH_SIZE = 50
+
+class GooglePhotosStandin(Standin):
+    """A Google Photos Library API served over HTTP on localhost.
+
+    Args:
+        latency_ms: The delay in milliseconds before responding to each request.
+        handshake_ms: The delay in milliseconds before serving each new connection, to simulate
+            the TCP and TLS handshakes with the real service.
+        page_size: The maximum number of albums or media items in each page, the real service
+            returns up to 50 albums and 100 media items.
+        granularity: The chunk granularity in bytes for resumable uploads.
+        quota_every: Respond to every Nth API call with 429 Resource Exhausted, 0 for never.
+        retry_after: The Retry-After seconds sent with quota errors, None to leave it out.
+        token_uses: The number of API calls an access token is valid for before the server
+            responds 401 Unauthorized, 0 for unlimited.
+        truncate_downloads: Drop the connection after sending this many bytes of each download,
+            None to send downloads in full.
+    """
+
+    def __init__(self, latency_ms=0, handshake_ms=0, page_size=50, granularity=256 * 1024, quota_every=0,
+                 retry_after=None, token_uses=0, truncate_downloads=None):
+        super().__init__(latency_ms, handshake_ms)
+        self.page_size = page_size
+        self.granularity = granularity
+        self.quota_every = quota_every
+        self.retry_after = retry_after
+        self.token_uses = token_uses
+        self.truncate_downloads = truncate_downloads
+        self.albums = []
+        self.media_items = {}
+        self.content = {}
+        self.refreshes = 0
+        self.refresh_token = 'refresh-token'
+        self._access_tokens = {}
+        self._uploads = {}
+        self._upload_tokens = {}
+        self._api_calls = 0
+        self._next_id = 0
+        self.access_token = self._issue_access_token()
+
+    def tokens(self):
+        """Returns the tokens a client starts with, in the format Config.load_tokens returns."""
+        return {'access_token': self.access_token, 'refresh_token': self.refresh_token}
+
+    def add_album(self, title):
+        """Adds an album, returning its id."""
+        with self._lock:
+            return self._add_album(title)['id']
+
+    def add_media_item(self, album_id, file_name, content=b''):
+        """Adds a media item to an album, returning its id."""
+        with self._lock:
+            return self._add_media_item(album_id, file_name, content)['id']
+
+    def _add_album(self, title):
+        album = {'id': self._new_id('album'), 'title': title}
+        self.albums.append(album)
+        self.media_items[album['id']] = []
+        return album
+
+    def _add_media_item(self, album_id, file_name, content):
+        item_id = self._new_id('item')
+        item = {'id': item_id, 'filename': file_name, 'mimeType': 'image/jpeg',
+                'mediaMetadata': {'creationTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}}
+        self.media_items.setdefault(album_id, []).append(item)
+        self.content[item_id] = content
+        return item
+
+    def _with_base_url(self, item):
+        return {**item, 'baseUrl': f'{self.url}/media/{item["id"]}'}
+
+    def _new_id(self, prefix):
+        self._next_id += 1
+        return f'{prefix}-{self._next_id}'
+
+    def _issue_access_token(self):
+        token = uuid.uuid4().hex
+        self._access_tokens[token] = self.token_uses
+        return token
+
+    def _authorize(self, header):
+        """Returns whether the Authorization header holds a valid access token, using it once."""
+        token = (header or '').replace('Bearer ', '', 1)
+        with self._lock:
+            if token not in self._access_tokens:
+                return False
+            if self.token_uses:
+                if not self._access_tokens[token]:
+                    return False
+                self._access_tokens[token] -= 1
+            return True
+
+    def _over_quota(self):
+        with self._lock:
+            self._api_calls += 1
+            return bool(self.quota_every) and self._api_calls % self.quota_every == 0
+
+    def _page(self, items, page_size, page_token):
+        start = int(page_token or 0)
+        end = start + min(int(page_size or self.page_size), self.page_size)
+        return items[start:end], str(end) if end < len(items) else None
+
+    def handle(self, method, path, query, headers, body):
+        media = re.match(r'^/media/([^/=]+)=d$', path)
+        if method == 'POST' and path == '/oauth2/v4/token':
+            return self.refresh(body)
+        if method == 'GET' and media:
+            return self.download(media.group(1))
+        if not self._authorize(headers.get('Authorization')):
+            return _error(401, 'UNAUTHENTICATED', 'Request had invalid authentication credentials')
+        if self._over_quota():
+            status, error_headers, error_body = _error(429, 'RESOURCE_EXHAUSTED', 'Quota exceeded')
+            if self.retry_after is not None:
+                error_headers['Retry-After'] = str(self.retry_after)
+            return status, error_headers, error_body
+
+        routes = {
+            ('GET', '/v1/albums'): lambda: self.list_albums(query, body),
+            ('POST', '/v1/albums'): lambda: self.create_album(query, body),
+            ('POST', '/v1/mediaItems:search'): lambda: self.search_media_items(query, body),
+            ('POST', '/v1/mediaItems:batchCreate'): lambda: self.batch_create(query, body),
+            ('POST', '/v1/uploads'): lambda: self.start_upload(headers, body)
+        }
+        if (method, path) in routes:
+            return routes[(method, path)]()
+        upload = re.match(r'^/v1/uploads/([^/]+)$', path)
+        if method == 'POST' and upload:
+            return self.continue_upload(upload.group(1), headers, body)
+        return _error(404, 'NOT_FOUND', f'{method} {path} not found')
+
+    # Endpoints, each returns a tuple of status, headers and body
+
+    def list_albums(self, query, _):
+        with self._lock:
+            albums, next_page = self._page(list(self.albums), query.get('pageSize'), query.get('pageToken'))
+        return _json_response({'albums': albums, 'nextPageToken': next_page})
+
+    def create_album(self, _, body):
+        with self._lock:
+            album = self._add_album(json.loads(body)['album']['title'])
+        return _json_response(album)
+
+    def search_media_items(self, _, body):
+        data = json.loads(body)
+        with self._lock:
+            if data.get('albumId') not in self.media_items:
+                return _error(400, 'INVALID_ARGUMENT', 'Invalid album id')
+            items, next_page = self._page(list(self.media_items[data['albumId']]), data.get('pageSize'),
+                                          data.get('pageToken'))
+        return _json_response({'mediaItems': [self._with_base_url(item) for item in items], 'nextPageToken': next_page})
+
+    def batch_create(self, _, body):
+        data = json.loads(body)
+        new_items = data.get('newMediaItems', [])
+        if len(new_items) > MAX_BATCH_SIZE:
+            return _error(400, 'INVALID_ARGUMENT', f'Request must have no more than {MAX_BATCH_SIZE} items')
+        results = []
+        with self._lock:
+            for new_item in new_items:
+                upload_token = new_item['simpleMediaItem']['uploadToken']
+                content = self._upload_tokens.pop(upload_token, None)
+                if content is None:
+                    results.append({'uploadToken': upload_token, 'status': {'code': 3, 'message': 'Invalid upload token'}})
+                    continue
+                item = self._add_media_item(data.get('albumId'), new_item['simpleMediaItem']['fileName'], content)
+                results.append({'uploadToken': upload_token, 'status': {'message': 'Success'},
+                                'mediaItem': self._with_base_url(item)})
+        return _json_response({'newMediaItemResults': results})
+
+    def start_upload(self, headers, _):
+        if headers.get('X-Goog-Upload-Command') != 'start':
+            return _error(400, 'INVALID_ARGUMENT', 'Expected an upload start command')
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[session_id] = {'received': b'', 'final': False}
+        return 200, {
+            'X-Goog-Upload-Status': 'active',
+            'X-Goog-Upload-URL': f'{self.url}/v1/uploads/{session_id}',
+            'X-Goog-Upload-Chunk-Granularity': str(self.granularity)
+        }, b''
+
+    def continue_upload(self, session_id, headers, body):
+        commands = [c.strip() for c in headers.get('X-Goog-Upload-Command', '').split(',')]
+        with self._lock:
+            session = self._uploads.get(session_id)
+            if not session:
+                return _error(404, 'NOT_FOUND', 'Unknown upload session')
+            if 'query' in commands:
+                return 200, {
+                    'X-Goog-Upload-Status': 'final' if session['final'] else 'active',
+                    'X-Goog-Upload-Size-Received': str(len(session['received']))
+                }, b''
+            if session['final']:
+                return _error(400, 'FAILED_PRECONDITION', 'Upload already finalized')
+            if int(headers.get('X-Goog-Upload-Offset', -1)) != len(session['received']):
+                return _error(400, 'INVALID_ARGUMENT', 'Invalid upload offset')
+            if 'finalize' not in commands and len(body) % self.granularity:
+                return _error(400, 'INVALID_ARGUMENT', 'Chunk size is not a multiple of the granularity')
+            session['received'] += body
+            if 'finalize' not in commands:
+                return 200, {'X-Goog-Upload-Status': 'active'}, b''
+            session['final'] = True
+            upload_token = uuid.uuid4().hex
+            self._upload_tokens[upload_token] = session['received']
+        return 200, {'X-Goog-Upload-Status': 'final'}, upload_token.encode()
+
+    def download(self, item_id):
+        with self._lock:
+            content = self.content.get(item_id)
+        if content is None:
+            return _error(404, 'NOT_FOUND', 'Unknown media item')
+        if self.truncate_downloads is not None:
+            return 200, {'Content-Type': 'image/jpeg', 'Content-Length': str(len(content))}, \
+                content[:self.truncate_downloads]
+        return 200, {'Content-Type': 'image/jpeg'}, content
+
+    def refresh(self, body):
+        form = urllib.parse.parse_qs(body.decode())
+        # Accept any refresh token, so a client with real tokens saved can use the stand-in
+        if form.get('grant_type') != ['refresh_token'] or not form.get('refresh_token'):
+            return _json_response({'error': 'invalid_grant'}, 400)
+        with self._lock:
+            self.refreshes += 1
+            self.access_token = self._issue_access_token()
+            token = self.access_token
+        return _json_response({'access_token': token, 'expires_in': 3600, 'token_type': 'Bearer'})
+
+def _json_response(data, status=200):
+    # Like the real service, leave out empty lists and missing page tokens
+    data = {k: v for k, v in data.items() if v not in (None, [])}
+    return status, {'Content-Type': 'application/json'}, json.dumps(data).encode()
+
+def _error(status, code, message):
+    return _json_response({'error': {'code': status, 'message': message, 'status': code}}, status)
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m tests.standins.google_photos',
+                                     description='Serves a stand-in for the Google Photos Library API.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--handshake-ms', type=float, default=0)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--quota-every', type=int, default=0)
+    parser.add_argument('--retry-after', type=int)
+    parser.add_argument('--token-uses', type=int, default=0)
+    args = parser.parse_args()
+    standin = GooglePhotosStandin(args.latency_ms, args.handshake_ms, args.page_size, quota_every=args.quota_every,
+                                  retry_after=args.retry_after, token_uses=args.token_uses)
+    standin.serve_forever(args.port, 'the Google Photos Library API')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""The HTTP server shared by the stand-ins for remote services."""
+import time
+import socket
+import threading
+import urllib.parse
+from collections import Counter
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+class Standin:
+    """A remote service emulated by a HTTP server on localhost.
+
+    Subclasses implement handle to respond to requests, guarding their state with _lock as
+    requests are served in parallel.
+
+    Args:
+        latency_ms: The delay in milliseconds before responding to each request.
+        handshake_ms: The delay in milliseconds before serving each new connection, to simulate
+            the TCP and TLS handshakes with the real service.
+    """
+
+    def __init__(self, latency_ms=0, handshake_ms=0):
+        self.latency_ms = latency_ms
+        self.handshake_ms = handshake_ms
+        self.calls = Counter()
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self, port=0):
+        class Handler(_Handler):
+            standin = self
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, method, path, query, headers, body):
+        """Responds to a request.
+
+        Args:
+            method: The HTTP method, e.g. GET.
+            path: The url path.
+            query: A dict of the query string parameters.
+            headers: The request headers.
+            body: The request body in bytes.
+
+        Returns:
+            A tuple of the status code, a dict of response headers and the body in bytes.
+        """
+        raise NotImplementedError()
+
+    def serve_forever(self, port, description):
+        """Serves until interrupted, for running a stand-in from the command line."""
+        self.start(port)
+        print(f"serving {description} on {self.url}, press Ctrl+C to stop", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            self.stop()
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    standin = None
+
+    def setup(self):
+        super().setup()
+        # Otherwise the body waits on the delayed ACK of the headers when connections are reused
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.standin._lock:    #pylint: disable=protected-access
+            self.standin.connections += 1
+        time.sleep(self.standin.handshake_ms / 1000)
+
+    def do_GET(self):   #pylint: disable=invalid-name
+        self._handle('GET')
+
+    def do_POST(self):  #pylint: disable=invalid-name
+        self._handle('POST')
+
+    def log_message(self, format, *args):   #pylint: disable=redefined-builtin
+        pass
+
+    def _handle(self, method):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        url = urllib.parse.urlsplit(self.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        with self.standin._lock:     #pylint: disable=protected-access
+            self.standin.calls[f'{method} {url.path}'] += 1
+        time.sleep(self.standin.latency_ms / 1000)
+        status, headers, body = self.standin.handle(method, url.path, query, self.headers, body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        # A stand-in can declare a longer body than it sends, to simulate a dropped connection
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        elif int(headers['Content-Length']) > len(body):
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,99 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from unittest.mock import MagicMock, patch
+from album_rsync.checksum_cache import ChecksumCache, LAST_USED_RESOLUTION_SEC
+from album_rsync.local_storage import LocalStorage
+
+class TestChecksumCache:
+
+    def setup_method(self):
+        self.logger_patch = patch('album_rsync.checksum_cache.logger', create=True)
+        self.logger_patch.start()
+
+    def teardown_method(self):
+        self.logger_patch.stop()
+
+    def create_file(self, tmp_path, name, content=b'content'):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return str(path)
+
+    def test_should_return_stored_checksum_given_file_unchanged(self, tmp_path):
+        path = self.create_file(tmp_path, 'a.jpg')
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        cache.put(path, os.stat(path), 'abc123')
+        cache.close()
+
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+
+        assert cache.get(os.stat(path)) == 'abc123'
+
+    def test_should_miss_given_file_modified(self, tmp_path):
+        path = self.create_file(tmp_path, 'a.jpg')
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        cache.put(path, os.stat(path), 'abc123')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert cache.get(os.stat(path)) is None
+
+    @patch('album_rsync.checksum_cache.COMMIT_EVERY', 1)
+    def test_should_remove_least_recently_used_given_cache_full(self, tmp_path):
+        paths = [self.create_file(tmp_path, f'{i}.jpg') for i in range(3)]
+        cache = ChecksumCache(str(tmp_path / 'cache'), max_entries=2)
+        for i, path in enumerate(paths):
+            cache.put(path, os.stat(path), str(i))
+
+        assert cache.get(os.stat(paths[0])) is None
+        assert cache.get(os.stat(paths[2])) == '2'
+
+    @patch('album_rsync.checksum_cache.time.time')
+    def test_should_not_write_given_hit_used_recently(self, mock_time, tmp_path):
+        mock_time.return_value = 1000
+        path = self.create_file(tmp_path, 'a.jpg')
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        cache.put(path, os.stat(path), 'abc123')
+        cache.close()
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        mock_time.return_value = 1000 + LAST_USED_RESOLUTION_SEC - 1
+
+        assert cache.get(os.stat(path)) == 'abc123'
+        assert not cache._db.in_transaction     #pylint: disable=protected-access
+
+    @patch('album_rsync.checksum_cache.time.time')
+    def test_should_update_last_used_given_hit_not_used_recently(self, mock_time, tmp_path):
+        mock_time.return_value = 1000
+        path = self.create_file(tmp_path, 'a.jpg')
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        cache.put(path, os.stat(path), 'abc123')
+        mock_time.return_value = 1000 + LAST_USED_RESOLUTION_SEC
+
+        assert cache.get(os.stat(path)) == 'abc123'
+        assert cache._db.execute("SELECT last_used FROM checksums").fetchone()[0] == mock_time.return_value  #pylint: disable=protected-access
+
+    def test_prune_should_remove_entries_for_missing_files(self, tmp_path):
+        kept = self.create_file(tmp_path, 'a.jpg')
+        removed = self.create_file(tmp_path, 'b.jpg')
+        cache = ChecksumCache(str(tmp_path / 'cache'))
+        cache.put(kept, os.stat(kept), 'abc123')
+        cache.put(removed, os.stat(removed), 'def456')
+        os.remove(removed)
+
+        assert cache.prune() == 1
+        assert cache.get(os.stat(kept)) == 'abc123'
+
+    def test_local_storage_should_not_read_cached_files(self, tmp_path):
+        path = self.create_file(tmp_path, 'a.jpg')
+        config = MagicMock()
+        config.checksum = True
+        config.no_checksum_cache = False
+        config.checksum_cache = str(tmp_path / 'cache')
+        config.checksum_cache_size = 10
+        storage = LocalStorage(config, str(tmp_path))
+        checksum = storage.md5_checksum(path)
+
+        with patch('album_rsync.local_storage.open', create=True) as mock_open:
+            assert storage.md5_checksum(path) == checksum
+            mock_open.assert_not_called()
+        storage.close()
@@ -0,0 +1,120 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import threading
+from album_rsync.concurrency import ConcurrencyController, SUCCESS, CONGESTED, FAILED, WINDOW
+
+class TestConcurrencyController:
+
+    def call(self, controller, outcome=SUCCESS, latency=0.1, kind='call'):
+        controller.acquire()
+        controller.release(kind, outcome, latency)
+
+    def test_should_increase_limit_additively_given_calls_succeed(self):
+        controller = ConcurrencyController(max_limit=4)
+
+        self.call(controller)
+        assert controller.limit == 2
+        self.call(controller)
+        assert controller.limit == 2
+        self.call(controller)
+        assert controller.limit == 3
+
+    def test_should_not_exceed_max_limit(self):
+        controller = ConcurrencyController(max_limit=2)
+        for _ in range(10):
+            self.call(controller)
+
+        assert controller.limit == 2
+
+    def test_should_halve_limit_given_call_congested(self):
+        controller = ConcurrencyController(max_limit=16, initial_limit=8)
+
+        self.call(controller, CONGESTED)
+
+        assert controller.limit == 4
+
+    def test_should_not_change_limit_given_call_failed(self):
+        controller = ConcurrencyController(max_limit=16, initial_limit=8)
+
+        self.call(controller, FAILED)
+
+        assert controller.limit == 8
+
+    def test_should_only_cut_once_for_calls_already_in_flight(self):
+        controller = ConcurrencyController(max_limit=16, initial_limit=8)
+        threads = [threading.Thread(target=controller.acquire) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        controller.acquire()
+
+        controller.release('call', CONGESTED)
+        self.call(controller, CONGESTED)
+
+        assert controller.limit == 4
+
+    def test_should_halve_limit_given_p95_latency_rises(self):
+        controller = ConcurrencyController(max_limit=100, initial_limit=50)
+        for _ in range(WINDOW):
+            self.call(controller, latency=0.1)
+        limit = controller.limit
+
+        for _ in range(WINDOW):
+            self.call(controller, latency=1)
+
+        assert controller.limit == limit // 2
+
+    def test_should_compare_latency_within_kind_of_call(self):
+        controller = ConcurrencyController(max_limit=100, initial_limit=50)
+        for _ in range(WINDOW):
+            self.call(controller, latency=0.1, kind='call')
+        limit = controller.limit
+
+        for _ in range(WINDOW):
+            self.call(controller, latency=10, kind='transfer')
+
+        assert controller.limit >= limit
+
+    def test_should_not_cut_limit_given_large_transfers_follow_small_ones(self):
+        controller = ConcurrencyController(max_limit=100, initial_limit=50)
+        for _ in range(WINDOW):
+            self.call(controller, latency=0.5, kind='transfer')
+        limit = controller.limit
+
+        # e.g. videos after photos, each takes far longer without the provider being overloaded
+        for _ in range(WINDOW):
+            self.call(controller, latency=60, kind='transfer')
+
+        assert controller.limit >= limit
+
+    def test_should_halve_limit_given_transfer_congested(self):
+        controller = ConcurrencyController(max_limit=16, initial_limit=8)
+
+        self.call(controller, CONGESTED, kind='transfer')
+
+        assert controller.limit == 4
+
+    def test_should_not_wait_on_nested_call(self):
+        controller = ConcurrencyController(max_limit=1)
+        controller.acquire()
+        controller.acquire()
+        controller.release('call', SUCCESS, 0.1)
+        controller.release('call', SUCCESS, 0.1)
+
+        assert controller._in_flight == 0   #pylint: disable=protected-access
+
+    def test_should_block_calls_beyond_limit(self):
+        controller = ConcurrencyController(max_limit=1)
+        controller.acquire()
+        acquired = threading.Event()
+        def acquire():
+            controller.acquire()
+            acquired.set()
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        assert not acquired.wait(0.1)
+        controller.release('call', SUCCESS, 0.1)
+        assert acquired.wait(1)
+        thread.join()
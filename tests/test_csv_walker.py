@@ -2,25 +2,35 @@
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
 from unittest.mock import MagicMock, patch, call
+import pytest
 import tests.helpers
 from album_rsync.csv_walker import CsvWalker
+try:
+    from album_rsync.rx_csv_walker import RxCsvWalker
+except ImportError:
+    RxCsvWalker = None
 from album_rsync.file import File
 from album_rsync.folder import Folder, RootFolder
 
 class TestCsvWalker:
 
+    walker_class = CsvWalker
+    module = 'album_rsync.csv_walker'
+
     def setup_method(self):
-        self.print_patch = patch('album_rsync.csv_walker.sys.stdout.write', create=True)
+        self.print_patch = patch(f'{self.module}.sys.stdout.write', create=True)
         self.mock_print = self.print_patch.start()
-        self.logger_patch = patch('album_rsync.csv_walker.logger', create=True)
+        self.logger_patch = patch(f'{self.module}.logger', create=True)
         self.mock_logger = self.logger_patch.start()
-        self.time_patch = patch('album_rsync.csv_walker.time.time', create=True)
+        self.time_patch = patch(f'{self.module}.time.time', create=True)
         self.time_patch.start().return_value = 0
 
         self.config = MagicMock()
         self.config.root_files = False
         self.config.list_folders = False
         self.config.list_sort = False
+        self.config.list_sort_buffer = 0
+        self.config.prefetch = 0
         self.storage = MagicMock()
         self.folder_one = Folder(id=1, name='A Folder')
         self.folder_two = Folder(id=2, name='B Folder')
@@ -38,7 +48,7 @@ class TestCsvWalker:
         self.time_patch.stop()
 
     def test_should_print_header_only_given_no_folders(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         walker.walk()
 
         self.mock_print.assert_has_calls_exactly([
@@ -47,7 +57,7 @@ class TestCsvWalker:
         self.mock_logger.info.assert_called_once_with("\ndone in 0 sec")
 
     def test_should_print_header_only_given_empty_folders(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': []},
             {'folder': self.folder_one, 'files': []}
@@ -60,7 +70,7 @@ class TestCsvWalker:
 
     def test_should_print_root_files_given_root_files_enabled(self):
         self.config.root_files = True
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_one, self.file_two]}
         ])
@@ -74,7 +84,7 @@ class TestCsvWalker:
 
     def test_should_not_print_root_files_given_root_files_disabled(self):
         self.config.root_files = False
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_one, self.file_two]}
         ])
@@ -85,7 +95,7 @@ class TestCsvWalker:
         ])
 
     def test_should_print_folder_files(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
         ])
@@ -98,7 +108,7 @@ class TestCsvWalker:
         ])
 
     def test_should_print_all_folders(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_one]},
             {'folder': self.folder_two, 'files': [self.file_two]}
@@ -112,7 +122,7 @@ class TestCsvWalker:
         ])
 
     def test_should_print_checksum_given_file_has_checksum(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_three]}
         ])
@@ -125,7 +135,7 @@ class TestCsvWalker:
 
     def test_should_sort_folders_and_files_given_sort_enabled(self):
         self.config.list_sort = True
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -139,9 +149,27 @@ class TestCsvWalker:
             call("B Folder,C File,abc123\n")
         ])
 
+    def test_should_sort_files_given_more_files_than_sort_buffer(self):
+        self.config.list_sort = True
+        self.config.list_sort_buffer = 1
+        walker = self.walker_class(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
+            {'folder': self.folder_one, 'files': [self.file_four, self.file_one]}
+        ])
+        walker.walk()
+
+        self.mock_print.assert_has_calls_exactly([
+            call("Folder,Filename,Checksum\n"),
+            call("A Folder,A File,\n"),
+            call("A Folder,\"D File, with comma\",\n"),
+            call("B Folder,B File,\n"),
+            call("B Folder,C File,abc123\n")
+        ])
+
     def test_should_not_sort_folders_and_files_given_sort_disabled(self):
         self.config.list_sort = False
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -157,7 +185,7 @@ class TestCsvWalker:
 
     def test_should_print_only_folders_given_list_folders_enabled(self):
         self.config.list_folders = True
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -173,7 +201,7 @@ class TestCsvWalker:
     def test_should_print_sorted_folders_given_list_folders_and_sort_enabled(self):
         self.config.list_sort = True
         self.config.list_folders = True
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -187,7 +215,7 @@ class TestCsvWalker:
         ])
 
     def test_should_escape_commas(self):
-        walker = CsvWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_one, self.file_four]}
         ])
@@ -198,3 +226,15 @@ class TestCsvWalker:
             call("A Folder,A File,\n"),
             call("A Folder,\"D File, with comma\",\n")
         ])
+
+class TestCsvWalkerPrefetch(TestCsvWalker):
+
+    def setup_method(self):
+        super().setup_method()
+        self.config.prefetch = 2
+
+@pytest.mark.skipif(RxCsvWalker is None, reason="RxPY isn't installed")
+class TestRxCsvWalker(TestCsvWalker):
+
+    walker_class = RxCsvWalker
+    module = 'album_rsync.rx_csv_walker'
@@ -0,0 +1,44 @@
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from album_rsync.diff import diff, normalise_name, Action, COPY, SKIP, DELETE
+from album_rsync.file import File
+
+class TestDiff:
+
+    def setup_method(self):
+        self.file_one = File(id=1, name='A.jpg')
+        self.file_two = File(id=2, name='B.jpg')
+        self.file_three = File(id=3, name='C.jpg')
+
+    def test_should_copy_files_missing_from_destination(self):
+        actions = list(diff([self.file_one, self.file_two], [self.file_two]))
+
+        assert actions == [Action(COPY, self.file_one), Action(SKIP, self.file_two)]
+
+    def test_should_match_file_names_case_insensitively(self):
+        actions = list(diff([self.file_one], [File(id=4, name='a.JPG')]))
+
+        assert actions == [Action(SKIP, self.file_one)]
+
+    def test_should_consider_jpeg_and_jpg_the_same(self):
+        src_file = File(id=4, name='D.jpeg')
+        dest_file = File(id=5, name='D.jpg')
+
+        actions = list(diff([src_file], [dest_file], delete=True))
+
+        assert actions == [Action(SKIP, src_file)]
+
+    def test_should_delete_extra_files_given_delete_enabled(self):
+        actions = list(diff([self.file_one], [self.file_one, self.file_two, self.file_three], delete=True))
+
+        assert actions == [Action(SKIP, self.file_one), Action(DELETE, self.file_two), Action(DELETE, self.file_three)]
+
+    def test_should_not_delete_extra_files_given_delete_disabled(self):
+        actions = list(diff([self.file_one], [self.file_one, self.file_two]))
+
+        assert actions == [Action(SKIP, self.file_one)]
+
+    def test_normalise_name_should_fold_case_and_jpeg_extension(self):
+        assert normalise_name('IMG_0001.JPEG') == 'img_0001.jpg'
+        assert normalise_name('Straße.png') == 'strasse.png'
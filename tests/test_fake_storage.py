@@ -0,0 +1,102 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from unittest.mock import MagicMock, patch
+from urllib.error import URLError
+import pytest
+from album_rsync.fake_storage import FakeStorage, FakeSpec
+from album_rsync.folder import RootFolder
+
+class TestFakeSpec:
+
+    def test_parse_should_return_none_given_no_options(self):
+        assert FakeSpec.parse('fake') is None
+
+    def test_parse_should_read_options(self):
+        spec = FakeSpec.parse('fake:folders=3,files=50,size=1.5M,copy_ms=200,errors=0.1')
+
+        assert spec.folders == 3
+        assert spec.files == 50
+        assert spec.size == int(1.5 * 1024 * 1024)
+        assert spec.copy_ms == 200
+        assert spec.errors == 0.1
+
+    def test_parse_should_raise_given_unrecognised_option(self):
+        with pytest.raises(ValueError):
+            FakeSpec.parse('fake:folder=3')
+
+    def test_parse_should_raise_given_invalid_value(self):
+        with pytest.raises(ValueError):
+            FakeSpec.parse('fake:size=big')
+
+class TestFakeStorage:
+
+    def setup_method(self):
+        self.config = MagicMock()
+        self.sleep_patch = patch('album_rsync.fake_storage.time.sleep')
+        self.mock_sleep = self.sleep_patch.start()
+
+    def teardown_method(self):
+        self.sleep_patch.stop()
+
+    def list_all(self, storage):
+        return {folder.name: list(storage.list_files(folder)) for folder in storage.list_folders()}
+
+    def test_should_generate_folders_and_files(self):
+        storage = FakeStorage(self.config, 0, FakeSpec(folders=3, files=4, root=2))
+
+        files = self.list_all(storage)
+
+        assert len(files) == 3
+        assert all(len(f) == 4 for f in files.values())
+        assert len(list(storage.list_files(RootFolder()))) == 2
+
+    def test_should_generate_same_files_given_same_seed(self):
+        def listing(seed):
+            storage = FakeStorage(self.config, 0, FakeSpec(folders=2, files=10, seed=seed))
+            return [(f.name, f.size) for files in self.list_all(storage).values() for f in files]
+
+        assert listing(1) == listing(1)
+        assert listing(1) != listing(2)
+
+    def test_should_include_fraction_of_files_given_present(self):
+        src = FakeStorage(self.config, 0, FakeSpec(folders=1, files=1000))
+        dest = FakeStorage(self.config, 1, FakeSpec(folders=1, files=1000, present=0.5))
+
+        src_names = {f.name for files in self.list_all(src).values() for f in files}
+        dest_names = {f.name for files in self.list_all(dest).values() for f in files}
+
+        assert dest_names < src_names
+        assert 400 < len(dest_names) < 600
+
+    def test_should_sleep_for_operation_latency(self):
+        storage = FakeStorage(self.config, 0, FakeSpec(folders=1, files=1, copy_ms=100, jitter=0.5))
+        file_ = next(iter(self.list_all(storage).values()))[0]
+
+        storage.copy_file(file_, 'Folder', None)
+
+        delay = self.mock_sleep.call_args[0][0]
+        assert 0.05 <= delay <= 0.15
+
+    def test_should_fail_fraction_of_copies_given_errors(self):
+        storage = FakeStorage(self.config, 0, FakeSpec(folders=1, files=1000, errors=0.1))
+        failures = 0
+        for file_ in next(iter(self.list_all(storage).values())):
+            try:
+                storage.copy_file(file_, 'Folder', None)
+            except URLError:
+                failures += 1
+
+        assert 50 < failures < 150
+
+    def test_should_not_list_deleted_files_and_folders(self):
+        storage = FakeStorage(self.config, 0, FakeSpec(folders=2, files=2))
+        folder = next(iter(storage.list_folders()))
+        files = list(storage.list_files(folder))
+
+        assert not storage.delete_folder(folder)
+        for file_ in files:
+            storage.delete_file(file_, folder.name)
+
+        assert storage.delete_folder(folder)
+        assert len(list(storage.list_folders())) == 1
@@ -1,11 +1,15 @@
 #pylint: disable=wrong-import-position, attribute-defined-outside-init
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import importlib
+from functools import partial
 from unittest.mock import MagicMock, patch
 import pytest
+import flickr_api
 from album_rsync.resiliently import Resiliently
 from album_rsync.flickr_storage import FlickrStorage
 from album_rsync.folder import RootFolder
+from tests.standins.flickr import FlickrStandin
 
 class TestFlickrStorage:
 
@@ -19,7 +23,10 @@ class TestFlickrStorage:
         self.config.include_dir = ''
         self.config.exclude_dir = ''
         self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
         self.config.retry = 0
+        self.config.flickr_base_url = ''
         self.user = MagicMock()
         self.flickr_api_patch = patch('album_rsync.flickr_storage.flickr_api', create=True)
         self.mock_flickr_api = self.flickr_api_patch.start()
@@ -140,3 +147,149 @@ class TestFlickrStorage:
         storage.upload('/', 'new', 'micky.jpg', None)
 
         self.mock_flickr_api.Photoset.create.assert_called_once()
+
+class TestFlickrStorageStandin:
+
+    def setup_method(self):
+        self.standin = FlickrStandin(page_size=2).start()
+        self.config = MagicMock()
+        self.config.include = ''
+        self.config.exclude = ''
+        self.config.include_dir = ''
+        self.config.exclude_dir = ''
+        self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
+        self.config.retry = 2
+        self.config.flickr_api_key = 'key'
+        self.config.flickr_api_secret = 'secret'
+        self.config.flickr_base_url = self.standin.url
+        self.config.flickr_tags = 'album-rsync'
+        self.config.flickr_is_public = 0
+        self.config.flickr_is_friend = 0
+        self.config.flickr_is_family = 1
+        self.config.load_tokens.return_value = self.standin.tokens()
+        self.sleep_patch = patch('album_rsync.resiliently.time.sleep')
+        self.sleep_patch.start()
+        self.storage = FlickrStorage(self.config, Resiliently(self.config))
+
+    def teardown_method(self):
+        self.storage.close()
+        self.sleep_patch.stop()
+        self.standin.stop()
+
+    def add_photoset(self, title, names):
+        photo_ids = [self.standin.add_photo(name, name.encode()) for name in names]
+        return self.standin.add_photoset(title, photo_ids)
+
+    def test_close_should_point_flickr_api_back_at_flickr(self):
+        self.storage.close()
+        self.storage = FlickrStorage(self.config, Resiliently(self.config))
+        redirected_call_api = flickr_api.method_call.call_api
+        self.storage.close()
+
+        assert isinstance(redirected_call_api, partial)
+        assert not isinstance(flickr_api.method_call.call_api, partial)
+        assert importlib.import_module('flickr_api.upload').UPLOAD_URL.startswith('https://api.flickr.com/')
+
+    def test_should_not_redirect_flickr_api_given_no_base_url(self):
+        self.storage.close()
+        call_api = flickr_api.method_call.call_api
+        self.config.flickr_base_url = ''
+
+        FlickrStorage(self.config, Resiliently(self.config))
+
+        assert flickr_api.method_call.call_api is call_api
+
+    def test_list_folders_should_walk_every_page(self):
+        for title in ['A', 'B', 'C']:
+            self.add_photoset(title, ['photo'])
+
+        folders = list(self.storage.list_folders())
+
+        assert [f.name for f in folders] == ['A', 'B', 'C']
+        assert self.standin.methods['flickr.photosets.getList'] == 2
+
+    def test_list_files_should_read_name_and_checksum_from_tags(self):
+        photo_id = self.standin.add_photo('image', tags='album-rsync "flickrrsync:extn=png" checksum:md5=ABC123')
+        self.standin.add_photoset('A', [photo_id])
+        folder = next(self.storage.list_folders())
+
+        files = list(self.storage.list_files(folder))
+
+        assert [(f.name, f.checksum) for f in files] == [('image.png', 'abc123')]
+
+    def test_list_files_should_read_upload_date_and_media_type_without_loading_photos(self):
+        photo_id = self.standin.add_photo('video', originalformat='mp4')
+        self.standin.photos[photo_id]['posted'] = 1492340400
+        self.standin.add_photoset('A', [photo_id])
+        folder = next(self.storage.list_folders())
+
+        files = list(self.storage.list_files(folder))
+
+        assert [(f.name, f.mtime, f.media_type) for f in files] == [('video.mp4', 1492340400, 'video/mp4')]
+        assert self.standin.methods['flickr.photos.getInfo'] == 0
+
+    def test_list_files_should_list_photos_not_in_a_photoset(self):
+        self.add_photoset('A', ['in set'])
+        for name in ['a', 'b', 'c']:
+            self.standin.add_photo(name)
+
+        files = list(self.storage.list_files(RootFolder()))
+
+        assert [f.name for f in files] == ['a.jpg', 'b.jpg', 'c.jpg']
+
+    def test_upload_should_create_photoset_then_add_photos(self, tmp_path):
+        for name in ['a.jpg', 'b.jpg']:
+            (tmp_path / name).write_bytes(name.encode())
+            self.storage.upload(str(tmp_path / name), 'New', name, 'abc')
+
+        photosets = self.standin.photosets
+        assert [s['title'] for s in photosets] == ['New']
+        photos = [self.standin.photos[i] for i in photosets[0]['photos']]
+        assert [(p['title'], p['content']) for p in photos] == [('a', b'a.jpg'), ('b', b'b.jpg')]
+        assert 'checksum:md5=abc' in photos[0]['tags']
+
+    def test_download_should_save_original(self, tmp_path):
+        self.add_photoset('A', ['image'])
+        folder = next(self.storage.list_folders())
+        file_ = next(self.storage.list_files(folder))
+
+        self.storage.download(file_, str(tmp_path / 'A' / file_.name))
+
+        assert (tmp_path / 'A' / 'image.jpg').read_bytes() == b'image'
+
+    def test_download_stream_should_read_original(self):
+        self.add_photoset('A', ['image'])
+        folder = next(self.storage.list_folders())
+        file_ = next(self.storage.list_files(folder))
+
+        assert b''.join(self.storage.download_stream(file_)) == b'image'
+
+    def test_delete_file_should_remove_photo(self):
+        self.add_photoset('A', ['a', 'b'])
+        folder = next(self.storage.list_folders())
+        file_ = next(self.storage.list_files(folder))
+
+        self.storage.delete_file(file_, folder.name)
+
+        assert [p['title'] for p in self.standin.photos.values()] == ['b']
+
+    def test_delete_folder_should_succeed_given_flickr_deleted_it_with_its_last_photo(self):
+        self.add_photoset('A', ['a'])
+        folder = next(self.storage.list_folders())
+        self.storage.delete_file(next(self.storage.list_files(folder)), folder.name)
+
+        assert self.storage.delete_folder(folder)
+        assert not self.standin.photosets
+
+    def test_should_retry_given_rate_limited(self):
+        self.standin.quota_every = 2
+        self.standin.retry_after = 0
+        for title in ['A', 'B', 'C']:
+            self.add_photoset(title, ['photo'])
+
+        folders = list(self.storage.list_folders())
+
+        assert len(folders) == 3
+        assert self.standin.methods['flickr.photosets.getList'] > 2
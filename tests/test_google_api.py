@@ -0,0 +1,307 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import io
+from unittest.mock import MagicMock, patch
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from album_rsync.google_api import GoogleApi, UploadSession, MediaItemError
+from album_rsync.resiliently import Resiliently
+from album_rsync.stream import StreamBuffer, StreamError
+from tests.standins.google_photos import GooglePhotosStandin
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, headers=None, text=''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+class RetryOnce:
+    """Retries a failed call once, like Resiliently."""
+
+    def call(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception:   #pylint: disable=broad-except
+            return func(*args, **kwargs)
+
+    transfer = call
+
+class FakeUploadServer:
+    """Records the chunks received by the uploads endpoint."""
+
+    def __init__(self, granularity=4):
+        self.granularity = granularity
+        self.received = b''
+        self.commands = []
+        self.fail_next_upload = False
+
+    def post(self, url, data=None, headers=None):
+        command = headers['X-Goog-Upload-Command']
+        self.commands.append(command)
+        if command == 'start':
+            return FakeResponse(headers={
+                'X-Goog-Upload-URL': 'https://upload/session',
+                'X-Goog-Upload-Chunk-Granularity': str(self.granularity)
+            })
+        if command == 'query':
+            return FakeResponse(headers={
+                'X-Goog-Upload-Status': 'active',
+                'X-Goog-Upload-Size-Received': str(len(self.received))
+            })
+        assert int(headers['X-Goog-Upload-Offset']) == len(self.received)
+        if self.fail_next_upload:
+            self.fail_next_upload = False
+            # The server received part of the chunk before the connection dropped
+            self.received += data[:len(data) // 2]
+            raise RequestsConnectionError()
+        self.received += data
+        return FakeResponse(text='token' if 'finalize' in command else '')
+
+class TestGoogleApiUpload:
+
+    def setup_method(self):
+        self.config = MagicMock()
+        self.config.google_base_url = ''
+        self.server = FakeUploadServer()
+        self.transport = MagicMock()
+        self.transport.post.side_effect = self.server.post
+        self.chunk_patch = patch('album_rsync.google_api.UPLOAD_CHUNK_SIZE', 10)
+        self.chunk_patch.start()
+        self.api = GoogleApi(self.config, RetryOnce(), self.transport)
+        self.api._authenticate = MagicMock()    #pylint: disable=protected-access
+        self.api._access_token = 'token'        #pylint: disable=protected-access
+
+    def teardown_method(self):
+        self.chunk_patch.stop()
+
+    def upload(self, data, size=None):
+        session = UploadSession(io.BytesIO(data), 'photo.jpg', size)
+        return self.api._resilient_upload('https://upload', session)   #pylint: disable=protected-access
+
+    def test_upload_should_send_file_in_chunks_of_granularity(self):
+        token = self.upload(b'0123456789abcdefghij', size=20)
+
+        assert token == 'token'
+        assert self.server.received == b'0123456789abcdefghij'
+        # 10 bytes is rounded down to a multiple of the 4 byte granularity
+        assert self.server.commands == ['start', 'upload', 'upload', 'upload, finalize']
+
+    def test_upload_should_finalize_short_read_given_size_is_unknown(self):
+        token = self.upload(b'0123456789')
+
+        assert token == 'token'
+        assert self.server.received == b'0123456789'
+        assert self.server.commands[-1] == 'upload, finalize'
+
+    def test_upload_should_resume_from_received_offset_given_chunk_fails(self):
+        self.server.fail_next_upload = True
+
+        token = self.upload(b'0123456789', size=10)
+
+        assert token == 'token'
+        assert self.server.received == b'0123456789'
+        assert self.server.commands[:3] == ['start', 'upload', 'query']
+
+    def test_upload_should_resume_stream_within_current_chunk(self):
+        self.server.fail_next_upload = True
+        stream = MagicMock()
+        stream.read.side_effect = [b'01234567', b'89']
+        stream.seekable.return_value = False
+        session = UploadSession(stream, 'photo.jpg')
+
+        token = self.api._resilient_upload('https://upload', session)  #pylint: disable=protected-access
+
+        assert token == 'token'
+        assert self.server.received == b'0123456789'
+
+class TestUploadSession:
+
+    def test_resume_should_raise_given_stream_is_missing_earlier_data(self):
+        stream = MagicMock()
+        stream.read.return_value = b'4567'
+        stream.seekable.return_value = False
+        session = UploadSession(stream, 'photo.jpg')
+        session.offset = 4
+        session.next_chunk()
+
+        with pytest.raises(ValueError):
+            session.resume(2)
+
+class TestGoogleApiBatch:
+
+    def setup_method(self):
+        self.config = MagicMock()
+        self.config.google_base_url = ''
+        self.api = GoogleApi(self.config, MagicMock())
+        self.api._resilient_upload = MagicMock()  #pylint: disable=protected-access
+        self.api._resilient_upload.side_effect = lambda url, session: 'token-' + session.file_name
+        self.api._resilient_post = MagicMock()    #pylint: disable=protected-access
+        self.api._resilient_post.side_effect = self.batch_create
+        self.open_patch = patch('album_rsync.google_api.open', create=True)
+        self.open_patch.start()
+        self.fstat_patch = patch('album_rsync.google_api.os.fstat')
+        self.fstat_patch.start()
+
+    def teardown_method(self):
+        self.open_patch.stop()
+        self.fstat_patch.stop()
+
+    @staticmethod
+    def batch_create(url, data):
+        return {'newMediaItemResults': [
+            {
+                'uploadToken': item['simpleMediaItem']['uploadToken'],
+                'status': {'message': 'Success'},
+                'mediaItem': {'id': item['simpleMediaItem']['fileName']}
+            } for item in data['newMediaItems']]}
+
+    def test_upload_should_buffer_media_item_until_flushed(self):
+        future = self.api.upload('a.jpg', 'a.jpg', 'album')
+
+        assert not future.done()
+        self.api._resilient_post.assert_not_called()    #pylint: disable=protected-access
+
+        self.api.flush('album')
+
+        assert future.result() == {'id': 'a.jpg'}
+
+    def test_upload_should_create_media_items_given_batch_is_full(self):
+        with patch('album_rsync.google_api.BATCH_SIZE', 2):
+            futures = [self.api.upload(name, name, 'album') for name in ['a.jpg', 'b.jpg', 'c.jpg']]
+
+        assert [f.done() for f in futures] == [True, True, False]
+        self.api._resilient_post.assert_called_once()   #pylint: disable=protected-access
+
+    def test_flush_all_should_batch_each_album_separately(self):
+        self.api.upload('a.jpg', 'a.jpg', 'album1')
+        self.api.upload('b.jpg', 'b.jpg', 'album2')
+        self.api.upload('c.jpg', 'c.jpg', 'album1')
+
+        self.api.flush_all()
+
+        albums = [c[1]['data']['albumId'] for c in self.api._resilient_post.call_args_list]   #pylint: disable=protected-access
+        assert sorted(albums) == ['album1', 'album2']
+
+    def test_flush_should_fail_item_given_its_status_is_an_error(self):
+        self.api._resilient_post.side_effect = lambda url, data: {'newMediaItemResults': [    #pylint: disable=protected-access
+            {'uploadToken': 'token-a.jpg', 'status': {'code': 3, 'message': 'Failed'}},
+            {'uploadToken': 'token-b.jpg', 'status': {'message': 'Success'}, 'mediaItem': {}}
+        ]}
+        failed = self.api.upload('a.jpg', 'a.jpg', 'album')
+        succeeded = self.api.upload('b.jpg', 'b.jpg', 'album')
+
+        self.api.flush('album')
+
+        assert isinstance(failed.exception(), MediaItemError)
+        assert succeeded.exception() is None
+
+    def test_flush_should_fail_every_item_given_request_fails(self):
+        self.api._resilient_post.side_effect = RequestsConnectionError()  #pylint: disable=protected-access
+        futures = [self.api.upload(name, name, 'album') for name in ['a.jpg', 'b.jpg']]
+
+        self.api.flush('album')
+
+        assert all(isinstance(f.exception(), RequestsConnectionError) for f in futures)
+
+class TestGoogleApiStandin:
+
+    def setup_method(self):
+        self.standin = GooglePhotosStandin(page_size=2, granularity=4).start()
+        self.config = MagicMock()
+        self.config.google_base_url = self.standin.url
+        self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
+        self.config.retry = 2
+        self.config.load_tokens.return_value = self.standin.tokens()
+        self.sleep_patch = patch('album_rsync.resiliently.time.sleep')
+        self.sleep_patch.start()
+        self.chunk_patch = patch('album_rsync.google_api.UPLOAD_CHUNK_SIZE', 10)
+        self.chunk_patch.start()
+        self.api = GoogleApi(self.config, Resiliently(self.config))
+
+    def teardown_method(self):
+        self.api.close()
+        self.standin.stop()
+        self.sleep_patch.stop()
+        self.chunk_patch.stop()
+
+    def test_list_albums_should_walk_every_page(self):
+        for title in ['A', 'B', 'C', 'D', 'E']:
+            self.standin.add_album(title)
+
+        albums = list(self.api.list_albums())
+
+        assert [a['title'] for a in albums] == ['A', 'B', 'C', 'D', 'E']
+        assert self.standin.calls['GET /v1/albums'] == 3
+
+    def test_get_media_in_folder_should_walk_every_page(self):
+        album_id = self.standin.add_album('A')
+        for name in ['a.jpg', 'b.jpg', 'c.jpg']:
+            self.standin.add_media_item(album_id, name)
+
+        items = list(self.api.get_media_in_folder(album_id))
+
+        assert [i['filename'] for i in items] == ['a.jpg', 'b.jpg', 'c.jpg']
+
+    def test_should_refresh_token_given_it_expires(self):
+        self.standin.token_uses = 2
+        self.standin.access_token = self.standin._issue_access_token()  #pylint: disable=protected-access
+        self.config.load_tokens.return_value = self.standin.tokens()
+        for title in ['A', 'B', 'C', 'D', 'E']:
+            self.standin.add_album(title)
+
+        albums = list(self.api.list_albums())
+
+        assert len(albums) == 5
+        assert self.standin.refreshes == 1
+        self.config.save_tokens.assert_called_once()
+
+    def test_should_retry_given_quota_exceeded(self):
+        self.standin.quota_every = 2
+        self.standin.retry_after = 0
+        for title in ['A', 'B', 'C']:
+            self.standin.add_album(title)
+
+        albums = list(self.api.list_albums())
+
+        assert len(albums) == 3
+        assert self.standin.calls['GET /v1/albums'] == 3
+
+    def test_upload_should_create_media_item_with_content(self):
+        album_id = self.standin.add_album('A')
+        content = b'0123456789abcdefghijklmnopqrstuvwxyz'
+
+        future = self.api.upload_stream(io.BytesIO(content), 'photo.jpg', album_id)
+        self.api.flush(album_id)
+
+        item = future.result()
+        assert item['filename'] == 'photo.jpg'
+        assert self.standin.content[item['id']] == content
+        assert b''.join(self.api.download_stream(item['baseUrl'] + '=d')) == content
+
+    def test_upload_stream_should_not_finalize_given_download_fails_partway(self):
+        album_id = self.standin.add_album('A')
+        item_id = self.standin.add_media_item(album_id, 'photo.jpg', b'0123456789abcdefghijklmnopqrstuvwxyz')
+        self.standin.truncate_downloads = 18
+
+        with StreamBuffer(self.api.download_stream(f'{self.standin.url}/media/{item_id}=d')) as stream:
+            with pytest.raises(StreamError):
+                self.api.upload_stream(stream, 'copy.jpg', album_id)
+        self.api.flush(album_id)
+
+        assert not self.standin._upload_tokens  #pylint: disable=protected-access
+        assert [item['filename'] for item in self.standin.media_items[album_id]] == ['photo.jpg']
+
+    def test_should_reuse_connections(self):
+        self.standin.add_album('A')
+
+        for _ in range(5):
+            list(self.api.list_albums())
+
+        assert self.standin.connections == 1
@@ -82,6 +82,28 @@ class TestGoogleStorage:
 
         assert len(files) == 2
 
+    def test_list_files_should_read_creation_time_and_media_type(self):
+        self.api.get_media_in_folder.return_value = [{
+            'id': '123',
+            'filename': 'image1.jpg',
+            'baseUrl': 'https://example.com',
+            'mimeType': 'image/jpeg',
+            'mediaMetadata': {'creationTime': '2017-04-16T11:00:00.123456789Z'}
+        }]
+        storage = GoogleStorage(self.config, self.api)
+
+        files = list(storage.list_files(Folder(id=123, name='test')))
+
+        assert (files[0].mtime, files[0].media_type) == (1492340400, 'image/jpeg')
+
+    def test_list_files_should_leave_out_missing_metadata(self, files_fixture):
+        self.api.get_media_in_folder.return_value = files_fixture
+        storage = GoogleStorage(self.config, self.api)
+
+        files = list(storage.list_files(Folder(id=123, name='test')))
+
+        assert (files[0].mtime, files[0].media_type) == (None, None)
+
     def test_list_files_should_raise_not_implemented_when_root_folder_is_passed(self):
         storage = GoogleStorage(self.config, self.api)
         folder = RootFolder()
@@ -0,0 +1,51 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import threading
+from unittest.mock import MagicMock, patch
+from album_rsync.http_transport import HttpTransport
+
+class TestHttpTransport:
+
+    def setup_method(self):
+        self.session_patch = patch('album_rsync.http_transport.requests.Session')
+        self.mock_session = self.session_patch.start()
+        self.mock_session.side_effect = lambda: MagicMock()
+
+    def teardown_method(self):
+        self.session_patch.stop()
+
+    def test_should_reuse_session_on_same_thread(self):
+        transport = HttpTransport()
+        transport.get('http://a')
+        transport.post('http://b', json={})
+
+        assert self.mock_session.call_count == 1
+
+    def test_should_use_a_session_per_thread_sharing_the_pool(self):
+        transport = HttpTransport()
+        transport.get('http://a')
+        thread = threading.Thread(target=transport.get, args=('http://a',))
+        thread.start()
+        thread.join()
+
+        sessions = transport._sessions     #pylint: disable=protected-access
+        assert len(sessions) == 2
+        adapters = {c[0][1] for s in sessions for c in s.mount.call_args_list}
+        assert len(adapters) == 1
+
+    def test_should_close_connection_given_keep_alive_disabled(self):
+        transport = HttpTransport(keep_alive=False)
+        transport.get('http://a', headers={'Authorization': 'token'})
+
+        session = transport._sessions[0]   #pylint: disable=protected-access
+        session.request.assert_called_once_with('GET', 'http://a', headers={'Authorization': 'token', 'Connection': 'close'})
+
+    def test_close_should_close_sessions(self):
+        transport = HttpTransport()
+        transport.get('http://a')
+        session = transport._sessions[0]   #pylint: disable=protected-access
+
+        transport.close()
+
+        session.close.assert_called_once()
@@ -0,0 +1,85 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from unittest.mock import patch
+from album_rsync.journal import Journal, COPY, DELETE
+from album_rsync.file import File
+
+class TestJournal:
+
+    def setup_method(self):
+        self.logger_patch = patch('album_rsync.journal.logger', create=True)
+        self.logger_patch.start()
+        self.file_one = File(id=1, name='A.jpg')
+        self.file_two = File(id=2, name='B.jpg')
+
+    def teardown_method(self):
+        self.logger_patch.stop()
+
+    def test_should_resume_completed_actions(self, tmp_path):
+        path = str(tmp_path / 'journal')
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+        journal.record(COPY, 'A Folder', self.file_one)
+        journal.record(DELETE, 'B Folder', self.file_two)
+        journal.record_folder('C Folder')
+        journal.close()
+
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+
+        assert journal.is_done(COPY, 'a folder', File(name='a.JPG'))
+        assert not journal.is_done(COPY, 'A Folder', self.file_two)
+        assert journal.is_done(DELETE, 'B Folder', self.file_two)
+        assert journal.is_folder_done('C Folder')
+        assert not journal.is_folder_done('A Folder')
+
+    def test_should_ignore_journal_for_a_different_sync(self, tmp_path):
+        path = str(tmp_path / 'journal')
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+        journal.record_folder('A Folder')
+        journal.close()
+
+        journal = Journal(path, 'src', 'other')
+        journal.open()
+
+        assert not journal.is_folder_done('A Folder')
+
+    def test_should_ignore_partially_written_records(self, tmp_path):
+        path = str(tmp_path / 'journal')
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+        journal.record_folder('A Folder')
+        journal.close()
+        with open(path, 'a') as f:
+            f.write('{"op": "fol')
+
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+
+        assert journal.is_folder_done('A Folder')
+
+    def test_should_compact_file_records_of_completed_folders(self, tmp_path):
+        path = str(tmp_path / 'journal')
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+        journal.record(COPY, 'A Folder', self.file_one)
+        journal.record(COPY, 'A Folder', self.file_two)
+        journal.record_folder('A Folder')
+        journal.record(COPY, 'B Folder', self.file_one)
+        journal.close()
+
+        Journal(path, 'src', 'dest').open()
+
+        with open(path) as f:
+            assert len(f.readlines()) == 3
+
+    def test_should_remove_journal_when_sync_completes(self, tmp_path):
+        path = str(tmp_path / 'journal')
+        journal = Journal(path, 'src', 'dest')
+        journal.open()
+        journal.record(COPY, 'A Folder', self.file_one)
+        journal.close(compact=True)
+
+        assert not os.path.exists(path)
@@ -0,0 +1,163 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import json
+from unittest.mock import MagicMock, patch
+import tests.helpers
+from album_rsync.jsonl_walker import JsonlWalker
+from album_rsync.file import File
+from album_rsync.folder import Folder, RootFolder
+
+class TestJsonlWalker:
+
+    def setup_method(self):
+        self.print_patch = patch('album_rsync.jsonl_walker.sys.stdout.write', create=True)
+        self.mock_print = self.print_patch.start()
+        self.logger_patch = patch('album_rsync.jsonl_walker.logger', create=True)
+        self.mock_logger = self.logger_patch.start()
+        self.time_patch = patch('album_rsync.jsonl_walker.time.time', create=True)
+        self.time_patch.start().return_value = 0
+
+        self.config = MagicMock()
+        self.config.root_files = False
+        self.config.list_folders = False
+        self.config.list_sort = False
+        self.config.list_sort_buffer = 0
+        self.config.prefetch = 0
+        self.storage = MagicMock()
+        self.folder_one = Folder(id=1, name='A Folder')
+        self.folder_two = Folder(id=2, name='B Folder')
+        self.root_folder = RootFolder()
+        self.file_one = File(id=1, name='A File.jpg')
+        self.file_two = File(id=2, name='B File.jpg')
+        self.file_three = File(id=3, name='C File.mp4', size=1024, mtime=1492340400, checksum='abc123',
+                               media_type='video/mp4')
+
+    def teardown_method(self):
+        self.print_patch.stop()
+        self.logger_patch.stop()
+        self.time_patch.stop()
+
+    def _records(self):
+        lines = [c.args[0] for c in self.mock_print.call_args_list]
+        assert all(line.endswith('\n') and line.count('\n') == 1 for line in lines)
+        return [json.loads(line) for line in lines]
+
+    def test_should_print_nothing_given_no_folders(self):
+        walker = JsonlWalker(self.config, self.storage)
+        walker.walk()
+
+        assert self._records() == []
+        self.mock_logger.info.assert_called_once_with("\ndone in 0 sec")
+
+    def test_should_print_nothing_given_empty_folders(self):
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.root_folder, 'files': []},
+            {'folder': self.folder_one, 'files': []}
+        ])
+        walker.walk()
+
+        assert self._records() == []
+
+    def test_should_print_a_record_per_file(self):
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]},
+            {'folder': self.folder_two, 'files': [self.file_three]}
+        ])
+        walker.walk()
+
+        assert self._records() == [
+            {'folder_id': 1, 'folder': 'A Folder', 'id': 1, 'name': 'A File.jpg'},
+            {'folder_id': 1, 'folder': 'A Folder', 'id': 2, 'name': 'B File.jpg'},
+            {'folder_id': 2, 'folder': 'B Folder', 'id': 3, 'name': 'C File.mp4', 'size': 1024, 'mtime': 1492340400,
+             'checksum': 'abc123', 'media_type': 'video/mp4'}
+        ]
+
+    def test_should_flush_after_each_record(self):
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
+        ])
+        flushed = []
+        with patch('album_rsync.jsonl_walker.sys.stdout.flush', create=True) as mock_flush:
+            mock_flush.side_effect = lambda: flushed.append(self.mock_print.call_count)
+            walker.walk()
+
+        assert flushed == [1, 2]
+
+    def test_should_print_root_files_given_root_files_enabled(self):
+        self.config.root_files = True
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.root_folder, 'files': [self.file_one]}
+        ])
+        walker.walk()
+
+        assert self._records() == [{'folder': '', 'id': 1, 'name': 'A File.jpg'}]
+
+    def test_should_not_print_root_files_given_root_files_disabled(self):
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.root_folder, 'files': [self.file_one]}
+        ])
+        walker.walk()
+
+        assert self._records() == []
+
+    def test_should_sort_folders_and_files_given_sort_enabled(self):
+        self.config.list_sort = True
+        self.config.list_sort_buffer = 1
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        walker.walk()
+
+        assert [(x['folder'], x['name']) for x in self._records()] == [
+            ('A Folder', 'A File.jpg'),
+            ('B Folder', 'B File.jpg'),
+            ('B Folder', 'C File.mp4')
+        ]
+
+    def test_should_print_files_in_folder_order_given_prefetch_enabled(self):
+        self.config.prefetch = 2
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        walker.walk()
+
+        assert [(x['folder'], x['name']) for x in self._records()] == [
+            ('B Folder', 'C File.mp4'),
+            ('B Folder', 'B File.jpg'),
+            ('A Folder', 'A File.jpg')
+        ]
+
+    def test_should_print_only_folders_given_list_folders_enabled(self):
+        self.config.list_folders = True
+        self.config.list_sort = True
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_two, 'files': [self.file_three]},
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        walker.walk()
+
+        assert self._records() == [
+            {'folder_id': 1, 'folder': 'A Folder'},
+            {'folder_id': 2, 'folder': 'B Folder'}
+        ]
+        self.storage.list_files.assert_not_called()
+
+    def test_should_escape_names(self):
+        walker = JsonlWalker(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': Folder(id=1, name='Folder "quoted"'), 'files': [File(id=1, name='Line\nbreak, café.jpg')]}
+        ])
+        walker.walk()
+
+        assert self._records() == [{'folder_id': 1, 'folder': 'Folder "quoted"', 'id': 1, 'name': 'Line\nbreak, café.jpg'}]
@@ -0,0 +1,69 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import hashlib
+from unittest.mock import MagicMock
+from album_rsync.local_storage import LocalStorage
+from album_rsync.folder import Folder
+
+class TestLocalStorage:
+
+    def setup_method(self):
+        self.config = MagicMock()
+        self.config.checksum = True
+        self.config.no_checksum_cache = True
+        self.config.checksum_workers = 4
+        self.config.include = ''
+        self.config.exclude = ''
+
+    def create_files(self, tmp_path, count):
+        folder = tmp_path / 'A Folder'
+        folder.mkdir()
+        for i in range(count):
+            (folder / f'{i}.jpg').write_bytes(str(i).encode() * (i + 1))
+
+    def test_list_files_should_return_checksums_in_listing_order(self, tmp_path):
+        self.create_files(tmp_path, 20)
+        storage = LocalStorage(self.config, str(tmp_path))
+
+        files = storage.list_files(Folder(name='A Folder'))
+        storage.close()
+
+        assert len(files) == 20
+        for file_ in files:
+            with open(file_.full_path, 'rb') as f:
+                data = f.read()
+            assert file_.checksum == hashlib.md5(data).hexdigest()
+            assert file_.size == len(data)
+
+    def test_list_files_should_return_same_checksums_given_single_worker(self, tmp_path):
+        self.create_files(tmp_path, 5)
+        storage = LocalStorage(self.config, str(tmp_path))
+        parallel = [f.checksum for f in storage.list_files(Folder(name='A Folder'))]
+        storage.close()
+        self.config.checksum_workers = 1
+
+        serial = [f.checksum for f in LocalStorage(self.config, str(tmp_path)).list_files(Folder(name='A Folder'))]
+
+        assert parallel == serial
+
+    def test_list_files_should_return_mtime_and_media_type(self, tmp_path):
+        self.create_files(tmp_path, 1)
+        (tmp_path / 'A Folder' / 'clip.mp4').write_bytes(b'clip')
+        (tmp_path / 'A Folder' / 'notes.unknown-extension').write_bytes(b'notes')
+        os.utime(tmp_path / 'A Folder' / '0.jpg', (1492340400, 1492340400))
+
+        files = LocalStorage(self.config, str(tmp_path)).list_files(Folder(name='A Folder'))
+
+        by_name = {f.name: f for f in files}
+        assert by_name['0.jpg'].mtime == 1492340400
+        assert [by_name[name].media_type for name in ['0.jpg', 'clip.mp4', 'notes.unknown-extension']] == \
+            ['image/jpeg', 'video/mp4', None]
+
+    def test_list_files_should_not_calculate_checksums_given_checksum_disabled(self, tmp_path):
+        self.config.checksum = False
+        self.create_files(tmp_path, 2)
+
+        files = LocalStorage(self.config, str(tmp_path)).list_files(Folder(name='A Folder'))
+
+        assert [f.checksum for f in files] == [None, None]
@@ -0,0 +1,131 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import time
+from unittest.mock import MagicMock, patch
+from tests.helpers import setup_storage
+from album_rsync.metrics import MetricsFile
+from album_rsync.stats import Stats
+from album_rsync.sync import Sync
+from album_rsync.file import File
+from album_rsync.folder import Folder
+
+class TestMetricsFile:
+
+    def setup_method(self):
+        self.time_patch = patch('album_rsync.metrics.time.time', return_value=1000)
+        self.mock_time = self.time_patch.start()
+        self.stats = Stats()
+        self.stats_patch = patch('album_rsync.metrics.stats', self.stats)
+        self.stats_patch.start()
+
+        self.config = MagicMock()
+        self.config.metrics_interval = 0
+        self.sync = MagicMock()
+        self.sync.counters = {
+            'copy': 3, 'skip': 2, 'delete': 1, 'error': 0, 'copy_bytes': 300, 'skip_bytes': 200, 'delete_bytes': 100
+        }
+        self.resiliently = MagicMock()
+        self.resiliently.provider = 'flickr'
+        self.resiliently.counters = {'calls': 12, 'errors': 2, 'retries': 1, 'throttle_sec': 1.5}
+
+    def teardown_method(self):
+        self.time_patch.stop()
+        self.stats_patch.stop()
+
+    def samples(self, text):
+        return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+    def test_should_format_sync_counters(self):
+        samples = self.samples(MetricsFile(self.config, self.sync, '/photos', 'flickr').format())
+
+        assert samples['album_rsync_files_total{action="copy"}'] == '3'
+        assert samples['album_rsync_files_total{action="error"}'] == '0'
+        assert samples['album_rsync_bytes_total{action="delete"}'] == '100'
+        assert samples['album_rsync_run_info{src="/photos",dest="flickr"}'] == '1'
+
+    def test_should_not_count_failed_copy_as_copied(self):
+        self.config.dry_run = False
+        self.config.plan_out = ''
+        self.config.journal = ''
+        self.config.delete = False
+        self.config.jobs = 1
+        src_storage, dest_storage = MagicMock(), MagicMock()
+        copied, failed = File(id=1, name='A', size=10), File(id=2, name='B', size=20)
+        setup_storage(src_storage, [{'folder': Folder(id=1, name='A Folder'), 'files': [copied, failed]}])
+        setup_storage(dest_storage, [])
+        def copy_file(file_, *args):   #pylint: disable=unused-argument
+            if file_ is failed:
+                raise FileNotFoundError()
+        src_storage.copy_file.side_effect = copy_file
+        sync = Sync(self.config, src_storage, dest_storage)
+
+        with patch('album_rsync.sync.print'), patch('album_rsync.sync.logger'):
+            sync.run()
+        samples = self.samples(MetricsFile(self.config, sync, '/photos', 'flickr').format())
+
+        assert samples['album_rsync_files_total{action="copy"}'] == '1'
+        assert samples['album_rsync_files_total{action="error"}'] == '1'
+        assert samples['album_rsync_bytes_total{action="copy"}'] == '10'
+
+    def test_should_format_provider_counters(self):
+        samples = self.samples(MetricsFile(self.config, self.sync, '/photos', 'flickr', [self.resiliently]).format())
+
+        assert samples['album_rsync_api_calls_total{provider="flickr"}'] == '12'
+        assert samples['album_rsync_api_errors_total{provider="flickr"}'] == '2'
+        assert samples['album_rsync_api_retries_total{provider="flickr"}'] == '1'
+        assert samples['album_rsync_throttle_seconds_total{provider="flickr"}'] == '1.5'
+
+    def test_should_format_phases(self):
+        with patch('album_rsync.stats.time.perf_counter', side_effect=[10, 12.5]):
+            with self.stats.phase('transfer'):
+                pass
+
+        samples = self.samples(MetricsFile(self.config, self.sync, '/photos', 'flickr').format())
+
+        assert samples['album_rsync_phase_busy_seconds_total{phase="transfer"}'] == '2.5'
+        assert samples['album_rsync_phase_wall_seconds{phase="transfer"}'] == '2.5'
+
+    def test_should_declare_type_of_each_metric(self):
+        text = MetricsFile(self.config, self.sync, '/photos', 'flickr', [self.resiliently]).format()
+        types = dict(line.split()[2:4] for line in text.splitlines() if line.startswith('# TYPE'))
+
+        for name in self.samples(text):
+            assert name.split('{')[0] in types
+
+    def test_should_escape_label_values(self):
+        samples = self.samples(MetricsFile(self.config, self.sync, 'C:\\Photos "2020"', 'flickr').format())
+
+        assert 'album_rsync_run_info{src="C:\\\\Photos \\"2020\\"",dest="flickr"}' in samples
+
+    def test_should_write_progress_then_final_values(self, tmp_path):
+        self.config.metrics_file = str(tmp_path / 'album_rsync.prom')
+        metrics = MetricsFile(self.config, self.sync, '/photos', 'flickr')
+
+        metrics.start()
+        with open(self.config.metrics_file) as f:
+            started = self.samples(f.read())
+        self.mock_time.return_value = 1060
+        metrics.stop(is_complete=True)
+        with open(self.config.metrics_file) as f:
+            finished = self.samples(f.read())
+
+        assert started['album_rsync_run_in_progress'] == '1'
+        assert finished['album_rsync_run_in_progress'] == '0'
+        assert finished['album_rsync_run_complete'] == '1'
+        assert finished['album_rsync_run_duration_seconds'] == '60'
+        assert os.listdir(str(tmp_path)) == ['album_rsync.prom']
+
+    def test_should_write_periodically(self, tmp_path):
+        self.config.metrics_file = str(tmp_path / 'album_rsync.prom')
+        self.config.metrics_interval = 0.01
+        metrics = MetricsFile(self.config, self.sync, '/photos', 'flickr')
+        writes = []
+
+        with patch.object(MetricsFile, 'write', side_effect=lambda *args, **kwargs: writes.append(kwargs)):
+            metrics.start()
+            while len(writes) < 3:
+                time.sleep(0.01)
+            metrics.stop(is_complete=False)
+
+        assert writes[-1] == {'is_running': False, 'is_complete': False}
@@ -0,0 +1,109 @@
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from urllib.error import URLError
+import pytest
+import time
+import threading
+from album_rsync.pipeline import Stage, background, prefetch
+
+class TestStage:
+
+    def test_should_yield_items_in_order(self):
+        stage = Stage(iter(range(100)), maxsize=2)
+
+        assert list(stage) == list(range(100))
+
+    def test_should_chain_stages(self):
+        first = Stage(iter(range(10)), maxsize=1)
+        second = Stage((x * 2 for x in first), maxsize=1)
+
+        assert list(second) == [x * 2 for x in range(10)]
+
+    def test_should_raise_error_from_background_iterable(self):
+        def failing():
+            yield 1
+            raise URLError('Bang!')
+
+        stage = Stage(failing(), maxsize=1)
+        items = iter(stage)
+
+        assert next(items) == 1
+        with pytest.raises(URLError):
+            next(items)
+
+class TestBackground:
+
+    def test_should_return_result(self):
+        future = background(lambda a, b: a + b, 1, b=2)
+
+        assert future.result(timeout=5) == 3
+
+    def test_should_raise_error(self):
+        def failing():
+            raise URLError('Bang!')
+
+        future = background(failing)
+
+        with pytest.raises(URLError):
+            future.result(timeout=5)
+
+class TestPrefetch:
+
+    def test_should_yield_results_in_order(self):
+        def slow_square(x):
+            time.sleep(0.01 * (5 - x))
+            return x * x
+
+        assert list(prefetch(slow_square, range(5), depth=3)) == [(x, x * x) for x in range(5)]
+
+    def test_should_run_ahead_of_consumer(self):
+        started = []
+        lock = threading.Lock()
+        def record(x):
+            with lock:
+                started.append(x)
+            return x
+
+        results = prefetch(record, range(10), depth=3)
+        assert next(results) == (0, 0)
+        time.sleep(0.05)
+
+        assert sorted(started) == [0, 1, 2, 3]
+
+    def test_should_run_lazily_given_no_depth(self):
+        started = []
+        results = prefetch(started.append, range(10), depth=0)
+        next(results)
+
+        assert started == [0]
+
+    def test_should_raise_error_in_order(self):
+        def failing(x):
+            if x == 2:
+                raise URLError('Bang!')
+            return x
+
+        results = prefetch(failing, range(5), depth=3)
+
+        assert next(results) == (0, 0)
+        assert next(results) == (1, 1)
+        with pytest.raises(URLError):
+            next(results)
+
+    def test_should_cancel_pending_calls_given_closed(self):
+        started = []
+        release = threading.Event()
+        def wait(x):
+            started.append(x)
+            release.wait(5)
+            return x
+
+        results = prefetch(wait, range(10), depth=1)
+        release.set()
+        next(results)
+        results.close()
+        time.sleep(0.05)
+
+        assert len(started) <= 3
+
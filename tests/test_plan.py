@@ -0,0 +1,57 @@
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import pytest
+from album_rsync.plan import Plan, FolderPlan, PlanError
+from album_rsync.file import File
+from album_rsync.folder import Folder, RootFolder
+
+class TestPlan:
+
+    def setup_method(self):
+        self.folder_one = Folder(id=1, name='A')
+        self.folder_two = Folder(id='72157', name='B')
+        self.file_one = File(id=1, name='A.jpg', full_path='/photos/A/A.jpg', size=100)
+        self.file_two = File(id='4567', name='B.jpg', checksum='abc123', size=250)
+        self.file_three = File(id='8901', name='C.jpg')
+
+    def test_should_round_trip_through_file(self, tmp_path):
+        path = str(tmp_path / 'plan.json')
+        plan = Plan('/photos', 'flickr', delete=True)
+        plan.add(FolderPlan(self.folder_one, None, copy=[self.file_one]))
+        plan.add(FolderPlan(self.folder_two, self.folder_two, copy=[self.file_two], skip=[self.file_one]))
+        plan.add(FolderPlan(None, self.folder_one, delete=[self.file_three], delete_folder=True))
+        plan.add(FolderPlan(RootFolder(), RootFolder()))
+
+        plan.save(path)
+        loaded = Plan.load(path)
+
+        assert (loaded.src, loaded.dest, loaded.delete) == ('/photos', 'flickr', True)
+        assert len(loaded.folders) == 4
+        assert loaded.folders[0].dest_folder is None
+        assert vars(loaded.folders[1].copy[0]) == vars(self.file_two)
+        assert loaded.folders[2].src_folder is None
+        assert loaded.folders[2].delete_folder
+        assert loaded.folders[3].src_folder.is_root
+        assert loaded.has_deletes
+
+    def test_total_bytes_should_sum_known_sizes_of_copies(self):
+        plan = Plan('/photos', 'flickr')
+        plan.add(FolderPlan(self.folder_one, None, copy=[self.file_one, self.file_three]))
+        plan.add(FolderPlan(self.folder_two, self.folder_two, copy=[self.file_two], skip=[self.file_one]))
+
+        assert plan.total_bytes == 350
+
+    def test_load_should_raise_plan_error_given_invalid_file(self, tmp_path):
+        path = tmp_path / 'plan.json'
+        path.write_text('not a plan')
+
+        with pytest.raises(PlanError):
+            Plan.load(str(path))
+
+    def test_load_should_raise_plan_error_given_unsupported_version(self, tmp_path):
+        path = tmp_path / 'plan.json'
+        path.write_text('{"version": 99}')
+
+        with pytest.raises(PlanError):
+            Plan.load(str(path))
@@ -0,0 +1,79 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import time
+import pstats
+import threading
+from unittest.mock import MagicMock, patch
+import pytest
+from album_rsync.profiler import Profiler, TOP_FUNCTIONS
+
+def spin(sec):
+    end = time.monotonic() + sec
+    while time.monotonic() < end:
+        pass
+
+def spin_in_thread(sec):
+    thread = threading.Thread(target=spin, args=(sec,))
+    thread.start()
+    thread.join()
+
+class TestProfiler:
+
+    def setup_method(self):
+        self.logger_patch = patch('album_rsync.profiler.logger')
+        self.logger_patch.start()
+
+        self.config = MagicMock()
+        self.config.profile_mode = 'cprofile'
+
+    def teardown_method(self):
+        self.logger_patch.stop()
+
+    def function_names(self, path):
+        return {name for (_, _, name) in pstats.Stats(path).stats}
+
+    def test_should_write_pstats_dump_and_report(self, tmp_path):
+        self.config.profile = str(tmp_path / 'sync.prof')
+
+        with Profiler(self.config):
+            spin(0.01)
+
+        assert 'spin' in self.function_names(self.config.profile)
+        with open(self.config.profile + '.txt') as f:
+            report = f.read()
+        assert f"Top {TOP_FUNCTIONS} functions by own time" in report
+        assert f"Top {TOP_FUNCTIONS} functions by cumulative time" in report
+        assert 'spin' in report
+
+    @pytest.mark.skipif(sys.version_info >= (3, 12), reason="only one profiler can be active from Python 3.12")
+    def test_should_profile_threads_started_while_profiling(self, tmp_path):
+        self.config.profile = str(tmp_path / 'sync.prof')
+
+        with Profiler(self.config):
+            spin_in_thread(0.01)
+
+        assert 'spin' in self.function_names(self.config.profile)
+
+    def test_should_sample_every_thread(self, tmp_path):
+        self.config.profile = str(tmp_path / 'sync.prof')
+        self.config.profile_mode = 'sample'
+
+        with Profiler(self.config):
+            spin_in_thread(0.2)
+
+        stats = pstats.Stats(self.config.profile).stats
+        spin_stats = next(value for (_, _, name), value in stats.items() if name == 'spin')
+        _, samples, _, cumulative_sec, callers = spin_stats
+        assert samples > 1
+        assert 0.1 < cumulative_sec < 0.4
+        assert {name for (_, _, name) in callers} == {'run'}
+
+    def test_should_sample_short_run(self, tmp_path):
+        self.config.profile = str(tmp_path / 'sync.prof')
+        self.config.profile_mode = 'sample'
+
+        with Profiler(self.config):
+            pass
+
+        assert pstats.Stats(self.config.profile).stats
@@ -0,0 +1,48 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import threading
+from unittest.mock import patch
+from album_rsync.rate_limiter import RateLimiter
+
+class TestRateLimiter:
+
+    def setup_method(self):
+        self.sleep_patch = patch('album_rsync.rate_limiter.time.sleep')
+        self.mock_sleep = self.sleep_patch.start()
+        self.time_patch = patch('album_rsync.rate_limiter.time.monotonic')
+        self.mock_time = self.time_patch.start()
+        self.mock_time.return_value = 100
+
+    def teardown_method(self):
+        self.sleep_patch.stop()
+        self.time_patch.stop()
+
+    def test_should_not_wait_given_no_interval(self):
+        limiter = RateLimiter(0)
+        for _ in range(5):
+            limiter.acquire()
+
+        self.mock_sleep.assert_not_called()
+
+    def test_should_refill_tokens_up_to_burst(self):
+        limiter = RateLimiter(1, burst=3)
+        for _ in range(3):
+            limiter.acquire()
+        self.mock_time.return_value = 200
+
+        for _ in range(3):
+            limiter.acquire()
+
+        self.mock_sleep.assert_not_called()
+
+    def test_should_space_calls_from_multiple_threads(self):
+        limiter = RateLimiter(2)
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        delays = sorted(c[0][0] for c in self.mock_sleep.call_args_list)
+        assert delays == [2, 4, 6]
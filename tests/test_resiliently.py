@@ -3,20 +3,29 @@
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
 from unittest.mock import MagicMock, patch, call
-from urllib.error import URLError
+from urllib.error import URLError, HTTPError as UrlHTTPError
+import socket
+from email.message import Message
 import pytest
+import requests
+from requests.exceptions import HTTPError
 import tests.helpers    #pylint: disable=unused-import
-from album_rsync.resiliently import Resiliently
+from album_rsync.resiliently import Resiliently, classify_error, TRANSIENT, RATE_LIMITED, PERMANENT
+from album_rsync.concurrency import SUCCESS, CONGESTED
+from album_rsync.stats import Stats
+from album_rsync.google_api import MediaItemError
 
 class TestResiliently:
 
     def setup_method(self):
-        self.sleep_patch = patch('album_rsync.throttle.time.sleep', create=True)
+        self.sleep_patch = patch('album_rsync.rate_limiter.time.sleep', create=True)
         self.mock_sleep = self.sleep_patch.start()
 
         self.config = MagicMock()
         self.config.verbose = False
         self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
         self.callback = MagicMock()
         self.callback.__name__ = 'foo'
 
@@ -70,7 +79,7 @@ class TestResiliently:
         ])
 
     def test_should_throttle_consecutive_calls(self):
-        time_patch = patch('album_rsync.throttle.time.time', create=True)
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
         mock_time = time_patch.start()
         self.config.throttling = 10
         resiliently = Resiliently(self.config)
@@ -84,12 +93,12 @@ class TestResiliently:
 
         self.mock_sleep.assert_has_calls_exactly([
             call(9),
-            call(5)
+            call(14)
         ])
         time_patch.stop()
 
     def test_should_throttle_consecutive_calls_across_multiple_functions(self):
-        time_patch = patch('album_rsync.throttle.time.time', create=True)
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
         mock_time = time_patch.start()
         self.config.throttling = 10
         callback2 = MagicMock()
@@ -105,12 +114,12 @@ class TestResiliently:
 
         self.mock_sleep.assert_has_calls_exactly([
             call(9),
-            call(5)
+            call(14)
         ])
         time_patch.stop()
 
     def test_should_not_throttle_if_timeout_passed(self):
-        time_patch = patch('album_rsync.throttle.time.time', create=True)
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
         mock_time = time_patch.start()
         self.config.throttling = 10
         resiliently = Resiliently(self.config)
@@ -123,7 +132,266 @@ class TestResiliently:
         self.mock_sleep.assert_not_called()
         time_patch.stop()
 
+    def test_should_allow_burst_of_calls(self):
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
+        mock_time = time_patch.start()
+        self.config.throttling = 10
+        self.config.burst = 2
+        resiliently = Resiliently(self.config)
+
+        mock_time.return_value = 0
+        resiliently.call(self.callback, 'a', b='b')
+        resiliently.call(self.callback, 'a', b='b')
+        resiliently.call(self.callback, 'a', b='b')
+
+        self.mock_sleep.assert_has_calls_exactly([
+            call(10)
+        ])
+        time_patch.stop()
+
+    def test_should_limit_transfers_separately_given_transfer_throttling(self):
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
+        mock_time = time_patch.start()
+        self.config.throttling = 10
+        self.config.transfer_throttling = 0
+        resiliently = Resiliently(self.config)
+
+        mock_time.return_value = 0
+        resiliently.call(self.callback, 'a', b='b')
+        resiliently.transfer(self.callback, 'a', b='b')
+        resiliently.transfer(self.callback, 'a', b='b')
+
+        self.mock_sleep.assert_not_called()
+        time_patch.stop()
+
+    def test_should_share_limit_with_transfers_by_default(self):
+        time_patch = patch('album_rsync.rate_limiter.time.monotonic', create=True)
+        mock_time = time_patch.start()
+        self.config.throttling = 10
+        resiliently = Resiliently(self.config)
+
+        mock_time.return_value = 0
+        resiliently.call(self.callback, 'a', b='b')
+        resiliently.transfer(self.callback, 'a', b='b')
+
+        self.mock_sleep.assert_has_calls_exactly([
+            call(10)
+        ])
+        time_patch.stop()
+
+    def test_should_not_retry_permanent_errors(self):
+        self.config.retry = 3
+        self.callback.side_effect = http_error(404)
+        resiliently = Resiliently(self.config)
+
+        with pytest.raises(HTTPError):
+            resiliently.call(self.callback, 'a', b='b')
+
+        self.callback.assert_called_once_with('a', b='b')
+
+    def test_should_wait_for_retry_after_given_rate_limited(self):
+        self.config.retry = 1
+        self.callback.side_effect = [http_error(429, {'Retry-After': '30'}), True]
+        resiliently = Resiliently(self.config)
+
+        resiliently.call(self.callback, 'a', b='b')
+
+        assert self.callback.call_count == 2
+        assert self.mock_sleep.call_count == 1
+        assert self.mock_sleep.call_args[0][0] == pytest.approx(30, abs=1)
+
+    def test_should_pause_transfers_given_rate_limited(self):
+        self.config.retry = 1
+        self.config.transfer_throttling = 0
+        self.callback.side_effect = [http_error(429, {'Retry-After': '30'}), True, True]
+        resiliently = Resiliently(self.config)
+
+        resiliently.call(self.callback, 'a', b='b')
+        resiliently.transfer(self.callback, 'a', b='b')
+
+        assert self.mock_sleep.call_count == 2
+        assert self.mock_sleep.call_args[0][0] == pytest.approx(30, abs=1)
+
+    def test_should_give_up_given_retry_after_is_too_long(self):
+        self.config.retry = 3
+        self.callback.side_effect = http_error(429, {'Retry-After': '86400'})
+        resiliently = Resiliently(self.config)
+
+        with pytest.raises(HTTPError):
+            resiliently.call(self.callback, 'a', b='b')
+
+        self.callback.assert_called_once_with('a', b='b')
+
     def throw_errors(self, num):
         for _ in range(num):
             yield URLError('Bang!')
         yield True
+
+class TestClassifyError:
+
+    def test_should_classify_server_errors_as_transient(self):
+        assert classify_error(http_error(500)) == (TRANSIENT, None)
+        assert classify_error(http_error(503)) == (TRANSIENT, None)
+        assert classify_error(URLError('Bang!')) == (TRANSIENT, None)
+
+    def test_should_classify_client_errors_as_permanent(self):
+        assert classify_error(http_error(400)) == (PERMANENT, None)
+        assert classify_error(FileNotFoundError()) == (PERMANENT, None)
+
+    def test_should_classify_http_errors_without_a_status_as_permanent(self):
+        assert classify_error(HTTPError('quota exceeded')) == (PERMANENT, None)
+        assert classify_error(MediaItemError('Failed: photo.jpg')) == (PERMANENT, None)
+
+    def test_should_classify_connection_errors_as_transient(self):
+        assert classify_error(requests.exceptions.ConnectionError()) == (TRANSIENT, None)
+        assert classify_error(requests.exceptions.ReadTimeout()) == (TRANSIENT, None)
+        assert classify_error(requests.exceptions.ChunkedEncodingError()) == (TRANSIENT, None)
+        assert classify_error(ConnectionResetError()) == (TRANSIENT, None)
+        assert classify_error(socket.timeout()) == (TRANSIENT, None)
+
+    def test_should_classify_other_os_errors_as_permanent(self):
+        assert classify_error(OSError(28, 'No space left on device')) == (PERMANENT, None)
+
+    def test_should_classify_unavailable_with_retry_after_as_rate_limited(self):
+        headers = Message()
+        headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        err = UrlHTTPError('http://a', 503, 'Unavailable', headers, None)
+
+        assert classify_error(err) == (RATE_LIMITED, 0)
+
+    def test_should_classify_flickr_api_errors_by_code(self):
+        class FlickrAPIError(Exception):
+            def __init__(self, code):
+                super().__init__()
+                self.code = code
+
+        assert classify_error(FlickrAPIError(105))[0] == TRANSIENT
+        assert classify_error(FlickrAPIError(1))[0] == PERMANENT
+
+def http_error(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return HTTPError(response=resp)
+
+class TestResilientlyConcurrency:
+
+    def setup_method(self):
+        self.sleep_patch = patch('album_rsync.rate_limiter.time.sleep', create=True)
+        self.sleep_patch.start()
+        self.config = MagicMock()
+        self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
+        self.config.retry = 1
+        self.controller = MagicMock()
+        self.callback = MagicMock()
+        self.callback.__name__ = 'foo'
+
+    def teardown_method(self):
+        self.sleep_patch.stop()
+
+    def test_should_report_success_to_controller(self):
+        resiliently = Resiliently(self.config, self.controller)
+        resiliently.transfer(self.callback)
+
+        self.controller.acquire.assert_called_once()
+        assert self.controller.release.call_args[0][:2] == ('transfer', SUCCESS)
+
+    def test_should_report_rate_limit_as_congestion(self):
+        self.callback.side_effect = [http_error(429, {'Retry-After': '0'}), True]
+        resiliently = Resiliently(self.config, self.controller)
+        resiliently.call(self.callback)
+
+        outcomes = [c[0][1] for c in self.controller.release.call_args_list]
+        assert outcomes == [CONGESTED, SUCCESS]
+
+    def test_should_report_timeout_as_congestion(self):
+        self.config.retry = 0
+        self.callback.side_effect = requests.exceptions.ReadTimeout()
+        resiliently = Resiliently(self.config, self.controller)
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            resiliently.call(self.callback)
+
+        assert self.controller.release.call_args[0][1] == CONGESTED
+
+    def test_should_report_flickr_timeout_as_congestion(self):
+        class FlickrTimeoutError(Exception):
+            pass
+
+        self.config.retry = 0
+        self.callback.side_effect = FlickrTimeoutError('Read timed out')
+        resiliently = Resiliently(self.config, self.controller)
+
+        with pytest.raises(FlickrTimeoutError):
+            resiliently.call(self.callback)
+
+        assert self.controller.release.call_args[0][1] == CONGESTED
+
+class TestResilientlyStats:
+
+    def setup_method(self):
+        self.sleep_patch = patch('album_rsync.resiliently.time.sleep', create=True)
+        self.sleep_patch.start()
+        self.stats = Stats()
+        self.stats_patch = patch('album_rsync.resiliently.stats', self.stats)
+        self.stats_patch.start()
+
+        self.config = MagicMock()
+        self.config.throttling = 0
+        self.config.burst = 1
+        self.config.transfer_throttling = None
+        self.config.retry = 1
+
+    def teardown_method(self):
+        self.sleep_patch.stop()
+        self.stats_patch.stop()
+
+    def test_should_record_each_attempt(self):
+        def foo():
+            pass
+        callback = MagicMock(side_effect=[URLError('timeout'), True], __qualname__=foo.__qualname__)
+        resiliently = Resiliently(self.config)
+
+        resiliently.call(callback)
+
+        calls = self.stats.to_dict()['calls']
+        assert list(calls) == [foo.__qualname__]
+        assert calls[foo.__qualname__]['count'] == 2
+        assert calls[foo.__qualname__]['errors'] == 1
+
+    def test_should_name_call_by_url_path(self):
+        callback = MagicMock(__qualname__='GoogleApi._get')
+        resiliently = Resiliently(self.config)
+
+        resiliently.call(callback, 'https://photoslibrary.googleapis.com/v1/albums?pageToken=abc')
+
+        assert list(self.stats.to_dict()['calls']) == ['GoogleApi._get /v1/albums']
+
+    def test_should_not_name_transfer_by_url(self):
+        callback = MagicMock(__qualname__='GoogleApi._upload')
+        resiliently = Resiliently(self.config)
+
+        resiliently.transfer(callback, 'https://photoslibrary.googleapis.com/v1/uploads/session-1')
+
+        assert list(self.stats.to_dict()['calls']) == ['GoogleApi._upload']
+
+    def test_should_name_flickr_call_by_api_method(self):
+        walker = MagicMock(__qualname__='Walker')
+        method = MagicMock(flickr_method='flickr.photosets.getList')
+        resiliently = Resiliently(self.config)
+
+        resiliently.call(walker, method)
+
+        assert list(self.stats.to_dict()['calls']) == ['flickr.photosets.getList']
+
+    def test_should_count_calls_retries_and_backoff(self):
+        callback = MagicMock(side_effect=[URLError('timeout'), True], __qualname__='foo')
+        resiliently = Resiliently(self.config, provider='flickr')
+
+        with patch('album_rsync.resiliently.random.uniform', return_value=0.5):
+            resiliently.call(callback)
+
+        assert resiliently.provider == 'flickr'
+        assert resiliently.counters == {'calls': 2, 'errors': 1, 'retries': 1, 'throttle_sec': 0.5}
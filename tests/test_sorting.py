@@ -0,0 +1,88 @@
+#pylint: disable=wrong-import-position
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import io
+import random
+from unittest.mock import patch
+import pytest
+from album_rsync.sorting import sort_files
+from album_rsync.file import File
+
+class TestSortFiles:
+
+    def setup_method(self):
+        self.files = [File(id=i, name=f'{i:04} File', checksum='abc123' if i % 2 else None, size=i) for i in range(100)]
+        self.shuffled = list(self.files)
+        random.Random(1).shuffle(self.shuffled)
+        self.temp_files = []
+
+    def _names(self, files):
+        return [x.name for x in files]
+
+    def _temp_file(self, *args, **kwargs):  #pylint: disable=unused-argument
+        f = io.StringIO()
+        self.temp_files.append(f)
+        return f
+
+    def test_should_sort_in_memory_given_no_buffer_limit(self):
+        with patch('album_rsync.sorting.tempfile.TemporaryFile') as mock_temp:
+            result = sort_files(self.shuffled, 0)
+
+        assert self._names(result) == self._names(self.files)
+        mock_temp.assert_not_called()
+
+    def test_should_sort_in_memory_given_files_fit_in_buffer(self):
+        with patch('album_rsync.sorting.tempfile.TemporaryFile') as mock_temp:
+            result = sort_files(self.shuffled, 1000)
+
+        assert self._names(result) == self._names(self.files)
+        mock_temp.assert_not_called()
+
+    @pytest.mark.parametrize('buffer_size', [1, 7, 50, 99, 100])
+    def test_should_sort_through_temp_files_given_more_files_than_buffer(self, buffer_size):
+        result = list(sort_files(self.shuffled, buffer_size))
+
+        assert self._names(result) == self._names(self.files)
+
+    def test_should_keep_file_attributes_given_sorted_through_temp_files(self):
+        result = list(sort_files(self.shuffled, 10))
+
+        assert [x.to_dict() for x in result] == [x.to_dict() for x in self.files]
+
+    def test_should_keep_order_of_files_with_the_same_name(self):
+        files = [File(id=i, name='Same' if i % 3 else 'Other') for i in range(30)]
+
+        result = list(sort_files(files, 4))
+
+        assert [x.id for x in result] == [x.id for x in sorted(files, key=lambda x: x.name)]
+
+    def test_should_read_every_file_before_returning(self):
+        read = []
+        def files():
+            for file_ in self.shuffled:
+                read.append(file_)
+                yield file_
+
+        sort_files(files(), 10)
+
+        assert len(read) == 100
+
+    def test_should_close_temp_files_when_merged(self):
+        with patch('album_rsync.sorting.tempfile.TemporaryFile', side_effect=self._temp_file):
+            result = list(sort_files(self.shuffled, 30))
+
+        assert len(result) == 100
+        assert len(self.temp_files) == 4
+        assert all(f.closed for f in self.temp_files)
+
+    def test_should_close_temp_files_given_listing_fails(self):
+        def files():
+            yield from self.shuffled[:50]
+            raise IOError('listing failed')
+
+        with patch('album_rsync.sorting.tempfile.TemporaryFile', side_effect=self._temp_file):
+            with pytest.raises(IOError):
+                sort_files(files(), 10)
+
+        assert len(self.temp_files) == 5
+        assert all(f.closed for f in self.temp_files)
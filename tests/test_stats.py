@@ -0,0 +1,121 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import json
+from unittest.mock import patch
+import pytest
+from album_rsync.stats import Stats
+
+class TestStats:
+
+    def setup_method(self):
+        self.clock = [0]
+        self.clock_patch = patch('album_rsync.stats.time.perf_counter', side_effect=lambda: self.clock[0])
+        self.clock_patch.start()
+        self.stats = Stats()
+
+    def teardown_method(self):
+        self.clock_patch.stop()
+
+    def tick(self, sec):
+        self.clock[0] += sec
+
+    def test_should_time_phase(self):
+        with self.stats.phase('transfer'):
+            self.tick(2)
+
+        assert self.stats.to_dict()['phases'] == {'transfer': {'count': 1, 'busy_sec': 2, 'wall_sec': 2}}
+
+    def test_should_time_phase_given_error(self):
+        with pytest.raises(ValueError):
+            with self.stats.phase('delete'):
+                self.tick(1)
+                raise ValueError()
+
+        assert self.stats.to_dict()['phases']['delete']['busy_sec'] == 1
+
+    def test_should_sum_busy_time_of_overlapping_phases(self):
+        first = self.stats.phase('transfer')
+        second = self.stats.phase('transfer')
+        first.__enter__()
+        self.tick(1)
+        second.__enter__()
+        self.tick(2)
+        first.__exit__(None, None, None)
+        self.tick(1)
+        second.__exit__(None, None, None)
+
+        assert self.stats.to_dict()['phases']['transfer'] == {'count': 2, 'busy_sec': 6, 'wall_sec': 4}
+
+    def test_should_time_listing_excluding_consumer(self):
+        def list_files():
+            self.tick(1)
+            yield 'a'
+            self.tick(2)
+            yield 'b'
+
+        for _ in self.stats.timed('list-files', list_files):
+            self.tick(10)
+
+        assert self.stats.to_dict()['phases']['list-files'] == {'count': 1, 'busy_sec': 3, 'wall_sec': 23}
+
+    def test_should_time_listing_given_list(self):
+        def list_folders():
+            self.tick(5)
+            return ['a', 'b']
+
+        items = list(self.stats.timed('list-folders', list_folders))
+
+        assert items == ['a', 'b']
+        assert self.stats.to_dict()['phases']['list-folders']['busy_sec'] == 5
+
+    def test_should_time_listing_given_stopped_early(self):
+        items = self.stats.timed('list-files', lambda folder: iter([folder] * 3), 'a')
+        next(items)
+        items.close()
+
+        assert self.stats.to_dict()['phases']['list-files']['count'] == 1
+
+    def test_should_not_record_listing_not_started(self):
+        self.stats.timed('list-files', lambda: [])
+
+        assert self.stats.to_dict()['phases'] == {}
+
+    def test_should_record_call_latency(self):
+        for latency in (0.02, 0.02, 0.02, 0.3, 12):
+            self.stats.record_call('flickr.photosets.getList', latency)
+        self.stats.record_call('flickr.photosets.getList', 0.5, is_error=True)
+
+        call = self.stats.to_dict()['calls']['flickr.photosets.getList']
+        assert call['count'] == 6
+        assert call['errors'] == 1
+        assert call['p50_sec'] == 0.025
+        assert call['p95_sec'] == 12
+        assert call['max_sec'] == 12
+        assert call['buckets']['0.025'] == 3
+        assert call['buckets']['30'] == 1
+
+    def test_should_format_table(self):
+        with self.stats.phase('list-folders'):
+            self.tick(1.5)
+        self.stats.record_call('GoogleApi._get /v1/albums', 0.1)
+
+        lines = self.stats.format_table().splitlines()
+
+        assert lines[2].split() == ['list-folders', '1', '1.500s', '1.500s']
+        assert lines[5].split() == ['GoogleApi._get', '/v1/albums', '1', '0', '0.100s', '0.100s', '0.100s', '0.100s']
+
+    def test_should_save_json(self, tmp_path):
+        self.stats.record_call('upload', 1)
+        path = str(tmp_path / 'stats.json')
+
+        self.stats.save(path)
+
+        with open(path) as f:
+            assert json.load(f) == self.stats.to_dict()
+
+    def test_should_reset(self):
+        self.stats.record_call('upload', 1)
+        self.stats.reset()
+
+        assert self.stats.to_dict() == {'phases': {}, 'calls': {}}
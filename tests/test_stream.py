@@ -0,0 +1,97 @@
+#pylint: disable=wrong-import-position, attribute-defined-outside-init
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+from unittest.mock import MagicMock
+from urllib.error import URLError
+import pytest
+from album_rsync.stream import StreamBuffer, StreamError
+from album_rsync.storage import RemoteStorage
+from album_rsync.file import File
+
+class TestStreamBuffer:
+
+    def test_should_iterate_chunks_in_order(self):
+        chunks = [bytes([i]) * 10 for i in range(50)]
+
+        with StreamBuffer(iter(chunks), max_chunks=2) as stream:
+            assert list(stream) == chunks
+
+    def test_read_should_return_requested_sizes(self):
+        with StreamBuffer(iter([b'abc', b'defg', b'h'])) as stream:
+            assert stream.read(2) == b'ab'
+            assert stream.read(4) == b'cdef'
+            assert stream.read() == b'gh'
+            assert stream.read(1) == b''
+
+    def test_should_raise_download_errors(self):
+        def failing():
+            yield b'abc'
+            raise URLError('Bang!')
+
+        with StreamBuffer(failing()) as stream:
+            with pytest.raises(StreamError) as err:
+                stream.read()
+        assert isinstance(err.value.__cause__, URLError)
+
+    def test_should_raise_download_error_on_every_later_read(self):
+        def failing():
+            yield b'abc'
+            raise URLError('Bang!')
+
+        with StreamBuffer(failing()) as stream:
+            with pytest.raises(StreamError):
+                stream.read()
+            with pytest.raises(StreamError):
+                stream.read(10)
+            with pytest.raises(StreamError):
+                list(stream)
+
+class FakeRemoteStorage(RemoteStorage):
+    #pylint: disable=abstract-method
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks
+        self.uploaded = None
+        self.upload_path_contents = None
+
+    def download(self, file_, dest):
+        with open(dest, 'wb') as f:
+            f.write(b'downloaded')
+
+    def download_stream(self, file_):
+        return self.chunks
+
+    def upload(self, src, folder_name, file_name, checksum):
+        with open(src, 'rb') as f:
+            self.upload_path_contents = f.read()
+
+class TestRemoteStorageCopy:
+
+    def setup_method(self):
+        self.file_one = File(id=1, name='A.jpg')
+
+    def test_should_stream_between_providers_given_dest_accepts_streams(self):
+        src = FakeRemoteStorage(iter([b'abc', b'def']))
+        dest = FakeRemoteStorage()
+        dest.upload_stream = MagicMock(side_effect=lambda stream, *args: setattr(dest, 'uploaded', stream.read()))
+
+        src.copy_file(self.file_one, 'A Folder', dest)
+
+        assert dest.uploaded == b'abcdef'
+        assert dest.upload_stream.call_args[0][1:] == ('A Folder', 'A.jpg', None)
+
+    def test_should_spool_to_temp_file_given_dest_requires_a_file(self):
+        src = FakeRemoteStorage(iter([b'abc', b'def']))
+        dest = FakeRemoteStorage()
+
+        src.copy_file(self.file_one, 'A Folder', dest)
+
+        assert dest.upload_path_contents == b'abcdef'
+
+    def test_should_download_to_temp_file_given_src_cant_stream(self):
+        src = FakeRemoteStorage()
+        dest = FakeRemoteStorage()
+
+        src.copy_file(self.file_one, 'A Folder', dest)
+
+        assert dest.upload_path_contents == b'downloaded'
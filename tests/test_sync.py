@@ -2,10 +2,15 @@
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
 from unittest.mock import MagicMock, patch, call
+from concurrent.futures import Future
+import pytest
+from requests.exceptions import HTTPError
 from tests.helpers import setup_storage
 from album_rsync.sync import Sync
 from album_rsync.file import File
 from album_rsync.folder import Folder, RootFolder
+from album_rsync.plan import Plan, FolderPlan
+from album_rsync.journal import Journal
 
 class TestSyncBase:
 
@@ -19,6 +24,9 @@ class TestSyncBase:
 
         self.config = MagicMock()
         self.config.dry_run = False
+        self.config.jobs = 1
+        self.config.plan_out = ''
+        self.config.journal = ''
         self.src_storage = MagicMock()
         self.dest_storage = MagicMock()
         self.folder_one = Folder(id=1, name='A')
@@ -304,3 +312,286 @@ class TestSyncDelete(TestSyncBase):
             call(self.file_two, self.folder_one.name)
         ], any_order=True)
         self.mock_delete_folder.assert_not_called()
+
+class TestSyncCounters(TestSyncBase):
+
+    def test_should_count_files_and_bytes(self):
+        self.config.delete = True
+        self.dest_storage.delete_file = MagicMock()
+        copied = File(id=1, name='A', size=10)
+        skipped = File(id=2, name='B', size=20)
+        deleted = File(id=3, name='C', size=40)
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [copied, skipped]}
+        ])
+        setup_storage(self.dest_storage, [
+            {'folder': self.folder_one, 'files': [File(id=4, name='B', size=20), deleted]}
+        ])
+
+        self.sync.run()
+
+        assert self.sync.counters == {
+            'copy': 1, 'skip': 1, 'delete': 1, 'error': 0, 'copy_bytes': 10, 'skip_bytes': 20, 'delete_bytes': 40
+        }
+
+    def test_should_count_failed_copies(self):
+        self.mock.side_effect = FileNotFoundError()
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        assert self.sync.counters['error'] == 2
+        assert self.sync.counters['copy'] == 0
+
+    def test_should_count_copies_once_completed(self):
+        upload = Future()
+        self.mock.return_value = upload
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [File(id=1, name='A', size=10)]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+        pending = self.sync.counters
+        upload.set_result(None)
+
+        assert (pending['copy'], pending['copy_bytes']) == (0, 0)
+        assert (self.sync.counters['copy'], self.sync.counters['copy_bytes']) == (1, 10)
+
+class TestSyncParallel(TestSyncBase):
+
+    def setup_method(self):
+        super().setup_method()
+        self.config.jobs = 4
+        self.sync = Sync(self.config, self.src_storage, self.dest_storage)
+
+    def test_should_copy_all_files_given_multiple_jobs(self):
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]},
+            {'folder': self.folder_two, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [
+            {'folder': self.folder_two, 'files': [self.file_one]}
+        ])
+
+        self.sync.run()
+
+        self.mock.assert_has_calls_exactly([
+            call(self.file_one, self.folder_one.name, self.dest_storage),
+            call(self.file_two, self.folder_one.name, self.dest_storage),
+            call(self.file_two, self.folder_two.name, self.dest_storage)
+        ], any_order=True)
+        assert self.sync._copy_count == 3     #pylint: disable=protected-access
+        assert self.sync._skip_count == 1     #pylint: disable=protected-access
+
+    def test_should_continue_copying_given_errors_in_some_transfers(self):
+        self.mock.side_effect = lambda file_, folder_name, dest: self.raise_error(file_)
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]},
+            {'folder': self.folder_two, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        assert self.mock.call_count == 4
+
+    def test_should_raise_unexpected_errors_from_transfers(self):
+        self.mock.side_effect = ValueError()
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        with pytest.raises(ValueError):
+            self.sync.run()
+
+    def raise_error(self, file_):
+        if file_ is self.file_one:
+            raise FileNotFoundError()
+
+class TestSyncPlan(TestSyncBase):
+
+    def setup_method(self):
+        super().setup_method()
+        self.plan_patch = patch('album_rsync.sync.Plan')
+        self.mock_plan = self.plan_patch.start().return_value
+
+    def teardown_method(self):
+        super().teardown_method()
+        self.plan_patch.stop()
+
+    def test_should_write_plan_without_copying_given_plan_out(self):
+        self.config.plan_out = 'plan.json'
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [
+            {'folder': self.folder_one, 'files': [self.file_two]}
+        ])
+
+        self.sync.run()
+
+        self.mock.assert_not_called()
+        folder_plan = self.mock_plan.add.call_args_list[0][0][0]
+        assert folder_plan.copy == [self.file_one]
+        assert folder_plan.skip == [self.file_two]
+        self.mock_plan.save.assert_called_once_with('plan.json')
+
+    def test_should_apply_plan_without_listing(self):
+        self.config.delete = False
+        plan = Plan('src', 'dest')
+        plan.add(FolderPlan(self.folder_one, None, copy=[self.file_one]))
+        plan.add(FolderPlan(self.folder_two, self.folder_two, copy=[self.file_two], skip=[self.file_one]))
+
+        self.sync.run(plan)
+
+        self.mock.assert_has_calls_exactly([
+            call(self.file_one, self.folder_one.name, self.dest_storage),
+            call(self.file_two, self.folder_two.name, self.dest_storage)
+        ])
+        self.src_storage.list_folders.assert_not_called()
+        self.src_storage.list_files.assert_not_called()
+        self.dest_storage.list_folders.assert_not_called()
+        self.dest_storage.list_files.assert_not_called()
+
+    def test_should_delete_files_and_folders_in_plan(self):
+        plan = Plan('src', 'dest', delete=True)
+        plan.add(FolderPlan(None, self.folder_two, delete=[self.file_one], delete_folder=True))
+
+        self.sync.run(plan)
+
+        self.dest_storage.delete_file.assert_called_once_with(self.file_one, self.folder_two.name)
+        self.mock_delete_folder.assert_called_once_with(self.folder_two)
+
+class TestSyncJournal(TestSyncBase):
+
+    def setup_method(self):
+        super().setup_method()
+        self.config.root_files = False
+        self.config.delete = False
+        self.journal_patch = patch('album_rsync.sync.Journal')
+        self.mock_journal = self.journal_patch.start().return_value
+        self.mock_journal.is_folder_done.return_value = False
+        self.mock_journal.is_done.return_value = False
+
+    def teardown_method(self):
+        super().teardown_method()
+        self.journal_patch.stop()
+
+    def test_should_record_copies_and_completed_folders(self):
+        self.config.journal = 'journal'
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        self.mock_journal.record.assert_called_once_with('copy', self.folder_one.name, self.file_one)
+        self.mock_journal.record_folder.assert_called_once_with(self.folder_one.name)
+        self.mock_journal.close.assert_called_once_with(compact=True)
+
+    def test_should_not_record_folder_given_a_copy_failed(self):
+        self.config.journal = 'journal'
+        self.mock.side_effect = FileNotFoundError()
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        self.mock_journal.record.assert_not_called()
+        self.mock_journal.record_folder.assert_not_called()
+        self.mock_journal.close.assert_called_once_with(compact=False)
+
+    def test_should_keep_journal_file_given_a_copy_failed(self, tmp_path):
+        self.config.journal = str(tmp_path / 'journal')
+        self.config.src = 'src'
+        self.config.dest = 'dest'
+        self.mock.side_effect = [FileNotFoundError(), None]
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        with patch('album_rsync.sync.Journal', Journal):
+            self.sync.run()
+
+        assert os.path.exists(self.config.journal)
+
+    def test_should_skip_folders_and_files_completed_by_previous_run(self):
+        self.config.journal = 'journal'
+        self.mock_journal.is_folder_done.side_effect = lambda name: name == self.folder_one.name
+        self.mock_journal.is_done.side_effect = lambda op, folder_name, file_: file_ is self.file_one
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one]},
+            {'folder': self.folder_two, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        self.mock.assert_called_once_with(self.file_two, self.folder_two.name, self.dest_storage)
+        assert call(self.folder_one) not in self.src_storage.list_files.call_args_list
+
+class TestSyncBatched(TestSyncBase):
+
+    def setup_method(self):
+        super().setup_method()
+        self.config.root_files = False
+        self.config.delete = False
+        self.config.journal = 'journal'
+        self.journal_patch = patch('album_rsync.sync.Journal')
+        self.mock_journal = self.journal_patch.start().return_value
+        self.mock_journal.is_folder_done.return_value = False
+        self.mock_journal.is_done.return_value = False
+        self.futures = []
+        self.mock.side_effect = self.copy_file
+        self.dest_storage.flush.side_effect = self.flush
+
+    def teardown_method(self):
+        super().teardown_method()
+        self.journal_patch.stop()
+
+    def copy_file(self, file_, folder_name, dest_storage):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def flush(self, folder_name=None):
+        for future in self.futures:
+            if not future.done():
+                future.set_result({})
+
+    def test_should_flush_folder_once_its_files_are_sent(self):
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
+        ])
+        setup_storage(self.dest_storage, [])
+
+        self.sync.run()
+
+        assert self.dest_storage.flush.call_args_list[0] == call(self.folder_one.name)
+        assert self.mock_journal.record.call_count == 2
+        self.mock_journal.record_folder.assert_called_once_with(self.folder_one.name)
+
+    def test_should_not_record_file_given_batch_failed(self):
+        self.dest_storage.flush.side_effect = None
+        setup_storage(self.src_storage, [
+            {'folder': self.folder_one, 'files': [self.file_one]}
+        ])
+        setup_storage(self.dest_storage, [])
+        self.mock.side_effect = None
+        future = Future()
+        future.set_exception(HTTPError('quota exceeded'))
+        self.mock.return_value = future
+
+        self.sync.run()
+
+        self.mock_journal.record.assert_not_called()
+        self.mock_journal.record_folder.assert_not_called()
@@ -2,27 +2,37 @@
 #pylint: disable=wrong-import-position, attribute-defined-outside-init
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+import threading
 from unittest.mock import MagicMock, patch, call
 import pytest
 import tests.helpers
 from album_rsync.tree_walker import TreeWalker
+try:
+    from album_rsync.rx_tree_walker import RxTreeWalker
+except ImportError:
+    RxTreeWalker = None
 from album_rsync.file import File
 from album_rsync.folder import Folder, RootFolder
 
 class TestTreeWalker:
 
+    walker_class = TreeWalker
+    module = 'album_rsync.tree_walker'
+
     def setup_method(self):
-        self.print_patch = patch('album_rsync.tree_walker.print', create=True)
+        self.print_patch = patch(f'{self.module}.print', create=True)
         self.mock_print = self.print_patch.start()
-        self.logger_patch = patch('album_rsync.tree_walker.logger', create=True)
+        self.logger_patch = patch(f'{self.module}.logger', create=True)
         self.mock_logger = self.logger_patch.start()
-        self.time_patch = patch('album_rsync.tree_walker.time.time', create=True)
+        self.time_patch = patch(f'{self.module}.time.time', create=True)
         self.time_patch.start().return_value = 0
 
         self.config = MagicMock()
         self.config.root_files = False
         self.config.list_folders = False
         self.config.list_sort = False
+        self.config.list_sort_buffer = 0
+        self.config.prefetch = 0
         self.storage = MagicMock()
         self.folder_one = Folder(id=1, name='A Folder')
         self.folder_two = Folder(id=2, name='B Folder')
@@ -39,7 +49,7 @@ class TestTreeWalker:
         self.time_patch.stop()
 
     def test_should_print_wrapper_only_given_no_folders(self):
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
 
         walker.walk()
 
@@ -47,7 +57,7 @@ class TestTreeWalker:
         self.mock_logger.info.assert_called_once_with("0 directories, 0 files read in 0 sec")
 
     def test_should_print_wrapper_only_given_empty_folders(self):
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': []},
             {'folder': self.folder_one, 'files': []}
@@ -60,7 +70,7 @@ class TestTreeWalker:
 
     def test_should_print_root_files_given_root_files_enabled(self):
         self.config.root_files = True
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_one, self.file_two]}
         ])
@@ -76,7 +86,7 @@ class TestTreeWalker:
     @pytest.mark.skip(reason="Ligitimately broken, I just don't have a good fix for it")
     def test_should_not_print_connector_when_printing_root_files_given_folders_are_hidden(self):
         self.config.root_files = True
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_one, self.file_two]},
             {'folder': self.folder_one, 'files': []}
@@ -92,7 +102,7 @@ class TestTreeWalker:
 
     def test_should_not_print_root_files_given_root_files_disabled(self):
         self.config.root_files = False
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_one, self.file_two]}
         ])
@@ -105,7 +115,7 @@ class TestTreeWalker:
     def test_should_print_root_files_given_root_files_enabled_and_folders_exist(self):
         self.config.root_files = True
         self.config.list_sort = False
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.root_folder, 'files': [self.file_three]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -122,7 +132,7 @@ class TestTreeWalker:
         self.mock_logger.info.assert_called_once_with("1 directories, 2 files read in 0 sec")
 
     def test_should_print_folder_files(self):
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_one, self.file_two]}
         ])
@@ -137,7 +147,7 @@ class TestTreeWalker:
         self.mock_logger.info.assert_called_once_with("1 directories, 2 files read in 0 sec")
 
     def test_should_print_all_folders(self):
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_one]},
             {'folder': self.folder_two, 'files': [self.file_two]}
@@ -155,7 +165,7 @@ class TestTreeWalker:
         self.mock_logger.info.assert_called_once_with("2 directories, 2 files read in 0 sec")
 
     def test_should_print_checksum_given_file_has_checksum(self):
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_one, 'files': [self.file_three]}
         ])
@@ -170,7 +180,7 @@ class TestTreeWalker:
 
     def test_should_sort_folders_and_files_given_sort_enabled(self):
         self.config.list_sort = True
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -188,9 +198,27 @@ class TestTreeWalker:
         ])
         self.mock_logger.info.assert_called_once_with("2 directories, 3 files read in 0 sec")
 
+    def test_should_sort_files_given_more_files_than_sort_buffer(self):
+        self.config.list_sort = True
+        self.config.list_sort_buffer = 1
+        walker = self.walker_class(self.config, self.storage)
+        tests.helpers.setup_storage(self.storage, [
+            {'folder': self.folder_two, 'files': [self.file_three, self.file_two, self.file_one]}
+        ])
+
+        walker.walk()
+
+        self.mock_print.assert_has_calls([
+            call("└─── B Folder"),
+            call("    ├─── A File"),
+            call("    ├─── B File"),
+            call("    └─── C File [abc123]")
+        ])
+        self.mock_logger.info.assert_called_once_with("1 directories, 3 files read in 0 sec")
+
     def test_should_not_sort_folders_and_files_given_sort_disabled(self):
         self.config.list_sort = False
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -210,7 +238,7 @@ class TestTreeWalker:
 
     def test_should_print_only_folders_given_list_folders_enabled(self):
         self.config.list_folders = True
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -227,7 +255,7 @@ class TestTreeWalker:
     def test_should_sort_folders_and_files_given_sort_enabled2(self):
         self.config.list_sort = True
         self.config.list_folders = True
-        walker = TreeWalker(self.config, self.storage)
+        walker = self.walker_class(self.config, self.storage)
         tests.helpers.setup_storage(self.storage, [
             {'folder': self.folder_two, 'files': [self.file_three, self.file_two]},
             {'folder': self.folder_one, 'files': [self.file_one]}
@@ -240,3 +268,32 @@ class TestTreeWalker:
             call("└─── B Folder")
         ])
         self.mock_logger.info.assert_called_once_with("2 directories read in 0 sec")
+
+class TestTreeWalkerPrefetch(TestTreeWalker):
+
+    def setup_method(self):
+        super().setup_method()
+        self.config.prefetch = 2
+
+    def test_should_print_folders_while_next_folders_are_listed(self):
+        printed = threading.Event()
+        waited = []
+        def list_files(folder):
+            if folder is self.folder_three:
+                waited.append(printed.wait(5))
+            return [self.file_one]
+        self.storage.list_folders.return_value = [self.folder_one, self.folder_two, self.folder_three]
+        self.storage.list_files.side_effect = list_files
+        self.mock_print.side_effect = lambda *args: printed.set()
+        walker = self.walker_class(self.config, self.storage)
+
+        walker.walk()
+
+        assert waited == [True]
+        self.mock_print.assert_has_calls([call("├─── A Folder"), call("└─── C Folder")], any_order=True)
+
+@pytest.mark.skipif(RxTreeWalker is None, reason="RxPY isn't installed")
+class TestRxTreeWalker(TestTreeWalker):
+
+    walker_class = RxTreeWalker
+    module = 'album_rsync.rx_tree_walker'
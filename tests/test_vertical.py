@@ -62,6 +62,17 @@ C Folder/
 C Folder/A File
 """
 
+    def test_should_report_plan_src_and_dest_in_metrics_given_plan_applied(self, mock_stdout, mock_stderr, tmp_path):
+        plan_path = str(tmp_path / 'plan.json')
+        metrics_path = str(tmp_path / 'album_rsync.prom')
+        with patch.object(sys, 'argv', ["album-rsync", "fake", "fake", f"--plan-out={plan_path}"]):
+            main()
+        with patch.object(sys, 'argv', ["album-rsync", f"--apply-plan={plan_path}", f"--metrics-file={metrics_path}"]):
+            main()
+
+        with open(metrics_path) as f:
+            assert 'album_rsync_run_info{src="fake",dest="fake"} 1\n' in f.read()
+
     def test_should_mirror(self, mock_stdout, mock_stderr):
         testargs = ["album-rsync", "fake", "fake", "--delete", "-n"]
         with patch.object(sys, 'argv', testargs):